@@ -1,66 +1,57 @@
+import io
 import os
-import uuid
-from flask import Flask, request, jsonify, send_file
-from flask_cors import CORS
-from dotenv import load_dotenv
-from jury_engine import JuryEngine
-from services import GeminiASRService
+import time
 import traceback
-
-# load environment variables
-load_dotenv()
+from flask import Flask, Response, g, request, jsonify, send_file, stream_with_context
+from flask_cors import CORS
+from services import (
+    wav_stream_header, negotiate_format, Overloaded, UploadTooLarge,
+    span, add_bytes, new_request_id, observe_request, render_metrics
+)
+from runtime import (
+    BOSON_API_KEY, GOOGLE_API_KEY, API_INFO, engine, asr_service, asr_backends,
+    opinion_admission, client_key, overloaded_response,
+    health_payload, readiness_payload, jury_members_payload, validate_question, open_conversation, turn_history, record_turn, is_truthy,
+    speculative_transcribe, new_session, get_session_audio, build_opinions_response, sse, deliberation_sse,
+    AUDIO_CACHE_MAX_AGE
+)
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=['X-Request-ID', 'Retry-After'])
 
-# get API keys from environment
-BOSON_API_KEY = os.getenv('BOSON_API_KEY')
-GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
 
-# check required keys
-if not BOSON_API_KEY:
-    print("WARNING: BOSON_API_KEY not found in environment variables")
-if not GOOGLE_API_KEY:
-    print("WARNING: GOOGLE_API_KEY not found in environment variables")
+@app.before_request
+def start_request():
+    """tag the request with an id (the caller's X-Request-ID if given) that every stage logs under"""
+    g.started = time.perf_counter()
+    g.request_id = new_request_id(request.headers.get('X-Request-ID'))
 
-# initialize jury engine
-engine = None
-if BOSON_API_KEY and GOOGLE_API_KEY:
-    try:
-        engine = JuryEngine(
-            boson_api_key=BOSON_API_KEY,
-            google_api_key=GOOGLE_API_KEY
-        )
-        print("Jury engine initialized successfully")
-    except Exception as e:
-        print(f"ERROR: Failed to initialize jury engine: {str(e)}")
 
-# initialize gemini ASR service
-asr_service = None
-if GOOGLE_API_KEY:
-    try:
-        asr_service = GeminiASRService(api_key=GOOGLE_API_KEY)
-        print("Gemini ASR initialized successfully")
-    except Exception as e:
-        print(f"ERROR: Failed to initialize Gemini ASR: {str(e)}")
-
-# create temp directory for audio files
-TEMP_DIR = os.path.join(os.path.dirname(__file__), 'temp')
-os.makedirs(TEMP_DIR, exist_ok=True)
+@app.after_request
+def finish_request(response):
+    response.headers['X-Request-ID'] = g.get('request_id', '')
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    observe_request(request.method, route, response.status_code, time.perf_counter() - g.get('started', time.perf_counter()))
+    return response
 
 
 @app.route('/health', methods=['GET'])
 def health_check():
     """health check endpoint"""
-    return jsonify({
-        'status': 'healthy',
-        'services': {
-            'bosonai_tts': 'connected' if BOSON_API_KEY else 'not configured',
-            'google_gemini': 'connected' if GOOGLE_API_KEY else 'not configured',
-            'gemini_asr': 'connected' if asr_service else 'not configured'
-        },
-        'engine': 'initialized' if engine else 'not initialized'
-    })
+    return jsonify(health_payload())
+
+
+@app.route('/health/ready', methods=['GET'])
+def readiness_check():
+    """readiness probe: 503 while start-up warm-up is still running"""
+    body, status = readiness_payload()
+    return jsonify(body), status
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """stage latency histograms, byte counters and cache/queue gauges in Prometheus text format"""
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
 
 
 @app.route('/api/jury-members', methods=['GET'])
@@ -69,107 +60,122 @@ def get_jury_members():
     if not engine:
         return jsonify({'error': 'Engine not initialized'}), 500
     
-    members = [{
-        'id': member.id,
-        'name': member.name,
-        'stance': member.stance
-    } for member in engine.jury_members]
+    return jsonify(jury_members_payload())
+
+
+def _parse_opinion_request():
+    """read the question and conversation history from a JSON or multipart request
+    
+    the history is validated and compacted to the prompt token budget, with
+    older turns summarized under the request's conversation_id (a new id is
+    issued when the client doesn't send one)
+    
+    Returns:
+        (question, conversation_history, conversation_id, transcribed, opinion_futures, error)
+        where opinion_futures were started speculatively on a draft transcript (or None)
+        and error is a (response, status) tuple or None
+    """
+    question = None
+    transcribed = False
+    opinion_futures = None
+    
+    if 'audio' in request.files:
+        if not asr_service:
+            return None, None, None, False, None, (jsonify({'error': 'ASR service not configured'}), 500)
+        
+        audio_file = request.files['audio']
+        if audio_file.filename == '':
+            return None, None, None, False, None, (jsonify({'error': 'No file selected'}), 400)
+        
+        conversation_id, previous, error = open_conversation(request.form.get('conversation_history'),
+                                                             request.form.get('conversation_id'),
+                                                             request.form.get('session_id'))
+        if error:
+            return None, None, None, False, None, (jsonify({'error': error}), 400)
+        
+        print(f"Transcribing audio file: {audio_file.filename}")
+        try:
+            question, opinion_futures = speculative_transcribe(
+                audio_file, lambda text: turn_history(previous, text, conversation_id))
+        except UploadTooLarge as e:
+            return None, None, None, False, None, (jsonify({'error': str(e)}), 413)
+        transcribed = True
+        print(f"Transcription: {question}")
+    else:
+        data = request.get_json()
+        if not data or 'question' not in data:
+            return None, None, None, False, None, (jsonify({'error': 'Question or audio file is required'}), 400)
+        
+        question = data['question'].strip()
+        conversation_id, previous, error = open_conversation(data.get('conversation_history'),
+                                                             data.get('conversation_id'),
+                                                             data.get('session_id'), question)
+        if error:
+            return None, None, None, False, None, (jsonify({'error': error}), 400)
+    
+    error = validate_question(question)
+    if error:
+        return None, None, None, False, None, (jsonify({'error': error}), 400)
     
-    return jsonify(members)
+    if not engine:
+        return None, None, None, False, None, (jsonify({'error': 'Engine not initialized'}), 500)
+    
+    conversation_history = turn_history(previous, question, conversation_id)
+    return question, conversation_history, conversation_id, transcribed, opinion_futures, None
+
+
+def _admit():
+    """wait for an admission slot (deliberations and speech streams)
+    
+    Returns:
+        (permit, None) once admitted, or (None, 429 response) if the queue is full or the wait timed out
+    """
+    try:
+        return opinion_admission.acquire(client_key(request.headers.get('X-Forwarded-For'), request.remote_addr)), None
+    except Overloaded as e:
+        body, headers = overloaded_response(e)
+        print(f"✗ Rejected {request.path} request: {str(e)}")
+        return None, (jsonify(body), 429, headers)
+
+
+def _wants_fresh():
+    """whether the caller asked to bypass the deliberation cache (?fresh=1, form or JSON field)"""
+    value = request.args.get('fresh') or request.form.get('fresh')
+    if value is None:
+        data = request.get_json(silent=True) or {}
+        value = data.get('fresh')
+    return is_truthy(value)
 
 
 @app.route('/api/opinions', methods=['POST'])
 def generate_opinions():
     """generate bear opinions with audio for a question or audio file"""
+    permit, busy = _admit()
+    if busy:
+        return busy
     try:
-        question = None
-        conversation_history = []
-        
-        if 'audio' in request.files:
-            if not asr_service:
-                return jsonify({'error': 'ASR service not configured'}), 500
-            
-            audio_file = request.files['audio']
-            if audio_file.filename == '':
-                return jsonify({'error': 'No file selected'}), 400
-            
-            print(f"Transcribing audio file: {audio_file.filename}")
-            result = asr_service.transcribe_audio(audio_file)
-            question = result['text']
-            print(f"Transcription: {question}")
-            
-            if request.form.get('conversation_history'):
-                import json
-                conversation_history = json.loads(request.form.get('conversation_history'))
-        else:
-            data = request.get_json()
-            if not data or 'question' not in data:
-                return jsonify({'error': 'Question or audio file is required'}), 400
-            
-            question = data['question'].strip()
-            conversation_history = data.get('conversation_history', [])
-        
-        if len(question) < 3:
-            return jsonify({'error': 'Question must be at least 3 characters'}), 400
-        if len(question) > 500:
-            return jsonify({'error': 'Question must be less than 500 characters'}), 400
-        
-        if not engine:
-            return jsonify({'error': 'Engine not initialized'}), 500
+        question, conversation_history, conversation_id, _, opinion_futures, error = _parse_opinion_request()
+        if error:
+            return error
         
         print(f"\n{'='*60}")
         print(f"Generating opinions for: {question}")
         print(f"Conversation history length: {len(conversation_history)}")
         print(f"{'='*60}\n")
         
-        result = engine.generate_deliberation_with_audio(question, conversation_history)
-        
-        session_id = str(uuid.uuid4())
-        session_dir = os.path.join(TEMP_DIR, session_id)
-        os.makedirs(session_dir, exist_ok=True)
+        result = engine.generate_deliberation_with_audio(question, conversation_history,
+                                                         use_cache=not _wants_fresh(),
+                                                         opinion_futures=opinion_futures)
         
-        opinions = []
-        audio_success_count = 0
-        for idx, (entry, audio_bytes) in enumerate(zip(result['opinions'], result['audio_files'])):
-            member = entry['member']
-            
-            audio_index = None
-            if audio_bytes:
-                try:
-                    audio_path = os.path.join(session_dir, f'{idx}.wav')
-                    with open(audio_path, 'wb') as f:
-                        f.write(audio_bytes)
-                    audio_index = idx
-                    audio_success_count += 1
-                    print(f"✓ Saved audio file {idx} for {member.name}")
-                except Exception as audio_error:
-                    print(f"✗ Failed to save audio {idx} for {member.name}: {str(audio_error)}")
-            else:
-                print(f"✗ No audio generated for {member.name}")
-            
-            opinions.append({
-                'speaker': member.name,
-                'text': entry['text'],
-                'audio_index': audio_index
-            })
-        
-        response = {
-            'session_id': session_id,
-            'question': question,
-            'opinions': opinions
-        }
-        
-        print(f"\n{'='*60}")
-        print(f"✓ Generated {len(opinions)} opinions")
-        print(f"✓ Audio files saved: {audio_success_count}/{len(opinions)}")
-        print(f"✓ Session ID: {session_id}")
-        print(f"{'='*60}\n")
-        
-        return jsonify(response)
+        return jsonify(build_opinions_response(question, result, conversation_id))
     
     except KeyboardInterrupt:
         print("\n\n✗ Request interrupted by user")
         raise
+    except Overloaded as e:
+        body, headers = overloaded_response(e)
+        print(f"✗ Upstream busy: {str(e)}")
+        return jsonify(body), 429, headers
     except Exception as e:
         print(f"\n{'='*60}")
         print(f"✗ ERROR generating opinions: {str(e)}")
@@ -181,27 +187,196 @@ def generate_opinions():
             'error': f'Failed to generate opinions: {error_message}',
             'details': error_message
         }), 500
+    finally:
+        permit.release()
+
+
+@app.route('/api/opinions/stream', methods=['POST'])
+def stream_opinions():
+    """stream bear opinions as Server-Sent Events while audio is still rendering
+    
+    events, in order of availability:
+        transcription: {text} (audio uploads only)
+        session: {session_id, conversation_id, question}
+        opinion: {index, speaker, text, cached}
+        audio_ready: {session_id, index, speaker} once the WAV is in the session audio store
+        audio_failed: {index, speaker}
+        error: {index, speaker, error} or {error} if the whole deliberation failed
+        done: {session_id, opinions, audio_files}
+    
+    the deliberation slot is held until the stream is closed
+    """
+    permit, busy = _admit()
+    if busy:
+        return busy
+    try:
+        question, conversation_history, conversation_id, transcribed, opinion_futures, error = _parse_opinion_request()
+        if error:
+            permit.release()
+            return error
+    except Overloaded as e:
+        permit.release()
+        body, headers = overloaded_response(e)
+        return jsonify(body), 429, headers
+    except Exception as e:
+        permit.release()
+        print(f"✗ ERROR preparing opinion stream: {str(e)}")
+        print(traceback.format_exc())
+        return jsonify({
+            'error': f'Failed to generate opinions: {str(e)}',
+            'details': str(e)
+        }), 500
+    
+    use_cache = not _wants_fresh()
+    session_id = new_session()
+    
+    def generate():
+        if transcribed:
+            yield sse('transcription', {'text': question})
+        yield sse('session', {'session_id': session_id, 'conversation_id': conversation_id, 'question': question})
+        
+        counts = {'opinion': 0, 'audio_ready': 0}
+        opinions = {}
+        try:
+            for event in engine.iter_deliberation_with_audio(question, conversation_history, use_cache=use_cache,
+                                                             opinion_futures=opinion_futures):
+                name, message = deliberation_sse(event, session_id)
+                counts[name] = counts.get(name, 0) + 1
+                if name == 'opinion':
+                    opinions[event['index']] = (event['member'].name, event['text'])
+                yield message
+        except Exception as e:
+            print(f"✗ ERROR streaming opinions: {str(e)}")
+            print(traceback.format_exc())
+            yield sse('error', {'error': f'Failed to generate opinions: {str(e)}'})
+        
+        record_turn(conversation_id, session_id, question, [opinions[index] for index in sorted(opinions)])
+        print(f"✓ Streamed {counts['opinion']} opinions, {counts['audio_ready']} audio files for session {session_id}")
+        yield sse('done', {'session_id': session_id, 'opinions': counts['opinion'], 'audio_files': counts['audio_ready']})
+    
+    response = Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    response.call_on_close(permit.release)
+    return response
 
 
 @app.route('/api/audio/<session_id>/<int:index>', methods=['GET'])
 def get_audio(session_id, index):
-    """serve audio file for a specific session and bear index"""
+    """serve audio file for a specific session and bear index
+    
+    the format comes from ?format=wav|opus|mp3|flac, else the Accept header.
+    memory hits are served straight from the buffer and disk hits through the
+    server's file wrapper (sendfile where available); both honour Range,
+    If-None-Match and If-Modified-Since
+    """
     try:
-        audio_path = os.path.join(TEMP_DIR, session_id, f'{index}.wav')
-        
-        if not os.path.exists(audio_path):
-            return jsonify({'error': 'Audio file not found'}), 404
+        fmt = negotiate_format(request.args.get('format'), request.headers.get('Accept'))
+        if not fmt:
+            return jsonify({'error': 'Unsupported audio format'}), 400
         
-        return send_file(audio_path, mimetype='audio/wav')
+        with span('audio_serve'):
+            blob = get_session_audio(session_id, index, fmt)
+            
+            if not blob:
+                return jsonify({'error': 'Audio file not found'}), 404
+            
+            response = send_file(
+                io.BytesIO(blob.data) if blob.data is not None else blob.path,
+                mimetype=blob.mimetype,
+                conditional=True,
+                etag=blob.etag,
+                last_modified=blob.last_modified,
+                max_age=AUDIO_CACHE_MAX_AGE
+            )
+        response.cache_control.private = True
+        response.cache_control.immutable = True
+        response.vary.add('Accept')
+        # what actually goes out: a Range slice, or nothing for a 304
+        add_bytes('response_audio', response.content_length or 0)
+        return response
     
     except Exception as e:
         print(f"Error serving audio: {str(e)}")
         return jsonify({'error': 'Failed to serve audio'}), 500
 
 
+@app.route('/api/speech/stream', methods=['GET', 'POST'])
+def stream_speech():
+    """stream one bear's voice as a progressive WAV while BosonAI is still synthesizing
+    
+    accepts member_id and text as JSON (POST) or query parameters (GET, so an
+    <audio> element can point straight at it)
+    """
+    if not engine:
+        return jsonify({'error': 'Engine not initialized'}), 500
+    
+    data = (request.get_json(silent=True) or {}) if request.method == 'POST' else request.args
+    member_id = data.get('member_id')
+    text = (data.get('text') or '').strip()
+    
+    member = engine.get_member(member_id) if member_id else None
+    if not member:
+        return jsonify({'error': 'Valid member_id is required'}), 400
+    if not text:
+        return jsonify({'error': 'Text is required'}), 400
+    if len(text) > 1000:
+        return jsonify({'error': 'Text must be less than 1000 characters'}), 400
+    
+    # clones a voice for caller-supplied text, so it shares the deliberations' admission limits
+    permit, busy = _admit()
+    if busy:
+        return busy
+    
+    chunks = engine.tts_service.stream_speech(
+        speaker_tag=member.speaker_tag,
+        ref_audio_path=member.ref_audio,
+        ref_transcript=member.ref_transcript,
+        text=text
+    )
+    # wait for the first audio before answering, so a full TTS limiter can still be a 429
+    try:
+        first = next(chunks, b"")
+    except Overloaded as e:
+        permit.release()
+        body, headers = overloaded_response(e)
+        print(f"✗ Upstream busy: {str(e)}")
+        return jsonify(body), 429, headers
+    except Exception as e:
+        print(f"✗ Speech stream for {member.name} failed: {str(e)}")
+        print(traceback.format_exc())
+        first = b""
+    
+    def generate():
+        yield wav_stream_header()
+        total = len(first)
+        try:
+            if first:
+                yield first
+            for chunk in chunks:
+                total += len(chunk)
+                yield chunk
+        except Exception as e:
+            print(f"✗ Speech stream for {member.name} failed: {str(e)}")
+            print(traceback.format_exc())
+        finally:
+            chunks.close()
+        print(f"✓ Streamed {total} bytes of audio for {member.name}")
+    
+    response = Response(
+        stream_with_context(generate()),
+        mimetype='audio/wav',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    response.call_on_close(permit.release)
+    return response
+
+
 @app.route('/api/transcribe', methods=['POST'])
 def transcribe_audio():
-    """transcribe audio file to text using Gemini ASR"""
+    """transcribe audio file to text with the configured ASR backend(s)"""
     try:
         if not asr_service:
             return jsonify({'error': 'ASR service not configured'}), 500
@@ -225,6 +400,13 @@ def transcribe_audio():
             'language': result.get('language', 'en')
         })
     
+    except UploadTooLarge as e:
+        print(f"✗ Rejected audio upload: {str(e)}")
+        return jsonify({'error': str(e)}), 413
+    except Overloaded as e:
+        body, headers = overloaded_response(e)
+        print(f"✗ Upstream busy: {str(e)}")
+        return jsonify(body), 429, headers
     except Exception as e:
         print(f"Error transcribing audio: {str(e)}")
         print(traceback.format_exc())
@@ -237,18 +419,7 @@ def transcribe_audio():
 @app.route('/', methods=['GET'])
 def index():
     """root endpoint with API info"""
-    return jsonify({
-        'name': 'The Jury API',
-        'version': '2.0.0',
-        'description': 'AI voice-based conversation with We Bare Bears personalities - Powered by Gemini + BosonAI',
-        'endpoints': {
-            'GET /health': 'Health check',
-            'GET /api/jury-members': 'List all We Bare Bears jury members',
-            'POST /api/transcribe': 'Transcribe audio to text using Gemini',
-            'POST /api/opinions': 'Generate bear opinions with audio (accepts audio file or JSON with question)',
-            'GET /api/audio/<session_id>/<index>': 'Get audio file for a bear response'
-        }
-    })
+    return jsonify(API_INFO)
 
 
 if __name__ == '__main__':
@@ -260,8 +431,7 @@ if __name__ == '__main__':
     print(f"Services:")
     print(f"  - BosonAI TTS: {'OK' if BOSON_API_KEY else 'NOT CONFIGURED'}")
     print(f"  - Google Gemini LLM: {'OK' if GOOGLE_API_KEY else 'NOT CONFIGURED'}")
-    print(f"  - Gemini ASR: {'OK' if asr_service else 'NOT CONFIGURED'}")
+    print(f"  - ASR: {', '.join(name for name, _ in asr_backends) if asr_service else 'NOT CONFIGURED'}")
     print(f"Engine: {'Ready' if engine else 'Not initialized'}")
     print("="*50 + "\n")
     app.run(debug=True, host='0.0.0.0', port=port)
-
@@ -0,0 +1,465 @@
+"""asyncio-native server exposing the same routes as app.py
+
+every upstream call (Gemini, BosonAI) is awaited on the event loop instead of
+holding a worker thread, so one process can keep hundreds of deliberations in
+flight. production entry point:
+
+    hypercorn asgi:app --bind 0.0.0.0:8080
+
+or `python asgi.py`, which does the same using PORT.
+"""
+import io
+import os
+import time
+import asyncio
+import traceback
+from quart import Quart, Response, g, request, jsonify, send_file
+from quart_cors import cors
+from services import (
+    wav_stream_header, negotiate_format, Overloaded, UploadTooLarge,
+    span, add_bytes, new_request_id, observe_request, render_metrics
+)
+from runtime import (
+    BOSON_API_KEY, GOOGLE_API_KEY, API_INFO, engine, asr_service, asr_backends,
+    readiness, WARMUP, WARMUP_CONNECTIONS, WARMUP_PRIME,
+    opinion_admission, client_key, overloaded_response,
+    health_payload, readiness_payload, jury_members_payload, validate_question, open_conversation, turn_history, record_turn, is_truthy,
+    aspeculative_transcribe, new_session, get_session_audio, build_opinions_response, sse, deliberation_sse,
+    AUDIO_CACHE_MAX_AGE
+)
+
+app = cors(Quart(__name__), allow_origin="*", expose_headers=['X-Request-ID', 'Retry-After'])
+
+# the shared warm-up only covers the threaded clients; this server's requests use the asyncio ones
+if WARMUP and engine:
+    readiness.expect('llm_async', 'tts_async')
+
+
+async def _warm_async_clients():
+    async def step(name, warm):
+        with readiness.step(name):
+            await warm
+
+    await asyncio.gather(
+        step('llm_async', engine.llm_service.awarm_up(prime=WARMUP_PRIME)),
+        step('tts_async', engine.tts_service.awarm_up(WARMUP_CONNECTIONS, prime=WARMUP_PRIME))
+    )
+
+
+@app.before_serving
+async def start_warmup():
+    """open the asyncio Gemini channel and BosonAI pool on the serving loop without delaying start-up"""
+    if WARMUP and engine:
+        app.add_background_task(_warm_async_clients)
+
+
+@app.before_request
+async def start_request():
+    """tag the request with an id (the caller's X-Request-ID if given) that every stage logs under"""
+    g.started = time.perf_counter()
+    g.request_id = new_request_id(request.headers.get('X-Request-ID'))
+
+
+@app.after_request
+async def finish_request(response):
+    response.headers['X-Request-ID'] = g.get('request_id', '')
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    observe_request(request.method, route, response.status_code, time.perf_counter() - g.get('started', time.perf_counter()))
+    return response
+
+
+@app.route('/health', methods=['GET'])
+async def health_check():
+    """health check endpoint"""
+    return jsonify(health_payload())
+
+
+@app.route('/health/ready', methods=['GET'])
+async def readiness_check():
+    """readiness probe: 503 while start-up warm-up is still running"""
+    body, status = readiness_payload()
+    return jsonify(body), status
+
+
+@app.route('/metrics', methods=['GET'])
+async def metrics():
+    """stage latency histograms, byte counters and cache/queue gauges in Prometheus text format"""
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/api/jury-members', methods=['GET'])
+async def get_jury_members():
+    """return list of jury members"""
+    if not engine:
+        return jsonify({'error': 'Engine not initialized'}), 500
+    
+    return jsonify(jury_members_payload())
+
+
+async def _parse_opinion_request():
+    """read the question and conversation history from a JSON or multipart request
+    
+    the history is validated and compacted like app.py's
+    
+    Returns:
+        (question, conversation_history, conversation_id, transcribed, use_cache, opinion_tasks, error)
+        where opinion_tasks were started speculatively on a draft transcript (or None)
+        and error is a (response, status) tuple or None
+    """
+    files = await request.files
+    form = await request.form
+    data = await request.get_json(silent=True) or {}
+    use_cache = not is_truthy(request.args.get('fresh') or form.get('fresh') or data.get('fresh'))
+    transcribed = False
+    opinion_tasks = None
+    
+    def failure(message, status):
+        return None, None, None, False, use_cache, None, (jsonify({'error': message}), status)
+    
+    if 'audio' in files:
+        if not asr_service:
+            return failure('ASR service not configured', 500)
+        
+        audio_file = files['audio']
+        if audio_file.filename == '':
+            return failure('No file selected', 400)
+        
+        conversation_id, previous, error = open_conversation(form.get('conversation_history'),
+                                                             form.get('conversation_id'), form.get('session_id'))
+        if error:
+            return failure(error, 400)
+        
+        print(f"Transcribing audio file: {audio_file.filename}")
+        try:
+            question, opinion_tasks = await aspeculative_transcribe(
+                audio_file, lambda text: turn_history(previous, text, conversation_id))
+        except UploadTooLarge as e:
+            return failure(str(e), 413)
+        transcribed = True
+        print(f"Transcription: {question}")
+    else:
+        if 'question' not in data:
+            return failure('Question or audio file is required', 400)
+        
+        question = data['question'].strip()
+        conversation_id, previous, error = open_conversation(data.get('conversation_history'),
+                                                             data.get('conversation_id'),
+                                                             data.get('session_id'), question)
+        if error:
+            return failure(error, 400)
+    
+    error = validate_question(question)
+    if error:
+        return failure(error, 400)
+    
+    if not engine:
+        return failure('Engine not initialized', 500)
+    
+    conversation_history = turn_history(previous, question, conversation_id)
+    return question, conversation_history, conversation_id, transcribed, use_cache, opinion_tasks, None
+
+
+async def _admit():
+    """wait for an admission slot (deliberations and speech streams) without blocking the loop
+    
+    Returns:
+        (permit, None) once admitted, or (None, 429 response) if the queue is full or the wait timed out
+    """
+    try:
+        permit = await opinion_admission.aacquire(client_key(request.headers.get('X-Forwarded-For'),
+                                                             request.remote_addr))
+        return permit, None
+    except Overloaded as e:
+        body, headers = overloaded_response(e)
+        print(f"✗ Rejected {request.path} request: {str(e)}")
+        return None, (jsonify(body), 429, headers)
+
+
+@app.route('/api/opinions', methods=['POST'])
+async def generate_opinions():
+    """generate bear opinions with audio for a question or audio file"""
+    permit, busy = await _admit()
+    if busy:
+        return busy
+    try:
+        (question, conversation_history, conversation_id, _,
+         use_cache, opinion_tasks, error) = await _parse_opinion_request()
+        if error:
+            return error
+        
+        print(f"\n{'='*60}")
+        print(f"Generating opinions for: {question}")
+        print(f"Conversation history length: {len(conversation_history)}")
+        print(f"{'='*60}\n")
+        
+        result = await engine.agenerate_deliberation_with_audio(question, conversation_history,
+                                                                use_cache=use_cache,
+                                                                opinion_tasks=opinion_tasks)
+        
+        # disk writes are small but still blocking
+        return jsonify(await asyncio.to_thread(build_opinions_response, question, result, conversation_id))
+    
+    except Overloaded as e:
+        body, headers = overloaded_response(e)
+        print(f"✗ Upstream busy: {str(e)}")
+        return jsonify(body), 429, headers
+    except Exception as e:
+        print(f"\n{'='*60}")
+        print(f"✗ ERROR generating opinions: {str(e)}")
+        print(f"{'='*60}")
+        print(traceback.format_exc())
+        print(f"{'='*60}\n")
+        error_message = str(e)
+        return jsonify({
+            'error': f'Failed to generate opinions: {error_message}',
+            'details': error_message
+        }), 500
+    finally:
+        permit.release()
+
+
+@app.route('/api/opinions/stream', methods=['POST'])
+async def stream_opinions():
+    """stream bear opinions as Server-Sent Events while audio is still rendering
+    
+    emits the same events as the Flask server's /api/opinions/stream; the
+    deliberation slot is held until the stream finishes or is cancelled
+    """
+    permit, busy = await _admit()
+    if busy:
+        return busy
+    # generate()'s finally never runs if the client disconnects before Quart starts
+    # iterating the body, so also clean up when the task serving the response ends
+    asyncio.current_task().add_done_callback(lambda _: permit.release())
+    try:
+        (question, conversation_history, conversation_id, transcribed,
+         use_cache, opinion_tasks, error) = await _parse_opinion_request()
+        if error:
+            permit.release()
+            return error
+    except Overloaded as e:
+        permit.release()
+        body, headers = overloaded_response(e)
+        return jsonify(body), 429, headers
+    except Exception as e:
+        permit.release()
+        print(f"✗ ERROR preparing opinion stream: {str(e)}")
+        print(traceback.format_exc())
+        return jsonify({
+            'error': f'Failed to generate opinions: {str(e)}',
+            'details': str(e)
+        }), 500
+    
+    session_id = new_session()
+    request_id = g.request_id
+    
+    asyncio.current_task().add_done_callback(lambda _: engine.cancel_speculation(opinion_tasks))
+    
+    async def generate():
+        # the body may be iterated outside the request's task, so restore its id
+        new_request_id(request_id)
+        try:
+            if transcribed:
+                yield sse('transcription', {'text': question})
+            yield sse('session', {'session_id': session_id, 'conversation_id': conversation_id, 'question': question})
+            
+            counts = {'opinion': 0, 'audio_ready': 0}
+            opinions = {}
+            try:
+                async for event in engine.aiter_deliberation_with_audio(question, conversation_history,
+                                                                        use_cache=use_cache,
+                                                                        opinion_tasks=opinion_tasks):
+                    name, message = await asyncio.to_thread(deliberation_sse, event, session_id)
+                    counts[name] = counts.get(name, 0) + 1
+                    if name == 'opinion':
+                        opinions[event['index']] = (event['member'].name, event['text'])
+                    yield message
+            except Exception as e:
+                print(f"✗ ERROR streaming opinions: {str(e)}")
+                print(traceback.format_exc())
+                yield sse('error', {'error': f'Failed to generate opinions: {str(e)}'})
+            
+            record_turn(conversation_id, session_id, question, [opinions[index] for index in sorted(opinions)])
+            print(f"✓ Streamed {counts['opinion']} opinions, {counts['audio_ready']} audio files for session {session_id}")
+            yield sse('done', {'session_id': session_id, 'opinions': counts['opinion'], 'audio_files': counts['audio_ready']})
+        finally:
+            permit.release()
+    
+    response = Response(generate(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.timeout = None  # deliberations outlive the default response timeout
+    return response
+
+
+@app.route('/api/audio/<session_id>/<int:index>', methods=['GET'])
+async def get_audio(session_id, index):
+    """serve audio file for a specific session and bear index (format-negotiated, Range and ETag aware)"""
+    try:
+        fmt = negotiate_format(request.args.get('format'), request.headers.get('Accept'))
+        if not fmt:
+            return jsonify({'error': 'Unsupported audio format'}), 400
+        
+        with span('audio_serve'):
+            # a first request for a compressed variant runs the encoder
+            blob = await asyncio.to_thread(get_session_audio, session_id, index, fmt)
+            
+            if not blob:
+                return jsonify({'error': 'Audio file not found'}), 404
+            
+            response = await send_file(
+                io.BytesIO(blob.data) if blob.data is not None else blob.path,
+                mimetype=blob.mimetype,
+                conditional=True,
+                etag=blob.etag,
+                last_modified=blob.last_modified,
+                max_age=AUDIO_CACHE_MAX_AGE
+            )
+        response.cache_control.private = True
+        response.cache_control.immutable = True
+        response.vary.add('Accept')
+        # what actually goes out: a Range slice, or nothing for a 304
+        add_bytes('response_audio', response.content_length or 0)
+        return response
+    
+    except Exception as e:
+        print(f"Error serving audio: {str(e)}")
+        return jsonify({'error': 'Failed to serve audio'}), 500
+
+
+@app.route('/api/speech/stream', methods=['GET', 'POST'])
+async def stream_speech():
+    """stream one bear's voice as a progressive WAV while BosonAI is still synthesizing"""
+    if not engine:
+        return jsonify({'error': 'Engine not initialized'}), 500
+    
+    data = (await request.get_json(silent=True) or {}) if request.method == 'POST' else request.args
+    member_id = data.get('member_id')
+    text = (data.get('text') or '').strip()
+    
+    member = engine.get_member(member_id) if member_id else None
+    if not member:
+        return jsonify({'error': 'Valid member_id is required'}), 400
+    if not text:
+        return jsonify({'error': 'Text is required'}), 400
+    if len(text) > 1000:
+        return jsonify({'error': 'Text must be less than 1000 characters'}), 400
+    
+    # clones a voice for caller-supplied text, so it shares the deliberations' admission limits
+    permit, busy = await _admit()
+    if busy:
+        return busy
+    # released here too in case the client leaves before the body is iterated
+    asyncio.current_task().add_done_callback(lambda _: permit.release())
+    
+    chunks = engine.tts_service.astream_speech(
+        speaker_tag=member.speaker_tag,
+        ref_audio_path=member.ref_audio,
+        ref_transcript=member.ref_transcript,
+        text=text
+    )
+    # wait for the first audio before answering, so a full TTS limiter can still be a 429
+    try:
+        first = await chunks.__anext__()
+    except StopAsyncIteration:
+        first = b""
+    except Overloaded as e:
+        permit.release()
+        body, headers = overloaded_response(e)
+        print(f"✗ Upstream busy: {str(e)}")
+        return jsonify(body), 429, headers
+    except Exception as e:
+        print(f"✗ Speech stream for {member.name} failed: {str(e)}")
+        print(traceback.format_exc())
+        first = b""
+    
+    async def generate():
+        yield wav_stream_header()
+        total = len(first)
+        try:
+            if first:
+                yield first
+            async for chunk in chunks:
+                total += len(chunk)
+                yield chunk
+        except Exception as e:
+            print(f"✗ Speech stream for {member.name} failed: {str(e)}")
+            print(traceback.format_exc())
+        finally:
+            await chunks.aclose()
+            permit.release()
+        print(f"✓ Streamed {total} bytes of audio for {member.name}")
+    
+    response = Response(generate(), mimetype='audio/wav',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    response.timeout = None
+    return response
+
+
+@app.route('/api/transcribe', methods=['POST'])
+async def transcribe_audio():
+    """transcribe audio file to text with the configured ASR backend(s)"""
+    try:
+        if not asr_service:
+            return jsonify({'error': 'ASR service not configured'}), 500
+        
+        files = await request.files
+        if 'audio' not in files:
+            return jsonify({'error': 'Audio file is required'}), 400
+        
+        audio_file = files['audio']
+        
+        if audio_file.filename == '':
+            return jsonify({'error': 'No file selected'}), 400
+        
+        print(f"Transcribing audio file: {audio_file.filename}")
+        
+        result = await asr_service.atranscribe_audio(audio_file)
+        
+        print(f"Transcription result: {result['text'][:50]}...")
+        
+        return jsonify({
+            'transcript': result['text'],
+            'language': result.get('language', 'en')
+        })
+    
+    except UploadTooLarge as e:
+        print(f"✗ Rejected audio upload: {str(e)}")
+        return jsonify({'error': str(e)}), 413
+    except Overloaded as e:
+        body, headers = overloaded_response(e)
+        print(f"✗ Upstream busy: {str(e)}")
+        return jsonify(body), 429, headers
+    except Exception as e:
+        print(f"Error transcribing audio: {str(e)}")
+        print(traceback.format_exc())
+        return jsonify({
+            'error': 'Failed to transcribe audio',
+            'details': str(e)
+        }), 500
+
+
+@app.route('/', methods=['GET'])
+async def index():
+    """root endpoint with API info"""
+    return jsonify(API_INFO)
+
+
+if __name__ == '__main__':
+    from hypercorn.asyncio import serve
+    from hypercorn.config import Config
+    
+    port = int(os.getenv('PORT', 8080))
+    print("\n" + "="*50)
+    print("THE JURY - We Bare Bears Council (async)")
+    print("="*50)
+    print(f"Port: {port}")
+    print(f"Services:")
+    print(f"  - BosonAI TTS: {'OK' if BOSON_API_KEY else 'NOT CONFIGURED'}")
+    print(f"  - Google Gemini LLM: {'OK' if GOOGLE_API_KEY else 'NOT CONFIGURED'}")
+    print(f"  - ASR: {', '.join(name for name, _ in asr_backends) if asr_service else 'NOT CONFIGURED'}")
+    print(f"Engine: {'Ready' if engine else 'Not initialized'}")
+    print("="*50 + "\n")
+    
+    config = Config()
+    config.bind = [f"0.0.0.0:{port}"]
+    asyncio.run(serve(app, config))
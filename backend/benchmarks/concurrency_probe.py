@@ -0,0 +1,72 @@
+"""fire concurrent /api/opinions requests at a running server and report throughput
+
+compare the blocking Flask dev server with the asyncio server:
+
+    python app.py                                  # terminal 1
+    python -m benchmarks.concurrency_probe -c 32   # terminal 2
+    
+    hypercorn asgi:app --bind 0.0.0.0:8080         # terminal 1
+    python -m benchmarks.concurrency_probe -c 32   # terminal 2
+
+use fresh=1 (the default) so the deliberation cache doesn't flatter either server
+"""
+import argparse
+import json
+import statistics
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _post_opinion(url: str, question: str, timeout: float):
+    """one /api/opinions call, returning (latency seconds, status or error name)"""
+    body = json.dumps({'question': question, 'fresh': True}).encode('utf-8')
+    req = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            resp.read()
+            status = str(resp.status)
+    except urllib.error.HTTPError as e:
+        status = str(e.code)
+    except Exception as e:
+        status = type(e).__name__
+    return time.perf_counter() - start, status
+
+
+def run(base_url: str, concurrency: int, requests: int, timeout: float):
+    """send `requests` calls with `concurrency` in flight and print a summary"""
+    url = base_url.rstrip('/') + '/api/opinions'
+    questions = [f"Should I adopt pet number {i}?" for i in range(requests)]
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda q: _post_opinion(url, q, timeout), questions))
+    elapsed = time.perf_counter() - start
+    
+    ok = sorted(latency for latency, status in results if status == '200')
+    statuses = {}
+    for _, status in results:
+        statuses[status] = statuses.get(status, 0) + 1
+    
+    print(f"{requests} requests, concurrency {concurrency}, {elapsed:.1f}s wall")
+    print(f"  throughput: {len(ok) / elapsed:.2f} successful req/s")
+    print(f"  statuses:   {statuses}")
+    if ok:
+        p95 = ok[min(len(ok) - 1, int(len(ok) * 0.95))]
+        print(f"  latency:    p50 {statistics.median(ok):.2f}s  p95 {p95:.2f}s  max {ok[-1]:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrency probe for /api/opinions")
+    parser.add_argument('--url', default='http://localhost:8080')
+    parser.add_argument('-c', '--concurrency', type=int, default=16)
+    parser.add_argument('-n', '--requests', type=int, default=None, help='total requests (default: 2x concurrency)')
+    parser.add_argument('--timeout', type=float, default=900)
+    args = parser.parse_args()
+    run(args.url, args.concurrency, args.requests or args.concurrency * 2, args.timeout)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,367 @@
+"""local stand-ins for Gemini, BosonAI and Whisper so the backend can be exercised without keys or network
+
+each fake answers with canned text or audio after a latency drawn from a
+lognormal distribution (set by its p50 and p95), fails a configurable share
+of requests with a 500, and returns payloads of a configurable size. point
+the backend at them with
+
+    GEMINI_BASE_URL=http://127.0.0.1:<port>      (Gemini opinions, panels, summaries and ASR)
+    BOSON_BASE_URL=http://127.0.0.1:<port>/v1    (voice cloning, fallback voice, streaming)
+    OPENAI_BASE_URL=http://127.0.0.1:<port>/v1   (Whisper ASR)
+
+all three are served from one port. run standalone (from backend/) to test a
+real server process:
+
+    python -m benchmarks.fake_upstreams --port 9100 --llm-p50 0.8 --tts-p50 3 --tts-errors 0.05
+"""
+import argparse
+import base64
+import json
+import math
+import random
+import re
+import struct
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+
+SAMPLE_RATE = 24000
+
+WORDS = ("honestly this could be the best idea we have had all week so let us think it through "
+         "carefully before anyone gets too excited about snacks or adventures or the weather").split()
+
+
+@dataclass
+class Profile:
+    """how one fake endpoint behaves"""
+    p50: float = 0.5              # median latency in seconds
+    p95: Optional[float] = None   # 95th percentile latency; None means twice the median
+    error_rate: float = 0.0       # share of requests answered with a 500
+
+    def latency(self, rng: random.Random) -> float:
+        if self.p50 <= 0:
+            return 0.0
+        sigma = math.log(max(self.p95 or self.p50 * 2, self.p50) / self.p50) / 1.645
+        return self.p50 * math.exp(rng.gauss(0, sigma))
+
+    def fails(self, rng: random.Random) -> bool:
+        return self.error_rate > 0 and rng.random() < self.error_rate
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # the stdlib default backlog of 5 drops connects under load, adding 1s+ SYN retries to the tail
+    request_queue_size = 256
+
+
+def _tone(seconds: float) -> bytes:
+    """PCM16 mono 24kHz of a quiet 220Hz tone (less compressible than silence)"""
+    frames = int(seconds * SAMPLE_RATE)
+    return b"".join(struct.pack("<h", int(3000 * math.sin(2 * math.pi * 220 * i / SAMPLE_RATE)))
+                    for i in range(frames))
+
+
+class FakeUpstreams:
+    """one HTTP server playing Gemini, BosonAI and Whisper"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 llm: Profile = None, tts: Profile = None, asr: Profile = None,
+                 llm_words: int = 45, audio_seconds: float = 4.0, stream_chunks: int = 10,
+                 seed: Optional[int] = None):
+        """
+        Args:
+            host: interface to bind
+            port: port to bind; 0 picks a free one (see .port)
+            llm: Gemini text behaviour (opinions, panels, summaries)
+            tts: BosonAI behaviour (cloning, fallback voice, streams)
+            asr: transcription behaviour (Whisper, and Gemini requests carrying audio)
+            llm_words: words per generated opinion
+            audio_seconds: length of every synthesized clip
+            stream_chunks: chunks a streamed clip is split into
+            seed: seed for latency and failure draws
+        """
+        self.llm = llm or Profile(0.8, 1.6)
+        self.tts = tts or Profile(3.0, 6.0)
+        self.asr = asr or Profile(1.0, 2.0)
+        self.llm_words = llm_words
+        self.stream_chunks = max(1, stream_chunks)
+        self.pcm = _tone(audio_seconds)
+        self.audio_b64 = base64.b64encode(self.pcm).decode("ascii")
+
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._counts: Dict[str, Dict[str, int]] = {}
+
+        self.server = _Server((host, port), self._handler())
+        self.host, self.port = self.server.server_address[:2]
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self) -> "FakeUpstreams":
+        """serve from a background thread"""
+        self._thread = threading.Thread(target=self.server.serve_forever, name="fake-upstreams", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def env(self) -> Dict[str, str]:
+        """environment that points the backend (and its SDKs) at this server"""
+        return {
+            'GEMINI_BASE_URL': self.url,
+            'BOSON_BASE_URL': f"{self.url}/v1",
+            'OPENAI_BASE_URL': f"{self.url}/v1",
+            'GOOGLE_API_KEY': 'offline',
+            'BOSON_API_KEY': 'offline',
+            'OPENAI_API_KEY': 'offline',
+        }
+
+    def _draw(self, profile: Profile):
+        """(latency seconds, whether to fail) for one request"""
+        with self._rng_lock:
+            return profile.latency(self._rng), profile.fails(self._rng)
+
+    def _count(self, endpoint: str, key: str, amount: int = 1):
+        with self._lock:
+            counts = self._counts.setdefault(endpoint, {'requests': 0, 'errors': 0, 'bytes_in': 0, 'bytes_out': 0})
+            counts[key] += amount
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """requests, injected errors and bytes per endpoint"""
+        with self._lock:
+            return {endpoint: dict(counts) for endpoint, counts in self._counts.items()}
+
+    def _text(self, words: int) -> str:
+        with self._rng_lock:
+            start = self._rng.randrange(len(WORDS))
+        return " ".join(WORDS[(start + i) % len(WORDS)] for i in range(words)).capitalize() + "."
+
+    # --- Gemini ---
+
+    def gemini(self, body: dict):
+        """(endpoint, profile, response body) for a generateContent request"""
+        parts = [part for content in body.get('contents', []) for part in content.get('parts', [])]
+        prompt = " ".join(part.get('text', '') for part in parts)
+        config = body.get('generationConfig') or body.get('generation_config') or {}
+        mime = config.get('responseMimeType') or config.get('response_mime_type')
+
+        if any('inlineData' in part or 'inline_data' in part for part in parts):
+            endpoint, profile, text = 'gemini_asr', self.asr, "Should we go camping this weekend even if it rains?"
+        elif mime == 'application/json':
+            ids = re.findall(r'=== Character "([^"]+)"', prompt)
+            endpoint, profile = 'gemini_panel', self.llm
+            text = json.dumps({persona_id: self._text(self.llm_words) for persona_id in ids})
+        else:
+            endpoint, profile, text = 'gemini_text', self.llm, self._text(self.llm_words)
+
+        return endpoint, profile, {
+            'candidates': [{
+                'content': {'parts': [{'text': text}], 'role': 'model'},
+                'finishReason': 'STOP',
+                'index': 0
+            }],
+            'usageMetadata': {
+                'promptTokenCount': len(prompt) // 4 + 1,
+                'candidatesTokenCount': len(text) // 4 + 1,
+                'totalTokenCount': (len(prompt) + len(text)) // 4 + 2
+            }
+        }
+
+    # --- BosonAI ---
+
+    def completion(self) -> dict:
+        return {
+            'id': 'chatcmpl-offline',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': 'higgs-audio-generation-Hackathon',
+            'choices': [{
+                'index': 0,
+                'finish_reason': 'stop',
+                'message': {
+                    'role': 'assistant',
+                    'content': '',
+                    'audio': {'id': 'audio-offline', 'data': self.audio_b64, 'expires_at': 0, 'transcript': ''}
+                }
+            }]
+        }
+
+    def completion_chunks(self):
+        """SSE lines of a streamed completion, audio split into stream_chunks pieces"""
+        size = -(-len(self.pcm) // self.stream_chunks)
+        size += size % 2  # keep chunks sample-aligned
+        for offset in range(0, len(self.pcm), size):
+            chunk = {
+                'id': 'chatcmpl-offline',
+                'object': 'chat.completion.chunk',
+                'created': int(time.time()),
+                'model': 'higgs-audio-generation-Hackathon',
+                'choices': [{
+                    'index': 0,
+                    'delta': {'audio': {'data': base64.b64encode(self.pcm[offset:offset + size]).decode('ascii')}},
+                    'finish_reason': None
+                }]
+            }
+            yield f"data: {json.dumps(chunk)}\n\n".encode('utf-8')
+        yield b"data: [DONE]\n\n"
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _body(self) -> bytes:
+                length = int(self.headers.get('Content-Length') or 0)
+                return self.rfile.read(length) if length else b""
+
+            def _send(self, status: int, body: bytes, content_type: str):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _fail(self, endpoint: str):
+                fake._count(endpoint, 'errors')
+                body = json.dumps({'error': {'message': 'injected upstream failure', 'code': 500}}).encode('utf-8')
+                self._send(500, body, 'application/json')
+
+            def _chunk(self, data: bytes):
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+            def do_GET(self):
+                path = self.path.split('?', 1)[0]
+                if path == '/stats':
+                    body = fake.stats()
+                elif path.endswith('/v1/models'):
+                    # what the backend's warm-up lists to open connections
+                    fake._count('models', 'requests')
+                    body = {'object': 'list', 'data': [{'id': 'higgs-audio-generation-Hackathon', 'object': 'model',
+                                                       'created': 0, 'owned_by': 'offline'}]}
+                elif '/models/' in path:
+                    fake._count('models', 'requests')
+                    name = path[path.index('/models/') + 1:]
+                    body = {'name': name, 'baseModelId': name.split('/')[-1], 'version': '001',
+                            'displayName': name.split('/')[-1], 'description': 'offline stand-in',
+                            'inputTokenLimit': 1048576, 'outputTokenLimit': 65536,
+                            'supportedGenerationMethods': ['generateContent']}
+                else:
+                    self._send(404, b'{}', 'application/json')
+                    return
+                self._send(200, json.dumps(body).encode('utf-8'), 'application/json')
+
+            def do_POST(self):
+                raw = self._body()
+                path = self.path.split('?', 1)[0]
+
+                if path.endswith(':generateContent'):
+                    endpoint, profile, response = fake.gemini(json.loads(raw or b'{}'))
+                elif path.endswith('/chat/completions'):
+                    stream = bool(json.loads(raw or b'{}').get('stream'))
+                    endpoint, profile, response = ('boson_stream' if stream else 'boson_clone'), fake.tts, None
+                elif path.endswith('/audio/speech'):
+                    endpoint, profile, response = 'boson_speech', fake.tts, None
+                elif path.endswith('/audio/transcriptions'):
+                    endpoint, profile, response = 'whisper', fake.asr, None
+                else:
+                    self._send(404, b'{}', 'application/json')
+                    return
+
+                fake._count(endpoint, 'requests')
+                fake._count(endpoint, 'bytes_in', len(raw))
+                latency, fails = fake._draw(profile)
+
+                if endpoint == 'boson_stream' and not fails:
+                    # first audio after a third of the latency, the rest spread over the remainder
+                    time.sleep(latency / 3)
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'text/event-stream')
+                    self.send_header('Transfer-Encoding', 'chunked')
+                    self.end_headers()
+                    chunks = list(fake.completion_chunks())
+                    for index, data in enumerate(chunks):
+                        if index:
+                            time.sleep(latency * 2 / 3 / len(chunks))
+                        self._chunk(data)
+                        fake._count(endpoint, 'bytes_out', len(data))
+                    self.wfile.write(b"0\r\n\r\n")
+                    return
+
+                time.sleep(latency)
+                if fails:
+                    self._fail(endpoint)
+                    return
+
+                if endpoint == 'boson_speech':
+                    body, content_type = fake.pcm, 'application/octet-stream'
+                elif endpoint == 'whisper':
+                    body, content_type = b"Should we go camping this weekend even if it rains?", 'text/plain'
+                else:
+                    body = json.dumps(response if response is not None else fake.completion()).encode('utf-8')
+                    content_type = 'application/json'
+                fake._count(endpoint, 'bytes_out', len(body))
+                self._send(200, body, content_type)
+
+        return Handler
+
+
+def add_profile_arguments(parser: argparse.ArgumentParser):
+    """--llm-p50, --tts-errors, ... shared by the tools that start a FakeUpstreams"""
+    for name, p50 in (('llm', 0.8), ('tts', 3.0), ('asr', 1.0)):
+        parser.add_argument(f'--{name}-p50', type=float, default=p50, help=f'median {name} latency (s)')
+        parser.add_argument(f'--{name}-p95', type=float, default=None,
+                            help=f'95th percentile {name} latency (s, default twice the median)')
+        parser.add_argument(f'--{name}-errors', type=float, default=0.0, help=f'share of {name} requests that fail')
+    parser.add_argument('--llm-words', type=int, default=45, help='words per generated opinion')
+    parser.add_argument('--audio-seconds', type=float, default=4.0, help='length of each synthesized clip')
+    parser.add_argument('--stream-chunks', type=int, default=10, help='chunks per streamed clip')
+    parser.add_argument('--seed', type=int, default=None)
+
+
+def from_arguments(args: argparse.Namespace, host: str = "127.0.0.1", port: int = 0) -> FakeUpstreams:
+    return FakeUpstreams(
+        host, port,
+        llm=Profile(args.llm_p50, args.llm_p95, args.llm_errors),
+        tts=Profile(args.tts_p50, args.tts_p95, args.tts_errors),
+        asr=Profile(args.asr_p50, args.asr_p95, args.asr_errors),
+        llm_words=args.llm_words,
+        audio_seconds=args.audio_seconds,
+        stream_chunks=args.stream_chunks,
+        seed=args.seed
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve fake Gemini/BosonAI/Whisper endpoints")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9100)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    fake = from_arguments(args, args.host, args.port)
+    print(f"✓ Fake upstreams on {fake.url} (GET /stats for counts); point the backend at them with:")
+    for key, value in fake.env().items():
+        print(f"  export {key}={value}")
+    try:
+        fake.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(fake.stats(), indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,336 @@
+"""open-loop load generator for a running server, replaying a trace of API requests
+
+unlike concurrency_probe (a fixed number of requests in flight), requests go
+out at the times the trace says whether or not earlier ones have finished,
+which is how real traffic behaves when the server falls behind. latency is
+measured from each request's scheduled time, so client-side lag counts
+against the server instead of hiding it.
+
+a trace is JSON lines, one request each:
+
+    {"at": 0.0,  "kind": "opinions", "question": "Should I adopt a cat?", "client": "c1"}
+    {"at": 1.7,  "kind": "opinions_audio", "audio": "../ref-audio/panda.wav", "client": "c2"}
+    {"at": 2.05, "kind": "transcribe", "audio": "../ref-audio/panda.wav"}
+
+    at       seconds from the start of the run
+    kind     opinions (JSON question), opinions_audio (multipart recording) or transcribe
+    client   optional, sent as X-Forwarded-For; per-client admission limits only key on it
+             when the server runs with TRUSTED_PROXIES=1 (as if behind one proxy)
+    fetch    optional, false skips fetching the answer's clips from /api/audio
+
+each opinions answer's clips are fetched from /api/audio as a browser would,
+and reported as kind "audio". session ids can't be replayed, so fetches are
+always derived from the live answer.
+
+usage (from backend/):
+    python -m benchmarks.load_test --rate 2 --duration 120 --save-trace peak.jsonl
+    python -m benchmarks.load_test --trace peak.jsonl --speed 1.5 --slo opinions=45,audio=1
+    python -m benchmarks.load_test --rate 1 --mix opinions=0.5,opinions_audio=0.3,transcribe=0.2 --json
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+KINDS = ('opinions', 'opinions_audio', 'transcribe')
+
+REF_AUDIO = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                         'ref-audio', 'panda.wav')
+
+QUESTIONS = [
+    "Should I adopt a second cat?",
+    "Is it worth learning to cook instead of ordering takeout?",
+    "Should we go camping this weekend even though it might rain?",
+    "Would you move to a new city for a job you're only kind of excited about?",
+    "Is it okay to skip the gym today if I went yesterday?",
+    "Should I tell my friend their startup idea has already been done?",
+]
+
+# seconds within which a request of each kind counts as meeting its SLO
+DEFAULT_SLOS = {'opinions': 60.0, 'opinions_audio': 75.0, 'transcribe': 10.0, 'audio': 2.0}
+
+
+def _parse_pairs(text: str, cast=float) -> dict:
+    """'a=1,b=2' -> {'a': 1.0, 'b': 2.0}"""
+    pairs = {}
+    for item in filter(None, (part.strip() for part in (text or '').split(','))):
+        key, _, value = item.partition('=')
+        pairs[key.strip()] = cast(value)
+    return pairs
+
+
+def synthetic_trace(rate: float, duration: float, mix: dict, clients: int, audio: str,
+                    seed: int = None) -> list:
+    """Poisson arrivals at `rate` requests/s for `duration` seconds, kinds drawn from `mix`"""
+    rng = random.Random(seed)
+    kinds = [kind for kind in KINDS if mix.get(kind)]
+    weights = [mix[kind] for kind in kinds]
+    trace = []
+    at = rng.expovariate(rate)
+    while at < duration:
+        kind = rng.choices(kinds, weights)[0]
+        entry = {'at': round(at, 3), 'kind': kind, 'client': f"client-{rng.randrange(clients)}"}
+        if kind == 'opinions':
+            entry['question'] = rng.choice(QUESTIONS)
+        else:
+            entry['audio'] = audio
+        trace.append(entry)
+        at += rng.expovariate(rate)
+    return trace
+
+
+def load_trace(path: str) -> list:
+    with open(path) as f:
+        trace = [json.loads(line) for line in f if line.strip()]
+    for entry in trace:
+        if entry.get('kind') not in KINDS:
+            raise ValueError(f"unknown request kind {entry.get('kind')!r} in {path}")
+    return sorted(trace, key=lambda entry: entry['at'])
+
+
+def save_trace(path: str, trace: list):
+    with open(path, 'w') as f:
+        for entry in trace:
+            f.write(json.dumps(entry) + "\n")
+
+
+def _multipart(fields: dict, filename: str, data: bytes):
+    """(body, content type) for a form with text fields and one 'audio' file"""
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode('utf-8'))
+    parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="audio"; filename="{filename}"\r\n'
+                 f'Content-Type: application/octet-stream\r\n\r\n'.encode('utf-8') + data + b'\r\n')
+    parts.append(f'--{boundary}--\r\n'.encode('utf-8'))
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+
+def _call(method: str, url: str, body: bytes = None, headers: dict = None, timeout: float = 300):
+    """(outcome, response body) where outcome is 'ok', an HTTP status or an error name"""
+    req = urllib.request.Request(url, data=body, method=method, headers=headers or {})
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            return 'ok', resp.read()
+    except urllib.error.HTTPError as e:
+        e.read()
+        return str(e.code), None
+    except urllib.error.URLError as e:
+        reason = e.reason
+        return 'timeout' if isinstance(reason, TimeoutError) else type(reason).__name__, None
+    except TimeoutError:
+        return 'timeout', None
+    except Exception as e:
+        return type(e).__name__, None
+
+
+class Recorder:
+    """(kind, seconds, outcome) of every request, plus what the dispatcher saw"""
+
+    def __init__(self):
+        self.records = []
+        self.dropped = 0
+        self.max_lag = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, kind: str, seconds: float, outcome: str):
+        with self._lock:
+            self.records.append((kind, seconds, outcome))
+
+
+class LoadTest:
+    def __init__(self, base_url: str, timeout: float = 300, fresh: bool = True,
+                 audio_format: str = None, max_in_flight: int = 512):
+        """
+        Args:
+            base_url: server to load, e.g. http://localhost:8080
+            timeout: per-request client timeout in seconds
+            fresh: ask the server to bypass its deliberation cache
+            audio_format: ?format= for clip fetches (None lets the server pick WAV)
+            max_in_flight: requests outstanding at once; arrivals beyond it are dropped and reported
+        """
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.fresh = fresh
+        self.audio_format = audio_format
+        self.max_in_flight = max_in_flight
+        self.recorder = Recorder()
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._audio = {}
+        self._audio_lock = threading.Lock()
+
+    def _recording(self, path: str):
+        with self._audio_lock:
+            if path not in self._audio:
+                with open(path, 'rb') as f:
+                    self._audio[path] = f.read()
+            return self._audio[path]
+
+    def _headers(self, entry: dict) -> dict:
+        return {'X-Forwarded-For': entry['client']} if entry.get('client') else {}
+
+    def _fetch_clips(self, answer: dict, headers: dict):
+        query = f"?format={self.audio_format}" if self.audio_format else ''
+        for opinion in answer.get('opinions', []):
+            if opinion.get('audio_index') is None:
+                self.recorder.add('audio', 0.0, 'no_clip')
+                continue
+            start = time.monotonic()
+            outcome, _ = _call('GET', f"{self.base_url}/api/audio/{answer['session_id']}/{opinion['audio_index']}{query}",
+                               headers=headers, timeout=self.timeout)
+            self.recorder.add('audio', time.monotonic() - start, outcome)
+
+    def execute(self, entry: dict, scheduled: float):
+        """send one trace entry (and its clip fetches); latency counts from `scheduled`"""
+        kind = entry['kind']
+        headers = self._headers(entry)
+        try:
+            if kind == 'opinions':
+                body = json.dumps({'question': entry.get('question') or QUESTIONS[0], 'fresh': self.fresh}).encode('utf-8')
+                headers['Content-Type'] = 'application/json'
+                outcome, payload = _call('POST', f"{self.base_url}/api/opinions", body, headers, self.timeout)
+            else:
+                fields = {'fresh': '1' if self.fresh else '0'} if kind == 'opinions_audio' else {}
+                audio_path = entry.get('audio') or REF_AUDIO
+                body, content_type = _multipart(fields, os.path.basename(audio_path), self._recording(audio_path))
+                headers['Content-Type'] = content_type
+                path = '/api/opinions' if kind == 'opinions_audio' else '/api/transcribe'
+                outcome, payload = _call('POST', self.base_url + path, body, headers, self.timeout)
+            self.recorder.add(kind, time.monotonic() - scheduled, outcome)
+
+            if outcome == 'ok' and kind != 'transcribe' and entry.get('fetch', True):
+                self._fetch_clips(json.loads(payload), {k: v for k, v in headers.items() if k != 'Content-Type'})
+        finally:
+            self._slots.release()
+
+    def replay(self, trace: list, speed: float = 1.0) -> float:
+        """dispatch every entry at its time (divided by speed); returns the wall time taken"""
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix="load") as pool:
+            for entry in trace:
+                scheduled = start + entry['at'] / speed
+                delay = scheduled - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    self.recorder.max_lag = max(self.recorder.max_lag, -delay)
+                # open loop: never wait for a slot, a full client is part of the result
+                if not self._slots.acquire(blocking=False):
+                    self.recorder.dropped += 1
+                    self.recorder.add(entry['kind'], 0.0, 'client_dropped')
+                    continue
+                pool.submit(self.execute, entry, scheduled)
+        return time.monotonic() - start
+
+
+def percentile(samples, p: float) -> float:
+    """nearest-rank percentile of a sorted list"""
+    return samples[min(len(samples) - 1, max(0, int(round(p / 100 * len(samples))) - 1))]
+
+
+def summarize(recorder: Recorder, slos: dict, elapsed: float, trace: list, speed: float = 1.0) -> dict:
+    """per-kind counts, latency percentiles, SLO attainment and error breakdown"""
+    by_kind = {}
+    for kind, seconds, outcome in recorder.records:
+        by_kind.setdefault(kind, []).append((seconds, outcome))
+
+    kinds = {}
+    for kind, records in sorted(by_kind.items()):
+        ok = sorted(seconds for seconds, outcome in records if outcome == 'ok')
+        errors = {}
+        for _, outcome in records:
+            if outcome != 'ok':
+                errors[outcome] = errors.get(outcome, 0) + 1
+        slo = slos.get(kind)
+        kinds[kind] = {
+            'requests': len(records),
+            'ok': len(ok),
+            'errors': errors,
+            'p50': round(percentile(ok, 50), 3) if ok else None,
+            'p95': round(percentile(ok, 95), 3) if ok else None,
+            'p99': round(percentile(ok, 99), 3) if ok else None,
+            'max': round(ok[-1], 3) if ok else None,
+            'slo_seconds': slo,
+            # failures count as misses: an error never meets the SLO
+            'slo_attainment': round(sum(1 for s in ok if s <= slo) / len(records), 4) if slo else None,
+        }
+    span = trace[-1]['at'] / speed if trace else 0
+    return {
+        'elapsed_seconds': round(elapsed, 1),
+        'offered': len(trace),
+        'offered_rate': round(len(trace) / span, 3) if span else None,
+        'dropped_by_client': recorder.dropped,
+        'max_dispatch_lag_seconds': round(recorder.max_lag, 3),
+        'kinds': kinds
+    }
+
+
+def print_summary(summary: dict):
+    print(f"{summary['offered']} requests offered at {summary['offered_rate']} req/s, "
+          f"done in {summary['elapsed_seconds']}s, {summary['dropped_by_client']} dropped at the client, "
+          f"max dispatch lag {summary['max_dispatch_lag_seconds']}s")
+    print(f"\n{'kind':<16}{'requests':>9}{'ok':>6}{'p50 s':>9}{'p95 s':>9}{'p99 s':>9}{'SLO s':>8}{'met':>8}")
+    for kind, stats in summary['kinds'].items():
+        cells = [f"{stats[key]:>9.2f}" if stats[key] is not None else f"{'-':>9}" for key in ('p50', 'p95', 'p99')]
+        slo = f"{stats['slo_seconds']:>8.1f}" if stats['slo_seconds'] else f"{'-':>8}"
+        met = f"{stats['slo_attainment']:>8.1%}" if stats['slo_attainment'] is not None else f"{'-':>8}"
+        print(f"{kind:<16}{stats['requests']:>9}{stats['ok']:>6}{''.join(cells)}{slo}{met}")
+    errors = {kind: stats['errors'] for kind, stats in summary['kinds'].items() if stats['errors']}
+    if errors:
+        print("\nerrors:")
+        for kind, counts in errors.items():
+            print(f"  {kind:<16}" + ", ".join(f"{outcome} x{count}" for outcome, count in
+                                              sorted(counts.items(), key=lambda item: -item[1])))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open-loop load test for the HTTP API")
+    parser.add_argument('--url', default='http://localhost:8080')
+    parser.add_argument('--trace', help='JSON lines trace to replay (default: generate one)')
+    parser.add_argument('--rate', type=float, default=1.0, help='synthetic arrivals per second')
+    parser.add_argument('--duration', type=float, default=60, help='synthetic trace length in seconds')
+    parser.add_argument('--mix', default='opinions=0.7,opinions_audio=0.15,transcribe=0.15',
+                        help='synthetic request mix, kind=weight pairs')
+    parser.add_argument('--clients', type=int, default=20, help='distinct synthetic clients (X-Forwarded-For)')
+    parser.add_argument('--audio', default=REF_AUDIO, help='recording for synthetic audio requests')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--save-trace', help='write the trace that was replayed here')
+    parser.add_argument('--speed', type=float, default=1.0, help='replay faster (>1) or slower (<1) than recorded')
+    parser.add_argument('--slo', default='', help='latency SLOs in seconds per kind, e.g. opinions=45,audio=1')
+    parser.add_argument('--timeout', type=float, default=300, help='client timeout per request')
+    parser.add_argument('--max-in-flight', type=int, default=512)
+    parser.add_argument('--audio-format', default=None, help='?format= for clip fetches (wav, opus, mp3, flac)')
+    parser.add_argument('--cached', action='store_true', help="let the server's deliberation cache answer")
+    parser.add_argument('--json', action='store_true', help='print the summary as JSON')
+    args = parser.parse_args()
+
+    if args.trace:
+        trace = load_trace(args.trace)
+    else:
+        trace = synthetic_trace(args.rate, args.duration, _parse_pairs(args.mix), args.clients, args.audio, args.seed)
+    if args.save_trace:
+        save_trace(args.save_trace, trace)
+    if not trace:
+        print("Empty trace, nothing to send")
+        return
+
+    slos = {**DEFAULT_SLOS, **_parse_pairs(args.slo)}
+    test = LoadTest(args.url, args.timeout, not args.cached, args.audio_format, args.max_in_flight)
+    print(f"Replaying {len(trace)} requests over {trace[-1]['at'] / args.speed:.0f}s against {args.url}...")
+    elapsed = test.replay(trace, args.speed)
+    summary = summarize(test.recorder, slos, elapsed, trace, args.speed)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_summary(summary)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+"""drive JuryEngine or the Flask routes against local fake upstreams and report throughput,
+per-stage latency percentiles and memory high-water marks
+
+no keys or network needed: Gemini, BosonAI and Whisper are played by
+benchmarks.fake_upstreams in this process, with latencies, error rates and
+payload sizes set from the command line. targets:
+
+    engine   generate_deliberation_with_audio on a JuryEngine (no HTTP)
+    routes   POST /api/opinions, then GET every clip from /api/audio, via the Flask test client
+    stream   POST /api/opinions/stream, reading the SSE stream to the end
+
+usage (from backend/):
+    python -m benchmarks.offline_bench -c 8 -n 32
+    python -m benchmarks.offline_bench --target routes --audio ../ref-audio/panda.wav
+    python -m benchmarks.offline_bench --tts-p50 5 --tts-p95 20 --tts-errors 0.1 --strategy combined
+
+caches are off so every request does the full work; stage timings come from
+the same spans that feed /metrics
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fake_upstreams import add_profile_arguments, from_arguments
+
+
+QUESTIONS = [
+    "Should I adopt a second cat?",
+    "Is it worth learning to cook instead of ordering takeout?",
+    "Should we go camping this weekend even though it might rain?",
+    "Would you move to a new city for a job you're only kind of excited about?",
+]
+
+
+def percentile(samples, p: float) -> float:
+    """nearest-rank percentile of a sorted list"""
+    return samples[min(len(samples) - 1, max(0, int(round(p / 100 * len(samples))) - 1))]
+
+
+def max_rss_mb() -> float:
+    """peak resident set size of this process so far"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+class StageRecorder:
+    """raw span durations by stage, for exact percentiles"""
+
+    def __init__(self):
+        self.samples = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, stage: str, seconds: float):
+        with self._lock:
+            self.samples.setdefault(stage, []).append(seconds)
+
+    def reset(self):
+        with self._lock:
+            self.samples = {}
+
+
+def _engine_request(engine, question: str) -> str:
+    result = engine.generate_deliberation_with_audio(question, [{'role': 'user', 'content': question}],
+                                                     use_cache=False)
+    missing = sum(1 for audio in result['audio_files'] if not audio)
+    return 'ok' if not missing else f'{missing}_clips_missing'
+
+
+def _routes_request(client, question: str, audio: bytes = None) -> str:
+    if audio:
+        response = client.post('/api/opinions', data={'audio': (io.BytesIO(audio), 'question.wav'), 'fresh': '1'},
+                               content_type='multipart/form-data')
+    else:
+        response = client.post('/api/opinions', json={'question': question, 'fresh': True})
+    if response.status_code != 200:
+        return str(response.status_code)
+    body = response.get_json()
+    for opinion in body['opinions']:
+        if opinion['audio_index'] is None:
+            return 'clip_missing'
+        clip = client.get(f"/api/audio/{body['session_id']}/{opinion['audio_index']}")
+        clip.get_data()
+        if clip.status_code != 200:
+            return f'audio_{clip.status_code}'
+    return 'ok'
+
+
+def _stream_request(client, question: str, audio: bytes = None) -> str:
+    if audio:
+        response = client.post('/api/opinions/stream', data={'audio': (io.BytesIO(audio), 'question.wav'), 'fresh': '1'},
+                               content_type='multipart/form-data')
+    else:
+        response = client.post('/api/opinions/stream', json={'question': question, 'fresh': True})
+    if response.status_code != 200:
+        return str(response.status_code)
+    events = [line[7:] for line in response.get_data(as_text=True).splitlines() if line.startswith('event: ')]
+    if 'error' in events or 'audio_failed' in events:
+        return 'stream_error'
+    return 'ok' if events and events[-1] == 'done' else 'stream_incomplete'
+
+
+def run(args):
+    fake = from_arguments(args).start()
+    os.environ.update(fake.env())
+    # every request should do the full work
+    os.environ.setdefault('TTS_CACHE_ENABLED', 'false')
+    os.environ.setdefault('DELIBERATION_CACHE_ENABLED', 'false')
+    os.environ['OPINION_STRATEGY'] = args.strategy
+
+    recorder = StageRecorder()
+    # one redirect for the whole run: redirect_stdout isn't safe to enter from several threads
+    with contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO()):
+        # imported only now so the services pick up the fake endpoints
+        from services.metrics import add_stage_listener
+        from runtime import readiness
+        add_stage_listener(recorder)
+        # measure a warm process, as a load balancer would only route to one
+        readiness.wait()
+        if args.target == 'engine':
+            from runtime import engine
+            call = lambda question: _engine_request(engine, question)
+        else:
+            from app import app
+            local = threading.local()
+            audio = open(args.audio, 'rb').read() if args.audio else None
+            request = _routes_request if args.target == 'routes' else _stream_request
+
+            def call(question):
+                if not hasattr(local, 'client'):
+                    local.client = app.test_client()
+                return request(local.client, question, audio)
+
+        def timed(index: int):
+            start = time.perf_counter()
+            try:
+                outcome = call(QUESTIONS[index % len(QUESTIONS)])
+            except Exception as e:
+                outcome = type(e).__name__
+            return time.perf_counter() - start, outcome
+
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            if args.warmup:
+                list(pool.map(timed, range(args.warmup)))
+            recorder.reset()
+            rss_before = max_rss_mb()
+            if args.tracemalloc:
+                tracemalloc.start()
+            start = time.perf_counter()
+            results = list(pool.map(timed, range(args.requests)))
+            elapsed = time.perf_counter() - start
+        traced_peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024) if args.tracemalloc else None
+        tracemalloc.stop()
+    fake.stop()
+
+    report(args, results, elapsed, recorder.samples, rss_before, max_rss_mb(), traced_peak, fake.stats())
+
+
+def report(args, results, elapsed, stages, rss_before, rss_after, traced_peak, upstream_stats):
+    outcomes = {}
+    for _, outcome in results:
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    ok = sorted(latency for latency, outcome in results if outcome == 'ok')
+
+    print(f"{args.target}: {args.requests} requests, concurrency {args.concurrency}, "
+          f"{args.strategy} opinions, {elapsed:.1f}s wall")
+    print(f"  throughput: {len(ok) / elapsed:.2f} complete req/s")
+    print(f"  outcomes:   {outcomes}")
+    print(f"\n{'stage':<22}{'count':>7}{'p50 s':>9}{'p95 s':>9}{'p99 s':>9}{'max s':>9}")
+    if ok:
+        print(f"{'end_to_end':<22}{len(ok):>7}{percentile(ok, 50):>9.3f}{percentile(ok, 95):>9.3f}"
+              f"{percentile(ok, 99):>9.3f}{ok[-1]:>9.3f}")
+    for stage in sorted(stages):
+        samples = sorted(stages[stage])
+        print(f"{stage:<22}{len(samples):>7}{percentile(samples, 50):>9.3f}{percentile(samples, 95):>9.3f}"
+              f"{percentile(samples, 99):>9.3f}{samples[-1]:>9.3f}")
+
+    print(f"\nmax RSS: {rss_before:.0f} MB after warm-up, {rss_after:.0f} MB at the end")
+    if traced_peak is not None:
+        print(f"peak Python allocations during the run: {traced_peak:.1f} MB")
+    print(f"fake upstream traffic: {json.dumps(upstream_stats)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark against fake Gemini/BosonAI/Whisper")
+    parser.add_argument('--target', choices=('engine', 'routes', 'stream'), default='engine')
+    parser.add_argument('-c', '--concurrency', type=int, default=8)
+    parser.add_argument('-n', '--requests', type=int, default=None, help='measured requests (default: 4x concurrency)')
+    parser.add_argument('--warmup', type=int, default=2, help='unmeasured requests first')
+    parser.add_argument('--strategy', choices=('per_member', 'combined'), default='per_member')
+    parser.add_argument('--audio', default=None, help='upload this recording as the question (routes/stream)')
+    parser.add_argument('--tracemalloc', action='store_true', help='also track peak Python allocations (slower)')
+    parser.add_argument('-v', '--verbose', action='store_true', help="keep the backend's own logging")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    args.requests = args.requests or args.concurrency * 4
+    run(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""compare per-member and combined (single JSON request) opinion generation against Gemini
+
+for each question both strategies generate the full panel's opinions; the report
+shows requests, prompt/output tokens, wall-clock latency and estimated cost per
+deliberation, plus how often the combined path had to fall back per member.
+
+usage (from backend/, needs GOOGLE_API_KEY):
+    python -m benchmarks.panel_bench -n 3
+    python -m benchmarks.panel_bench --history 6 --input-price 0.30 --output-price 2.50
+"""
+import argparse
+import os
+import statistics
+import time
+
+from dotenv import load_dotenv
+
+
+QUESTIONS = [
+    "Should I adopt a second cat?",
+    "Is it worth learning to cook instead of ordering takeout?",
+    "Should we go camping this weekend even though it might rain?",
+    "Would you move to a new city for a job you're only kind of excited about?",
+]
+
+
+def _history(turns: int):
+    """a synthetic follow-up conversation of `turns` messages"""
+    history = []
+    for i in range(turns):
+        if i % 2 == 0:
+            history.append({'role': 'user', 'content': f"Earlier question number {i // 2}: what do you think about trying something new?"})
+        else:
+            history.append({'role': 'assistant', 'content': "Grizzly: Let's do it! Panda: Um, maybe. Ice Bear: Ice Bear approves."})
+    return history
+
+
+def run_strategy(engine, strategy: str, questions, history, repeats: int):
+    """generate every question `repeats` times with one strategy, returning per-run measurements"""
+    engine.opinion_strategy = strategy
+    runs = []
+    for _ in range(repeats):
+        for question in questions:
+            before = engine.llm_service.usage_stats()
+            start = time.perf_counter()
+            opinions = engine.generate_opinions(question, history + [{'role': 'user', 'content': question}])
+            elapsed = time.perf_counter() - start
+            after = engine.llm_service.usage_stats()
+            runs.append({
+                'latency': elapsed,
+                'opinions': len(opinions),
+                **{key: after[key] - before[key] for key in after}
+            })
+    return runs
+
+
+def report(label: str, runs, members: int, input_price: float, output_price: float):
+    """print averages for one strategy; prices are USD per million tokens"""
+    prompt = statistics.mean(r['prompt_tokens'] for r in runs)
+    output = statistics.mean(r['output_tokens'] for r in runs)
+    requests = statistics.mean(r['requests'] for r in runs)
+    cost = (prompt * input_price + output * output_price) / 1_000_000
+    latencies = sorted(r['latency'] for r in runs)
+    complete = sum(1 for r in runs if r['opinions'] == members)
+    print(f"{label:<12}{requests:>9.2f}{prompt:>10.0f}{output:>9.0f}"
+          f"{statistics.median(latencies):>9.2f}{latencies[-1]:>9.2f}{cost * 1000:>12.4f}"
+          f"{complete:>6}/{len(runs)}")
+    return prompt, cost
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-member vs combined opinion generation benchmark")
+    parser.add_argument('-n', '--repeats', type=int, default=2, help='passes over the question set')
+    parser.add_argument('--history', type=int, default=4, help='messages of prior conversation to include')
+    parser.add_argument('--input-price', type=float, default=0.30, help='USD per 1M prompt tokens')
+    parser.add_argument('--output-price', type=float, default=2.50, help='USD per 1M output tokens')
+    args = parser.parse_args()
+
+    load_dotenv()
+    from jury_engine import JuryEngine
+    engine = JuryEngine(boson_api_key=os.getenv('BOSON_API_KEY') or 'unused',
+                        google_api_key=os.getenv('GOOGLE_API_KEY'), prepare_voices=False)
+    members = len(engine.jury_members)
+    history = _history(args.history)
+
+    print(f"{len(QUESTIONS)} questions x {args.repeats}, {members} bears, {args.history} history messages")
+    print(f"{'strategy':<12}{'requests':>9}{'prompt':>10}{'output':>9}{'p50 s':>9}{'max s':>9}{'m$/delib':>12}{'full':>9}")
+    results = {}
+    for strategy in ('per_member', 'combined'):
+        runs = run_strategy(engine, strategy, QUESTIONS, history, args.repeats)
+        results[strategy] = report(strategy, runs, members, args.input_price, args.output_price)
+
+    (per_prompt, per_cost), (combined_prompt, combined_cost) = results['per_member'], results['combined']
+    if per_prompt and per_cost:
+        print(f"combined uses {1 - combined_prompt / per_prompt:.0%} fewer prompt tokens, "
+              f"{1 - combined_cost / per_cost:.0%} lower cost per deliberation")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""compare reference-voice payloads (and optionally TTS latency) before and after preparation
+
+usage (from backend/):
+    python -m benchmarks.voice_prep_bench                 # payload sizes for ref-audio/*.wav
+    python -m benchmarks.voice_prep_bench --live -n 3     # also time BosonAI cloning per jury member
+"""
+import argparse
+import base64
+import glob
+import os
+import statistics
+import time
+
+from services.voice_prep import prepare_voice
+
+
+REF_AUDIO_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'ref-audio')
+SAMPLE_TEXT = "Okay, okay, hear me out. This is honestly the best idea we've had all week!"
+
+
+def _b64_size(path: str) -> int:
+    with open(path, "rb") as f:
+        return len(base64.b64encode(f.read()))
+
+
+def payload_report(paths, max_seconds=None):
+    """print the upload size of each reference clip before and after preparation"""
+    print(f"{'voice':<28}{'raw b64':>12}{'prepared b64':>14}{'reduction':>11}{'prep ms':>9}")
+    for path in paths:
+        start = time.perf_counter()
+        prepared = prepare_voice(path, "", max_seconds=max_seconds, force=True)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        raw, small = _b64_size(path), _b64_size(prepared.path)
+        print(f"{os.path.basename(path):<28}{raw:>12}{small:>14}{1 - small / raw:>10.0%}{elapsed_ms:>9.0f}")
+
+
+def latency_report(repeats: int, max_seconds=None):
+    """time real cloning calls with the original and prepared clip for each jury member"""
+    from dotenv import load_dotenv
+    from jury_engine import JuryEngine
+    
+    load_dotenv()
+    engine = JuryEngine(
+        boson_api_key=os.getenv('BOSON_API_KEY'),
+        google_api_key=os.getenv('GOOGLE_API_KEY'),
+        prepare_voices=False
+    )
+    
+    print(f"\n{'voice':<12}{'raw p50 s':>11}{'prepared p50 s':>16}{'speedup':>9}")
+    for member in engine.jury_members:
+        if not os.path.exists(member.ref_audio):
+            print(f"{member.name:<12}  (reference audio missing, skipped)")
+            continue
+        prepared = prepare_voice(member.ref_audio, member.ref_transcript, max_seconds=max_seconds)
+        timings = {}
+        for label, path, transcript in (("raw", member.ref_audio, member.ref_transcript),
+                                        ("prepared", prepared.path, prepared.transcript)):
+            samples = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                engine.tts_service.synthesize_speech(member.speaker_tag, path, transcript, SAMPLE_TEXT)
+                samples.append(time.perf_counter() - start)
+            timings[label] = statistics.median(samples)
+        print(f"{member.name:<12}{timings['raw']:>11.2f}{timings['prepared']:>16.2f}"
+              f"{timings['raw'] / timings['prepared']:>8.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark reference voice preparation")
+    parser.add_argument("paths", nargs="*", help="reference WAVs (default: ref-audio/*.wav)")
+    parser.add_argument("--max-seconds", type=float, default=None)
+    parser.add_argument("--live", action="store_true", help="also time BosonAI cloning (needs API keys)")
+    parser.add_argument("-n", "--repeats", type=int, default=3)
+    args = parser.parse_args()
+    
+    payload_report(args.paths or sorted(glob.glob(os.path.join(REF_AUDIO_DIR, "*.wav"))), args.max_seconds)
+    if args.live:
+        latency_report(args.repeats, args.max_seconds)
+
+
+if __name__ == "__main__":
+    main()
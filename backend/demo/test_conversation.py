@@ -36,17 +36,16 @@ print("="*50)
 
 # generate conversation
 try:
-    result = engine.generate_deliberation(question)
+    result = engine.generate_deliberation_with_audio(question)
     
     # print the conversation
     print("\nWE BARE BEARS CONVERSATION\n")
     
-    for idx, (entry, audio_bytes) in enumerate(zip(result['script'], result['audio_files'])):
+    for idx, (entry, audio_bytes) in enumerate(zip(result['opinions'], result['audio_files'])):
         member = entry['member']
         text = entry['text']
-        stage = entry['stage']
         
-        print(f"{member.name} ({stage}):")
+        print(f"{member.name}:")
         print(f"   {text}\n")
         
         # save audio file
@@ -57,7 +56,7 @@ try:
             print(f"   Audio saved: {output_file}\n")
     
     print("="*50)
-    print(f"Conversation complete! {len(result['audio_files'])} audio files generated.")
+    print(f"Conversation complete! {sum(1 for audio in result['audio_files'] if audio)} audio files generated.")
     
 except Exception as e:
     print(f"Error: {e}")
@@ -1,7 +1,18 @@
-from dataclasses import dataclass
-from typing import List, Dict, Optional
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, replace
+from typing import AsyncIterator, Iterator, List, Dict, Optional, Tuple
+import asyncio
 import os
-from services import LLMService, TTSService
+import queue
+import threading
+import time
+from services import (
+    LLMService, TTSService, SynthesisCache, DeliberationCache, ResilientEndpoint, Overloaded, prepare_voice,
+    bind_context, observe_stage
+)
+
+
+OPINION_STRATEGIES = ("per_member", "combined")
 
 
 @dataclass
@@ -19,20 +30,83 @@ class JuryMember:
 class JuryEngine:
     """orchestrates jury deliberation using LLM and TTS services"""
     
-    def __init__(self, boson_api_key: str, google_api_key: str = None, openai_api_key: str = None):
+    def __init__(self, boson_api_key: str, google_api_key: str = None, openai_api_key: str = None,
+                 llm_max_workers: int = 8, llm_timeout: float = 60,
+                 tts_max_workers: int = 8, independent_voices: bool = False,
+                 prepare_voices: bool = True, voice_max_seconds: Optional[float] = None,
+                 tts_cache: Optional[SynthesisCache] = None,
+                 deliberation_cache: Optional[DeliberationCache] = None,
+                 tts_max_connections: int = 64, opinion_strategy: str = "per_member",
+                 tts_resilience: Optional[ResilientEndpoint] = None, tts_timeout: float = 300,
+                 tts_fallback_timeout: float = 60, warm: bool = True):
         """initialize jury engine with API keys
         
         Args:
             boson_api_key: BosonAI API key for TTS
             google_api_key: Google API key for Gemini LLM
             openai_api_key: OpenAI API key for Whisper (optional, not used here)
+            llm_max_workers: max concurrent Gemini requests shared by all deliberations
+            llm_timeout: seconds to wait for each bear's opinion before giving up on it
+            tts_max_workers: max concurrent BosonAI syntheses shared by all deliberations
+            independent_voices: synthesize every bear without the earlier speakers as TTS
+                               context, so all voices render in parallel
+            prepare_voices: upload 24kHz mono, silence-trimmed copies of the reference clips
+            voice_max_seconds: optional cap on prepared reference clip length
+            tts_cache: optional cache of synthesized clips shared across sessions
+            deliberation_cache: optional cache of whole deliberations; audio is replayed
+                                from tts_cache, so enable both for instant hits
+            tts_max_connections: keep-alive connection pool size towards BosonAI
+            opinion_strategy: "per_member" sends one Gemini request per bear; "combined"
+                              asks for every bear in one JSON response and falls back to
+                              per-member requests for any bear it didn't answer properly
+            tts_resilience: adaptive timeouts, retries, hedging and circuit breaking for
+                            voice cloning (TTSService builds a default one if None)
+            tts_timeout: seconds one clip's voice cloning may take, retries and hedges included
+            tts_fallback_timeout: timeout in seconds for the simple fallback voice
+            warm: prepare and encode the reference voices before returning; pass False to
+                  construct quickly and call warm_voices later (e.g. from a warm-up thread)
         """
+        if opinion_strategy not in OPINION_STRATEGIES:
+            raise ValueError(f"opinion_strategy must be one of {OPINION_STRATEGIES}")
+        
         # initialize services
         self.llm_service = LLMService(api_key=google_api_key)
-        self.tts_service = TTSService(api_key=boson_api_key)
+        self.tts_service = TTSService(api_key=boson_api_key, cache=tts_cache,
+                                      max_connections=tts_max_connections,
+                                      resilience=tts_resilience, fallback_timeout=tts_fallback_timeout)
+        
+        # bounded pool so every bear's prompt goes out at once without unbounded threads
+        self.llm_timeout = llm_timeout
+        self.tts_timeout = tts_timeout
+        self.llm_executor = ThreadPoolExecutor(max_workers=llm_max_workers, thread_name_prefix="jury-llm")
+        self.tts_executor = ThreadPoolExecutor(max_workers=tts_max_workers, thread_name_prefix="jury-tts")
+        self.independent_voices = independent_voices
+        self.prepare_voices = prepare_voices
+        self.deliberation_cache = deliberation_cache
+        self.voice_max_seconds = voice_max_seconds
+        self.opinion_strategy = opinion_strategy
+        self._voices_prepared = False
         
         # define the 3 We Bare Bears jury members
         self.jury_members = self._initialize_jury_members()
+        
+        if warm:
+            self.warm_voices()
+    
+    def warm_voices(self) -> Dict[str, bool]:
+        """prepare (once) and encode every member's reference clip so the first request doesn't pay for it
+        
+        Returns:
+            {reference clip path: loaded} as reported by the reference audio cache
+        """
+        if self.prepare_voices and not self._voices_prepared:
+            # this can run while requests are served: build every prepared member first and swap
+            # the whole list in one assignment, so no request sees a clip with another's transcript
+            self.jury_members = [self._prepare_member_voice(member) for member in self.jury_members]
+            self._voices_prepared = True
+        return self.tts_service.ref_audio_cache.warm(
+            m.ref_audio for m in self.jury_members if os.path.exists(m.ref_audio)
+        )
     
     def _initialize_jury_members(self) -> List[JuryMember]:
         """define the We Bare Bears personalities"""
@@ -106,38 +180,242 @@ When responding to questions or comments, speak only in third person. Give myste
 
         return [grizzly, panda, ice_bear]
     
+    def _prepare_member_voice(self, member: JuryMember) -> JuryMember:
+        """a copy of the member using its compact prepared reference clip, or the member unchanged if we can't make one"""
+        if not os.path.exists(member.ref_audio):
+            return member
+        try:
+            prepared = prepare_voice(member.ref_audio, member.ref_transcript,
+                                     max_seconds=self.voice_max_seconds)
+            print(f"Prepared voice for {member.name}: {prepared.source_bytes} -> {prepared.prepared_bytes} bytes")
+            return replace(member, ref_audio=prepared.path, ref_transcript=prepared.transcript)
+        except Exception as e:
+            print(f"WARNING: Could not prepare voice for {member.name}, using original clip: {str(e)}")
+            return member
+    
+    def get_member(self, member_id: str) -> Optional[JuryMember]:
+        """look up a jury member by id"""
+        for member in self.jury_members:
+            if member.id == member_id:
+                return member
+        return None
+    
+    def _select_members(self, selected_member_ids: Optional[List[str]] = None) -> List[JuryMember]:
+        """return the jury members to include, in panel order"""
+        if selected_member_ids:
+            return [m for m in self.jury_members if m.id in selected_member_ids]
+        return self.jury_members
+    
+    def _submit_opinions(self, members: List[JuryMember], question: str,
+                         conversation_history: Optional[List[Dict[str, str]]] = None) -> List[Future]:
+        """send every member's prompt to the LLM pool at once, returning futures in member order"""
+        if self.opinion_strategy == "combined" and len(members) > 1:
+            return self._submit_panel(members, question, conversation_history)
+        return [self._submit_member_opinion(member, question, conversation_history) for member in members]
+    
+    def _submit_member_opinion(self, member: JuryMember, question: str,
+                               conversation_history: Optional[List[Dict[str, str]]] = None) -> Future:
+        return self.llm_executor.submit(
+            bind_context(self.llm_service.generate_opinion),
+            personality_prompt=member.personality_prompt,
+            question=question,
+            conversation_history=conversation_history
+        )
+    
+    @staticmethod
+    def _personas(members: List[JuryMember]) -> List[Dict[str, str]]:
+        return [{'id': m.id, 'name': m.name, 'personality_prompt': m.personality_prompt} for m in members]
+    
+    def _submit_panel(self, members: List[JuryMember], question: str,
+                      conversation_history: Optional[List[Dict[str, str]]] = None) -> List[Future]:
+        """one combined request for the whole panel, exposed as per-member futures
+        
+        members the combined answer missed (or the whole panel, if it failed) are
+        re-asked individually, so callers see the same futures either way; if the
+        llm limiter turned the panel away, every future raises that Overloaded
+        """
+        member_futures = [Future() for _ in members]
+        panel = self.llm_executor.submit(
+            bind_context(self.llm_service.generate_panel), self._personas(members), question, conversation_history
+        )
+        
+        def chain(source: Future, target: Future):
+            try:
+                target.set_result(source.result())
+            except Exception as e:
+                target.set_exception(e)
+        
+        def resolve(done: Future):
+            busy = None
+            try:
+                texts = done.result()
+            except Overloaded as e:
+                # the per-member requests would queue on the same full limiter
+                busy, texts = e, {}
+            except Exception as e:
+                print(f"✗ Combined opinions failed, asking each bear separately: {str(e)}")
+                texts = {}
+            for member, future in zip(members, member_futures):
+                # futures cancelled meanwhile (dropped speculation, timeouts) need no answer
+                if not future.set_running_or_notify_cancel():
+                    continue
+                if busy:
+                    future.set_exception(busy)
+                    continue
+                if texts.get(member.id):
+                    future.set_result(texts[member.id])
+                    continue
+                if texts:
+                    print(f"✗ Combined response had no usable opinion for {member.name}; asking separately")
+                fallback = self._submit_member_opinion(member, question, conversation_history)
+                fallback.add_done_callback(lambda source, target=future: chain(source, target))
+        
+        # callbacks run on whichever thread finished the panel, so carry the request context over
+        panel.add_done_callback(bind_context(resolve))
+        return member_futures
+    
+    def speculate_opinions(self, question: str,
+                           conversation_history: Optional[List[Dict[str, str]]] = None) -> List[Future]:
+        """start every bear's opinion on a draft question before it is final
+        
+        pass the futures to iter_deliberation_with_audio once the question is
+        confirmed, or hand them to cancel_speculation if it changed
+        """
+        print(f"Speculating on draft question: {question}")
+        return self._submit_opinions(self._select_members(), question, conversation_history)
+    
+    def _start_opinion_tasks(self, members: List[JuryMember], question: str,
+                             conversation_history: Optional[List[Dict[str, str]]] = None) -> List[asyncio.Task]:
+        """start every member's opinion on the running event loop, returning tasks in member order"""
+        panel = None
+        if self.opinion_strategy == "combined" and len(members) > 1:
+            panel = asyncio.ensure_future(self._agenerate_panel(members, question, conversation_history))
+        return [
+            asyncio.ensure_future(asyncio.wait_for(
+                self._apanel_opinion(panel, member, question, conversation_history) if panel else
+                self.llm_service.agenerate_opinion(
+                    personality_prompt=member.personality_prompt,
+                    question=question,
+                    conversation_history=conversation_history
+                ),
+                timeout=self.llm_timeout
+            ))
+            for member in members
+        ]
+    
+    async def _agenerate_panel(self, members: List[JuryMember], question: str,
+                               conversation_history: Optional[List[Dict[str, str]]] = None) -> Dict[str, str]:
+        """combined request for the panel; an empty result sends every member to its fallback
+        
+        Overloaded propagates to every member instead
+        """
+        try:
+            return await self.llm_service.agenerate_panel(self._personas(members), question, conversation_history)
+        except Overloaded:
+            # the per-member requests would queue on the same full limiter
+            raise
+        except Exception as e:
+            print(f"✗ Combined opinions failed, asking each bear separately: {str(e)}")
+            return {}
+    
+    async def _apanel_opinion(self, panel: asyncio.Task, member: JuryMember, question: str,
+                              conversation_history: Optional[List[Dict[str, str]]] = None) -> str:
+        """one member's opinion from the shared panel task, or its own request if the panel missed it"""
+        # shielded: one member timing out mustn't cancel the panel for the others
+        texts = await asyncio.shield(panel)
+        if texts.get(member.id):
+            return texts[member.id]
+        if texts:
+            print(f"✗ Combined response had no usable opinion for {member.name}; asking separately")
+        return await self.llm_service.agenerate_opinion(
+            personality_prompt=member.personality_prompt,
+            question=question,
+            conversation_history=conversation_history
+        )
+    
+    def aspeculate_opinions(self, question: str,
+                            conversation_history: Optional[List[Dict[str, str]]] = None) -> List[asyncio.Task]:
+        """async variant of speculate_opinions; must be called on the running loop"""
+        print(f"Speculating on draft question: {question}")
+        return self._start_opinion_tasks(self._select_members(), question, conversation_history)
+    
+    @staticmethod
+    def cancel_speculation(opinions: List):
+        """drop speculative opinions (futures or tasks); calls already running finish unobserved"""
+        for opinion in opinions or []:
+            opinion.cancel()
+    
     def generate_opinions(self, question: str, conversation_history: Optional[List[Dict[str, str]]] = None,
-                         selected_member_ids: Optional[List[str]] = None) -> List[Dict]:
+                         selected_member_ids: Optional[List[str]] = None, concurrent: bool = True) -> List[Dict]:
         """generate opinions from all bears
         
         Args:
             question: user's question or follow-up
             conversation_history: optional list of previous messages
             selected_member_ids: optional list of member ids to include; if None, use all
+            concurrent: send every member's prompt at once instead of one after another
         
         Returns:
-            list of {member, text} dictionaries
+            list of {member, text} dictionaries in member order; members whose
+            generation failed or timed out are left out
+        
+        Raises:
+            Exception: if no member produced an opinion
         """
-        opinions = []
-
-        if selected_member_ids:
-            members = [m for m in self.jury_members if m.id in selected_member_ids]
-        else:
-            members = self.jury_members
+        members = self._select_members(selected_member_ids)
         
-        for member in members:
-            opinion_text = self.llm_service.generate_opinion(
-                personality_prompt=member.personality_prompt,
-                question=question,
-                conversation_history=conversation_history
-            )
-            opinions.append({
+        if not concurrent:
+            return [{
                 'member': member,
-                'text': opinion_text
-            })
+                'text': self.llm_service.generate_opinion(
+                    personality_prompt=member.personality_prompt,
+                    question=question,
+                    conversation_history=conversation_history
+                )
+            } for member in members]
+        
+        futures = self._submit_opinions(members, question, conversation_history)
+        
+        # one shared deadline: all prompts are in flight together
+        start = time.monotonic()
+        wait(futures, timeout=self.llm_timeout)
+        
+        opinions = []
+        errors = []
+        for member, future in zip(members, futures):
+            if not future.done():
+                future.cancel()
+                errors.append((member.name, f"timed out after {self.llm_timeout}s"))
+                print(f"✗ Opinion for {member.name} timed out after {self.llm_timeout}s")
+                continue
+            try:
+                opinions.append({
+                    'member': member,
+                    'text': future.result()
+                })
+            except Exception as e:
+                errors.append((member.name, e))
+                print(f"✗ Opinion for {member.name} failed: {str(e)}")
+        
+        print(f"Generated {len(opinions)}/{len(members)} opinions in {time.monotonic() - start:.1f}s")
+        
+        if members and not opinions:
+            raise self._opinions_failure(errors)
         
         return opinions
     
+    @staticmethod
+    def _opinions_failure(errors: List[Tuple[str, object]]) -> Exception:
+        """what to raise when no member produced an opinion
+        
+        Args:
+            errors: (member name, exception or message) per failed member
+        """
+        if errors and all(isinstance(error, Overloaded) for _, error in errors):
+            # turned away by the llm limiter, not broken: the caller can answer 429
+            return errors[0][1]
+        return Exception(f"All opinion generations failed: {'; '.join(f'{name}: {error}' for name, error in errors)}")
+    
     def generate_deliberation(self, question: str, conversation_history: Optional[List[Dict[str, str]]] = None) -> Dict:
         """complete pipeline: generate opinions (without audio)
         
@@ -161,67 +439,441 @@ When responding to questions or comments, speak only in third person. Give myste
             'opinions': opinions
         }
     
-    def generate_deliberation_with_audio(self, question: str, conversation_history: Optional[List[Dict[str, str]]] = None) -> Dict:
-        """complete pipeline: generate opinions + synthesize audio
+    def _synthesize_opinion(self, member: JuryMember, text: str,
+                            tts_conversation_history: List[Dict[str, str]]) -> Optional[bytes]:
+        """synthesize one bear's opinion, returning None instead of raising on failure"""
+        try:
+            print(f"\nGenerating audio for {member.name}")
+            print(f"   Text preview: {text[:80]}...")
+            
+            audio_bytes = self.tts_service.synthesize_speech(
+                speaker_tag=member.speaker_tag,
+                ref_audio_path=member.ref_audio,
+                ref_transcript=member.ref_transcript,
+                text=text,
+                conversation_history=tts_conversation_history,
+                timeout=self.tts_timeout
+            )
+            
+            # check if audio generation succeeded
+            if audio_bytes:
+                print(f"   ✓ Audio generated successfully for {member.name} ({len(audio_bytes)} bytes)")
+            else:
+                print(f"   ✗ Audio generation failed for {member.name} (returned None)")
+            return audio_bytes
+        
+        except KeyboardInterrupt:
+            print(f"\n✗ Audio generation interrupted by user")
+            raise
+        except Overloaded:
+            # TTS backpressure surfaces as the route's 429, not as a silently missing clip
+            raise
+        except Exception as e:
+            print(f"   ✗ Exception during audio generation for {member.name}: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            return None
+    
+    async def _asynthesize_opinion(self, member: JuryMember, text: str,
+                                   tts_conversation_history: List[Dict[str, str]]) -> Optional[bytes]:
+        """non-blocking variant of _synthesize_opinion"""
+        try:
+            print(f"\nGenerating audio for {member.name}")
+            audio_bytes = await self.tts_service.asynthesize_speech(
+                speaker_tag=member.speaker_tag,
+                ref_audio_path=member.ref_audio,
+                ref_transcript=member.ref_transcript,
+                text=text,
+                conversation_history=tts_conversation_history,
+                timeout=self.tts_timeout
+            )
+            if audio_bytes:
+                print(f"   ✓ Audio generated successfully for {member.name} ({len(audio_bytes)} bytes)")
+            else:
+                print(f"   ✗ Audio generation failed for {member.name} (returned None)")
+            return audio_bytes
+        
+        except Overloaded:
+            raise
+        except Exception as e:
+            print(f"   ✗ Exception during audio generation for {member.name}: {str(e)}")
+            return None
+    
+    def _audio_key(self, member: JuryMember, text: str, tts_history: List[Dict[str, str]]) -> Optional[str]:
+        """TTS cache key of a member's clip, so cached deliberations can point at it"""
+        if not self.tts_service.cache:
+            return None
+        return self.tts_service.cache_key(member.speaker_tag, member.ref_audio,
+                                          member.ref_transcript, text, tts_history)
+    
+    @staticmethod
+    def _extend_tts_history(tts_history: List[Dict[str, str]], member: JuryMember,
+                            text: str) -> List[Dict[str, str]]:
+        """TTS context for the next speaker once this member has been voiced"""
+        return tts_history + [{
+            "role": "user",
+            "content": f"{member.speaker_tag} {text}"
+        }]
+    
+    def _run_member_pipeline(self, index: int, member: JuryMember, opinion_future: Future, deadline: float,
+                             previous: Optional[Future], independent_voices: bool, events: queue.Queue,
+                             abandoned: Optional[threading.Event] = None) -> Dict:
+        """wait for one bear's text, then synthesize it as soon as its TTS context is ready
+        
+        Args:
+            index: position of the member in this deliberation
+            member: jury member being voiced
+            opinion_future: pending LLM call for this member
+            deadline: monotonic time after which the opinion is abandoned
+            previous: pipeline future of the preceding speaker (None for the first)
+            independent_voices: if True, don't wait on or include earlier speakers
+            events: queue receiving 'opinion', 'audio' and 'error' events as they happen
+            abandoned: set once nobody is reading events; the clip is then skipped
+        
+        Returns:
+            {'tts_history': TTS context to hand to the next speaker}
+        """
+        try:
+            text = opinion_future.result(timeout=max(0, deadline - time.monotonic()))
+            events.put({'type': 'opinion', 'index': index, 'member': member, 'text': text})
+        except Exception as e:
+            opinion_future.cancel()
+            error = str(e) or f"timed out after {self.llm_timeout}s"
+            print(f"✗ Opinion for {member.name} failed: {error}")
+            events.put({'type': 'error', 'index': index, 'member': member, 'error': error, 'exception': e})
+            text = None
+        
+        # dependent voices hear earlier speakers, so wait for their clips to finish
+        if independent_voices or previous is None:
+            tts_history = []
+        else:
+            tts_history = previous.result()['tts_history']
+        
+        if text is None or (abandoned is not None and abandoned.is_set()):
+            return {'tts_history': tts_history}
+        
+        audio_key = self._audio_key(member, text, tts_history)
+        audio_bytes = self._synthesize_opinion(member, text, tts_history.copy())
+        events.put({'type': 'audio', 'index': index, 'member': member, 'audio': audio_bytes,
+                    'audio_key': audio_key})
+        if audio_bytes and not independent_voices:
+            tts_history = self._extend_tts_history(tts_history, member, text)
+        
+        return {'tts_history': tts_history}
+    
+    async def _arun_member_pipeline(self, index: int, member: JuryMember, opinion_task: asyncio.Task,
+                                    previous: Optional[asyncio.Task], independent_voices: bool,
+                                    events: asyncio.Queue) -> Dict:
+        """non-blocking variant of _run_member_pipeline (the opinion task carries its own timeout)"""
+        try:
+            text = await opinion_task
+            events.put_nowait({'type': 'opinion', 'index': index, 'member': member, 'text': text})
+        except Exception as e:
+            error = str(e) or f"timed out after {self.llm_timeout}s"
+            print(f"✗ Opinion for {member.name} failed: {error}")
+            events.put_nowait({'type': 'error', 'index': index, 'member': member, 'error': error,
+                               'exception': e})
+            text = None
+        
+        if independent_voices or previous is None:
+            tts_history = []
+        else:
+            tts_history = (await previous)['tts_history']
+        
+        if text is None:
+            return {'tts_history': tts_history}
+        
+        audio_key = self._audio_key(member, text, tts_history)
+        audio_bytes = await self._asynthesize_opinion(member, text, tts_history.copy())
+        events.put_nowait({'type': 'audio', 'index': index, 'member': member, 'audio': audio_bytes,
+                           'audio_key': audio_key})
+        if audio_bytes and not independent_voices:
+            tts_history = self._extend_tts_history(tts_history, member, text)
+        
+        return {'tts_history': tts_history}
+    
+    def _replay_cached(self, entry: Dict, independent_voices: bool) -> Iterator[Dict]:
+        """yield the events of a cached deliberation, re-synthesizing clips that left the TTS cache"""
+        tts_history = []
+        for index, cached in enumerate(entry['opinions']):
+            member = self.get_member(cached['member_id'])
+            text = cached['text']
+            yield {'type': 'opinion', 'index': index, 'member': member, 'text': text, 'cached': True}
+            
+            audio_bytes = None
+            if cached['audio_key'] and self.tts_service.cache:
+                audio_bytes = self.tts_service.cache.get(cached['audio_key'])
+            if audio_bytes is None and cached['had_audio']:
+                history = [] if independent_voices else tts_history
+                audio_bytes = self._synthesize_opinion(member, text, history.copy())
+            yield {'type': 'audio', 'index': index, 'member': member, 'audio': audio_bytes,
+                   'audio_key': cached['audio_key'], 'cached': True}
+            
+            if audio_bytes and not independent_voices:
+                tts_history = self._extend_tts_history(tts_history, member, text)
+    
+    async def _areplay_cached(self, entry: Dict, independent_voices: bool) -> AsyncIterator[Dict]:
+        """non-blocking variant of _replay_cached"""
+        tts_history = []
+        for index, cached in enumerate(entry['opinions']):
+            member = self.get_member(cached['member_id'])
+            text = cached['text']
+            yield {'type': 'opinion', 'index': index, 'member': member, 'text': text, 'cached': True}
+            
+            audio_bytes = None
+            if cached['audio_key'] and self.tts_service.cache:
+                # a disk-tier hit reads the whole clip
+                audio_bytes = await asyncio.to_thread(self.tts_service.cache.get, cached['audio_key'])
+            if audio_bytes is None and cached['had_audio']:
+                history = [] if independent_voices else tts_history
+                audio_bytes = await self._asynthesize_opinion(member, text, history.copy())
+            yield {'type': 'audio', 'index': index, 'member': member, 'audio': audio_bytes,
+                   'audio_key': cached['audio_key'], 'cached': True}
+            
+            if audio_bytes and not independent_voices:
+                tts_history = self._extend_tts_history(tts_history, member, text)
+    
+    def _lookup_cached(self, question: str, conversation_history: Optional[List[Dict[str, str]]],
+                       members: List[JuryMember], independent_voices: bool, use_cache: bool):
+        """deliberation cache key for this request and the cached entry, if any
+        
+        Returns:
+            (cache_key or None, entry or None)
+        """
+        if not self.deliberation_cache:
+            return None, None
+        cache_key = self.deliberation_cache.make_key(
+            question, conversation_history, [m.id for m in members],
+            {'independent_voices': independent_voices}
+        )
+        entry = self.deliberation_cache.get(cache_key) if use_cache else None
+        if entry:
+            print(f"✓ Deliberation cache hit for: {question}")
+        return cache_key, entry
+    
+    def _store_cached(self, cache_key: Optional[str], members: List[JuryMember], events: List[Dict]):
+        """remember a finished deliberation; only complete panels are worth replaying"""
+        if not cache_key:
+            return
+        if self.prepare_voices and not self._voices_prepared:
+            # its clips were cloned from the raw reference audio the prepared voices are about to replace
+            return
+        texts = {e['index']: e['text'] for e in events if e['type'] == 'opinion'}
+        audio = {e['index']: e for e in events if e['type'] == 'audio'}
+        if len(texts) != len(members):
+            return
+        self.deliberation_cache.put(cache_key, {'opinions': [{
+            'member_id': member.id,
+            'text': texts[index],
+            'audio_key': audio[index]['audio_key'] if index in audio else None,
+            'had_audio': bool(index in audio and audio[index]['audio'])
+        } for index, member in enumerate(members)]})
+    
+    def iter_deliberation_with_audio(self, question: str, conversation_history: Optional[List[Dict[str, str]]] = None,
+                                     independent_voices: Optional[bool] = None,
+                                     use_cache: bool = True,
+                                     opinion_futures: Optional[List[Future]] = None) -> Iterator[Dict]:
+        """run the pipelined deliberation, yielding events as each stage completes
+        
+        each bear's TTS starts as soon as its text arrives; unless independent_voices
+        is set, it also waits for the previous speaker's clip so the TTS conversation
+        history stays in speaking order
         
         Args:
             question: user's question or follow-up
             conversation_history: optional list of previous messages
+            independent_voices: override the engine's independent voices setting
+            use_cache: consult and fill the deliberation cache (False forces fresh takes)
+            opinion_futures: opinions already started by speculate_opinions for this question
         
-        Returns:
-            {
-                'question': str,
-                'opinions': List[{member, text}],
-                'audio_files': List[bytes]
-            }
+        Yields:
+            {'type': 'opinion', 'index', 'member', 'text'} when a bear's text is ready,
+            {'type': 'audio', 'index', 'member', 'audio', 'audio_key'} when its clip is done (audio may be None),
+            {'type': 'error', 'index', 'member', 'error', 'exception'} when its opinion failed;
+            events replayed from the deliberation cache also carry 'cached': True
         """
+        if independent_voices is None:
+            independent_voices = self.independent_voices
+        
+        members = self._select_members()
+        cache_key, entry = self._lookup_cached(question, conversation_history, members, independent_voices, use_cache)
+        if entry:
+            self.cancel_speculation(opinion_futures)
+            yield from self._replay_cached(entry, independent_voices)
+            return
+        
         print(f"Generating opinions with audio for: {question}")
-        opinions = self.generate_opinions(question, conversation_history)
+        start = time.monotonic()
+        if opinion_futures is None:
+            opinion_futures = self._submit_opinions(members, question, conversation_history)
+        deadline = start + self.llm_timeout
+        events = queue.Queue()
+        abandoned = threading.Event()
         
-        print("Synthesizing audio...")
-        audio_files = []
-        tts_conversation_history = []
+        # pipeline tasks only wait on earlier submissions, so the FIFO pool can't deadlock
+        pipeline = []
+        previous = None
+        for index, (member, opinion_future) in enumerate(zip(members, opinion_futures)):
+            previous = self.tts_executor.submit(
+                bind_context(self._run_member_pipeline), index, member, opinion_future, deadline,
+                previous, independent_voices, events, abandoned
+            )
+            previous.add_done_callback(lambda _: events.put(None))
+            pipeline.append(previous)
         
-        for idx, entry in enumerate(opinions):
-            try:
-                member = entry['member']
-                text = entry['text']
-                
-                print(f"\n[{idx + 1}/{len(opinions)}] Generating audio for {member.name}")
-                print(f"   Text preview: {text[:80]}...")
-                
-                audio_bytes = self.tts_service.synthesize_speech(
-                    speaker_tag=member.speaker_tag,
-                    ref_audio_path=member.ref_audio,
-                    ref_transcript=member.ref_transcript,
-                    text=text,
-                    conversation_history=tts_conversation_history.copy(),
-                    timeout=300  # 5 minute timeout per audio generation (bosonai can be slow)
-                )
-                
-                # check if audio generation succeeded
-                if audio_bytes:
-                    audio_files.append(audio_bytes)
-                    tts_conversation_history.append({
-                        "role": "user",
-                        "content": f"{member.speaker_tag} {text}"
-                    })
-                    print(f"   ✓ Audio generated successfully ({len(audio_bytes)} bytes)")
-                else:
-                    audio_files.append(None)
-                    print(f"   ✗ Audio generation failed (returned None)")
-                
-            except KeyboardInterrupt:
-                print(f"\n✗ Audio generation interrupted by user")
-                raise
-            except Exception as e:
-                print(f"   ✗ Exception during audio generation: {str(e)}")
-                import traceback
-                traceback.print_exc()
-                audio_files.append(None)
+        seen = []
+        remaining = len(pipeline)
+        try:
+            while remaining:
+                event = events.get()
+                if event is None:
+                    remaining -= 1
+                    continue
+                seen.append(event)
+                yield event
+        finally:
+            if remaining:
+                # closed early (a disconnected SSE client): drop the work nobody will see;
+                # stages already running skip their clip
+                abandoned.set()
+                for future in pipeline:
+                    future.cancel()
+                self.cancel_speculation(opinion_futures)
+        
+        # surface unexpected pipeline crashes instead of silently dropping a bear
+        for future in pipeline:
+            future.result()
+        
+        observe_stage('deliberation', time.monotonic() - start)
+        print(f"Deliberation finished in {time.monotonic() - start:.1f}s")
+        self._store_cached(cache_key, members, seen)
+    
+    async def aiter_deliberation_with_audio(self, question: str,
+                                            conversation_history: Optional[List[Dict[str, str]]] = None,
+                                            independent_voices: Optional[bool] = None,
+                                            use_cache: bool = True,
+                                            opinion_tasks: Optional[List[asyncio.Task]] = None) -> AsyncIterator[Dict]:
+        """non-blocking variant of iter_deliberation_with_audio
+        
+        upstream calls are awaited on the running event loop instead of holding
+        pool threads, so one process can keep many deliberations in flight
+        """
+        if independent_voices is None:
+            independent_voices = self.independent_voices
+        
+        members = self._select_members()
+        cache_key, entry = self._lookup_cached(question, conversation_history, members, independent_voices, use_cache)
+        if entry:
+            self.cancel_speculation(opinion_tasks)
+            async for event in self._areplay_cached(entry, independent_voices):
+                yield event
+            return
+        
+        print(f"Generating opinions with audio for: {question}")
+        start = time.monotonic()
+        events = asyncio.Queue()
+        if opinion_tasks is None:
+            opinion_tasks = self._start_opinion_tasks(members, question, conversation_history)
+        
+        pipeline = []
+        previous = None
+        for index, (member, opinion_task) in enumerate(zip(members, opinion_tasks)):
+            previous = asyncio.ensure_future(self._arun_member_pipeline(
+                index, member, opinion_task, previous, independent_voices, events
+            ))
+            previous.add_done_callback(lambda _: events.put_nowait(None))
+            pipeline.append(previous)
+        
+        seen = []
+        remaining = len(pipeline)
+        try:
+            while remaining:
+                event = await events.get()
+                if event is None:
+                    remaining -= 1
+                    continue
+                seen.append(event)
+                yield event
+        finally:
+            # a disconnected client shouldn't leave upstream calls running
+            for task in pipeline:
+                if not task.done():
+                    task.cancel()
+        
+        for task in pipeline:
+            task.result()
+        
+        observe_stage('deliberation', time.monotonic() - start)
+        print(f"Deliberation finished in {time.monotonic() - start:.1f}s")
+        self._store_cached(cache_key, members, seen)
+    
+    def _collect_result(self, question: str, events: List[Dict]) -> Dict:
+        """fold deliberation events into the generate_deliberation_with_audio result"""
+        texts = {}
+        audio = {}
+        errors = []
+        cached = False
+        for event in events:
+            cached = event.get('cached', False)
+            if event['type'] == 'opinion':
+                texts[event['index']] = (event['member'], event['text'])
+            elif event['type'] == 'audio':
+                audio[event['index']] = event['audio']
+            else:
+                busy = isinstance(event.get('exception'), Overloaded)
+                errors.append((event['member'].name, event['exception'] if busy else event['error']))
+        
+        if not texts:
+            raise self._opinions_failure(errors)
+        
+        opinions = []
+        audio_files = []
+        for index in sorted(texts):
+            member, text = texts[index]
+            opinions.append({'member': member, 'text': text})
+            audio_files.append(audio.get(index))
         
         return {
             'question': question,
             'opinions': opinions,
-            'audio_files': audio_files
+            'audio_files': audio_files,
+            'cached': cached
         }
+    
+    def generate_deliberation_with_audio(self, question: str, conversation_history: Optional[List[Dict[str, str]]] = None,
+                                         independent_voices: Optional[bool] = None, use_cache: bool = True,
+                                         opinion_futures: Optional[List[Future]] = None) -> Dict:
+        """complete pipeline: generate opinions + synthesize audio
+        
+        Args:
+            question: user's question or follow-up
+            conversation_history: optional list of previous messages
+            independent_voices: override the engine's independent voices setting
+            use_cache: consult and fill the deliberation cache (False forces fresh takes)
+            opinion_futures: opinions already started by speculate_opinions for this question
+        
+        Returns:
+            {
+                'question': str,
+                'opinions': List[{member, text}],
+                'audio_files': List[bytes],
+                'cached': bool
+            }
+        
+        Raises:
+            Exception: if no member produced an opinion
+        """
+        events = list(self.iter_deliberation_with_audio(question, conversation_history, independent_voices, use_cache,
+                                                        opinion_futures))
+        return self._collect_result(question, events)
+    
+    async def agenerate_deliberation_with_audio(self, question: str,
+                                                conversation_history: Optional[List[Dict[str, str]]] = None,
+                                                independent_voices: Optional[bool] = None,
+                                                use_cache: bool = True,
+                                                opinion_tasks: Optional[List[asyncio.Task]] = None) -> Dict:
+        """non-blocking variant of generate_deliberation_with_audio"""
+        events = [event async for event in self.aiter_deliberation_with_audio(
+            question, conversation_history, independent_voices, use_cache, opinion_tasks
+        )]
+        return self._collect_result(question, events)
@@ -0,0 +1,635 @@
+"""shared configuration, services and request helpers for the Flask and ASGI servers"""
+import os
+import json
+import re
+import threading
+import uuid
+from typing import Callable, Dict, Optional, Tuple
+from dotenv import load_dotenv
+from jury_engine import JuryEngine
+from services import (
+    GeminiASRService, LocalWhisperService, WhisperService, FallbackASRService, transcripts_match,
+    SynthesisCache, DeliberationCache, HistoryManager, MemoryConversationBackend, SessionAudioStore,
+    AudioBlob, FileAudioBackend, MemoryAudioBackend, transcode, available_formats, pool_stats,
+    Limiter, Overloaded, configure_upstream, upstream_stats, ResilientEndpoint, Readiness,
+    registry, span, add_bytes, is_transient_api_error
+)
+
+# load environment variables
+load_dotenv()
+
+# get API keys from environment
+BOSON_API_KEY = os.getenv('BOSON_API_KEY')
+GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
+
+# check required keys
+if not BOSON_API_KEY:
+    print("WARNING: BOSON_API_KEY not found in environment variables")
+if not GOOGLE_API_KEY:
+    print("WARNING: GOOGLE_API_KEY not found in environment variables")
+
+# synthesized clips are reused across sessions (replays, retries, repeated questions)
+tts_cache = None
+if os.getenv('TTS_CACHE_ENABLED', 'true').lower() == 'true':
+    tts_cache = SynthesisCache(
+        memory_max_bytes=int(os.getenv('TTS_CACHE_MEMORY_MB', 64)) * 1024 * 1024,
+        disk_dir=os.getenv('TTS_CACHE_DIR', os.path.join(os.path.dirname(__file__), 'cache', 'tts')) or None,
+        disk_max_bytes=int(os.getenv('TTS_CACHE_DISK_MB', 512)) * 1024 * 1024
+    )
+
+# opt-in: replay popular questions instead of regenerating every opinion and clip
+deliberation_cache = None
+if os.getenv('DELIBERATION_CACHE_ENABLED', 'false').lower() == 'true':
+    deliberation_cache = DeliberationCache(
+        ttl=float(os.getenv('DELIBERATION_CACHE_TTL', 3600)),
+        max_entries=int(os.getenv('DELIBERATION_CACHE_SIZE', 256)),
+        history_window=int(os.getenv('DELIBERATION_CACHE_HISTORY_WINDOW', 6))
+    )
+
+# admission control: at most ADMISSION_MAX_ACTIVE deliberations run at once and
+# the rest wait in a bounded queue, served round-robin across clients; when the
+# queue is full (or a wait times out) the request is answered 429 right away
+opinion_admission = Limiter(
+    'opinions',
+    max_active=int(os.getenv('ADMISSION_MAX_ACTIVE', 16)),
+    max_queue=int(os.getenv('ADMISSION_MAX_QUEUE', 64)),
+    max_per_client=int(os.getenv('ADMISSION_MAX_PER_CLIENT', 4)),
+    timeout=float(os.getenv('ADMISSION_QUEUE_TIMEOUT', 30)),
+    expected_hold=float(os.getenv('ADMISSION_EXPECTED_SECONDS', 20))
+)
+# reverse proxies in front of the server; X-Forwarded-For is only believed for the hops
+# they appended, since anything further left is whatever the caller chose to send
+TRUSTED_PROXIES = int(os.getenv('TRUSTED_PROXIES', 0))
+
+# concurrent calls per upstream (0 = unlimited), so a burst queues here
+# instead of tripping the providers' rate limits all at once
+UPSTREAM_WAIT_TIMEOUT = float(os.getenv('UPSTREAM_WAIT_TIMEOUT', 120))
+for _upstream, _default in (('llm', 16), ('tts', 16), ('asr', 8)):
+    configure_upstream(_upstream, int(os.getenv(f'{_upstream.upper()}_MAX_CONCURRENCY', _default)),
+                       timeout=UPSTREAM_WAIT_TIMEOUT)
+
+# ASR backends in order of preference, e.g. ASR_BACKENDS=local,gemini; the
+# first that succeeds answers, later ones are fallbacks. created before the
+# engine so the local backend's worker processes fork from a thread-free parent
+ASR_BACKENDS = [name.strip().lower() for name in os.getenv('ASR_BACKENDS', 'gemini').split(',') if name.strip()]
+
+
+def _create_asr_backend(name: str):
+    if name == 'local':
+        return LocalWhisperService(
+            model_size=os.getenv('LOCAL_ASR_MODEL', 'base.en'),
+            workers=int(os.getenv('LOCAL_ASR_WORKERS', 1)),
+            compute_type=os.getenv('LOCAL_ASR_COMPUTE_TYPE', 'int8'),
+            cpu_threads=int(os.getenv('LOCAL_ASR_CPU_THREADS', 0))
+        )
+    if name == 'gemini':
+        return GeminiASRService(
+            api_key=GOOGLE_API_KEY,
+            chunk_threshold=int(float(os.getenv('ASR_CHUNK_THRESHOLD_MB', 8)) * 1024 * 1024),
+            chunk_seconds=float(os.getenv('ASR_CHUNK_SECONDS', 20)),
+            max_workers=int(os.getenv('ASR_MAX_WORKERS', 4)),
+            draft_seconds=float(os.getenv('ASR_DRAFT_SECONDS', 4))
+        )
+    if name == 'whisper':
+        return WhisperService(max_connections=int(os.getenv('WHISPER_MAX_CONNECTIONS', 64)))
+    raise ValueError(f"unknown ASR backend '{name}'")
+
+
+asr_backends = []
+for _name in ASR_BACKENDS:
+    try:
+        asr_backends.append((_name, _create_asr_backend(_name)))
+        print(f"{_name} ASR initialized successfully")
+    except Exception as e:
+        print(f"ERROR: Failed to initialize {_name} ASR: {str(e)}")
+
+asr_service = None
+if len(asr_backends) == 1:
+    asr_service = asr_backends[0][1]
+elif asr_backends:
+    asr_service = FallbackASRService(asr_backends)
+
+# start opinions on a draft transcript while the final ASR pass is still running
+# (needs a backend with a draft pass, i.e. gemini on its own, and ffmpeg)
+SPECULATIVE_ASR = os.getenv('SPECULATIVE_ASR', 'false').lower() == 'true'
+SPECULATION_MATCH_THRESHOLD = float(os.getenv('SPECULATION_MATCH_THRESHOLD', 0.9))
+
+# voice cloning attempts time out at a multiple of observed p99, are hedged past
+# p95, retried with jitter, and skipped for the fallback voice while the circuit is open
+tts_resilience = ResilientEndpoint(
+    'bosonai-clone',
+    min_timeout=float(os.getenv('TTS_MIN_TIMEOUT', 10)),
+    default_timeout=float(os.getenv('TTS_DEFAULT_TIMEOUT', 120)),
+    timeout_factor=float(os.getenv('TTS_TIMEOUT_FACTOR', 2)),
+    hedge=os.getenv('TTS_HEDGE', 'true').lower() == 'true',
+    retries=int(os.getenv('TTS_RETRIES', 2)),
+    failure_threshold=int(os.getenv('TTS_BREAKER_FAILURES', 5)),
+    reset_after=float(os.getenv('TTS_BREAKER_RESET', 30)),
+    retryable=is_transient_api_error
+)
+
+# with WARMUP on, the engine is built without its slow start-up work, which then
+# runs in the background (see readiness below) while the server already answers
+WARMUP = os.getenv('WARMUP', 'true').lower() == 'true'
+
+# initialize jury engine
+engine = None
+if BOSON_API_KEY and GOOGLE_API_KEY:
+    try:
+        engine = JuryEngine(
+            boson_api_key=BOSON_API_KEY,
+            google_api_key=GOOGLE_API_KEY,
+            llm_max_workers=int(os.getenv('LLM_MAX_WORKERS', 8)),
+            llm_timeout=float(os.getenv('LLM_TIMEOUT', 60)),
+            tts_max_workers=int(os.getenv('TTS_MAX_WORKERS', 8)),
+            independent_voices=os.getenv('INDEPENDENT_VOICES', 'false').lower() == 'true',
+            prepare_voices=os.getenv('PREPARE_VOICES', 'true').lower() == 'true',
+            voice_max_seconds=float(os.getenv('VOICE_MAX_SECONDS')) if os.getenv('VOICE_MAX_SECONDS') else None,
+            tts_cache=tts_cache,
+            deliberation_cache=deliberation_cache,
+            tts_max_connections=int(os.getenv('BOSON_MAX_CONNECTIONS', 64)),
+            opinion_strategy=os.getenv('OPINION_STRATEGY', 'per_member').lower(),
+            tts_resilience=tts_resilience,
+            tts_timeout=float(os.getenv('TTS_TIMEOUT', 300)),
+            tts_fallback_timeout=float(os.getenv('TTS_FALLBACK_TIMEOUT', 60)),
+            warm=not WARMUP
+        )
+        print("Jury engine initialized successfully")
+    except Exception as e:
+        print(f"ERROR: Failed to initialize jury engine: {str(e)}")
+
+# long conversations are capped to a token budget; older turns are summarized per conversation
+HISTORY_TOKEN_BUDGET = int(os.getenv('HISTORY_TOKEN_BUDGET', 1200))
+HISTORY_MAX_MESSAGES = int(os.getenv('HISTORY_MAX_MESSAGES', 200))
+HISTORY_MAX_CHARS = int(os.getenv('HISTORY_MAX_CHARS', 50000))
+history_manager = HistoryManager(
+    summarize=engine.llm_service.summarize_history
+    if engine and os.getenv('HISTORY_SUMMARIES', 'true').lower() == 'true' else None,
+    token_budget=HISTORY_TOKEN_BUDGET,
+    ttl=float(os.getenv('HISTORY_SUMMARY_TTL', 3600))
+)
+
+# conversations are held server-side, so follow-ups only carry the new question
+CONVERSATION_TTL = float(os.getenv('CONVERSATION_TTL', 3600))
+conversation_store = MemoryConversationBackend(
+    ttl=CONVERSATION_TTL,
+    max_conversations=int(os.getenv('CONVERSATION_MAX', 10000)),
+    max_messages=HISTORY_MAX_MESSAGES
+)
+
+# create temp directory for audio files
+TEMP_DIR = os.path.join(os.path.dirname(__file__), 'temp')
+
+# session audio is deleted after a TTL and whenever the store outgrows its budget
+audio_store = SessionAudioStore(
+    root=TEMP_DIR,
+    ttl=float(os.getenv('AUDIO_SESSION_TTL', 3600)),
+    max_bytes=int(os.getenv('AUDIO_STORE_MAX_MB', 1024)) * 1024 * 1024,
+    janitor_interval=float(os.getenv('AUDIO_JANITOR_INTERVAL', 60))
+)
+audio_store.reconcile()
+audio_store.start_janitor()
+
+# clips are already in memory right after generation, so serve repeat fetches from there
+AUDIO_BACKEND = os.getenv('AUDIO_BACKEND', 'tiered').lower()
+AUDIO_MEMORY_BYTES = int(os.getenv('AUDIO_MEMORY_MB', 128)) * 1024 * 1024
+if AUDIO_BACKEND == 'file':
+    audio_backend = FileAudioBackend(audio_store)
+elif AUDIO_BACKEND == 'memory':
+    audio_backend = MemoryAudioBackend(max_bytes=AUDIO_MEMORY_BYTES)
+else:
+    audio_backend = MemoryAudioBackend(max_bytes=AUDIO_MEMORY_BYTES, backing=FileAudioBackend(audio_store))
+
+# session clips never change, so clients may cache them for as long as the session lives
+AUDIO_CACHE_MAX_AGE = int(audio_store.ttl)
+
+
+API_INFO = {
+    'name': 'The Jury API',
+    'version': '2.0.0',
+    'description': 'AI voice-based conversation with We Bare Bears personalities - Powered by Gemini + BosonAI',
+    'endpoints': {
+        'GET /health': 'Health check (liveness, with warm-up progress under readiness)',
+        'GET /health/ready': 'Readiness: 200 once start-up warm-up has finished, 503 before',
+        'GET /api/jury-members': 'List all We Bare Bears jury members',
+        'POST /api/transcribe': 'Transcribe audio to text (local, Gemini or Whisper ASR per ASR_BACKENDS)',
+        'POST /api/opinions': 'Generate bear opinions with audio (accepts audio file or JSON with question)',
+        'POST /api/opinions/stream': 'Same as /api/opinions, streamed as Server-Sent Events per bear',
+        'GET /api/audio/<session_id>/<index>': 'Get audio file for a bear response (?format=wav|opus|mp3|flac or Accept header)',
+        'GET|POST /api/speech/stream': 'Stream a bear speaking the given text as a progressive WAV'
+    }
+}
+
+
+# start-up warm-up: reference voices are prepared and encoded, upstream connection
+# pools opened and (with WARMUP_PRIME, which costs a little quota) each upstream
+# sent a tiny request, so a fresh instance's first users don't pay for any of it.
+# the server is live throughout; /health/ready says when it's worth routing to
+WARMUP_PRIME = os.getenv('WARMUP_PRIME', 'false').lower() == 'true'
+WARMUP_CONNECTIONS = int(os.getenv('WARMUP_CONNECTIONS', 4))
+readiness = Readiness(timeout=float(os.getenv('WARMUP_TIMEOUT', 60)))
+
+
+def warmup_steps() -> list:
+    """(name, callable) pairs run concurrently by the warm-up"""
+    steps = []
+    if engine:
+        steps += [
+            ('reference_voices', engine.warm_voices),
+            ('llm', lambda: engine.llm_service.warm_up(prime=WARMUP_PRIME)),
+            ('tts', lambda: engine.tts_service.warm_up(WARMUP_CONNECTIONS, prime=WARMUP_PRIME))
+        ]
+    if asr_service:
+        steps.append(('asr', asr_service.warm_up))
+    return steps
+
+
+if WARMUP:
+    readiness.start(warmup_steps())
+
+
+# cache, queue and store gauges for /metrics, read from the same stats as /health
+for _prefix, _read in (
+    ('jury_admission', opinion_admission.stats),
+    ('jury_upstream', upstream_stats),
+    ('jury_tts_resilience', tts_resilience.stats),
+    ('jury_tts_cache', lambda: tts_cache.stats() if tts_cache else None),
+    ('jury_deliberation_cache', lambda: deliberation_cache.stats() if deliberation_cache else None),
+    ('jury_reference_audio_cache', lambda: engine.tts_service.ref_audio_cache.stats() if engine else None),
+    ('jury_llm_usage', lambda: engine.llm_service.usage_stats() if engine else None),
+    ('jury_history', history_manager.stats),
+    ('jury_conversations', conversation_store.stats),
+    ('jury_audio_store', audio_backend.stats),
+    ('jury_client_pools', pool_stats),
+    ('jury_readiness', readiness.stats)
+):
+    registry.stats_gauges(_prefix, _read)
+
+
+def health_payload() -> Dict:
+    """body of the /health endpoint"""
+    return {
+        'status': 'healthy',
+        'services': {
+            'bosonai_tts': 'connected' if BOSON_API_KEY else 'not configured',
+            'google_gemini': 'connected' if GOOGLE_API_KEY else 'not configured',
+            'asr': [name for name, _ in asr_backends] or 'not configured'
+        },
+        'engine': 'initialized' if engine else 'not initialized',
+        'readiness': readiness.stats(),
+        'opinion_strategy': engine.opinion_strategy if engine else None,
+        'llm_usage': engine.llm_service.usage_stats() if engine else None,
+        'history': history_manager.stats(),
+        'conversations': conversation_store.stats(),
+        'admission': {'opinions': opinion_admission.stats(), 'upstreams': upstream_stats()},
+        'tts_resilience': tts_resilience.stats(),
+        'caches': {
+            'reference_audio': engine.tts_service.ref_audio_cache.stats() if engine else None,
+            'tts': tts_cache.stats() if tts_cache else None,
+            'deliberation': deliberation_cache.stats() if deliberation_cache else None
+        },
+        'clients': pool_stats(),
+        'audio_store': audio_backend.stats(),
+        'audio_formats': list(available_formats())
+    }
+
+
+def readiness_payload() -> Tuple[Dict, int]:
+    """body and status of /health/ready: 503 until the warm-up is done, so load balancers hold traffic back"""
+    stats = readiness.stats()
+    return stats, 200 if stats['ready'] else 503
+
+
+def jury_members_payload():
+    """body of the /api/jury-members endpoint"""
+    return [{
+        'id': member.id,
+        'name': member.name,
+        'stance': member.stance
+    } for member in engine.jury_members]
+
+
+def validate_question(question: str) -> Optional[str]:
+    """return an error message if the question can't be deliberated"""
+    if len(question) < 3:
+        return 'Question must be at least 3 characters'
+    if len(question) > 500:
+        return 'Question must be less than 500 characters'
+    return None
+
+
+def validate_history(history) -> Optional[str]:
+    """return an error message if the conversation history is malformed or too large"""
+    if not isinstance(history, list):
+        return 'Conversation history must be a list'
+    if len(history) > HISTORY_MAX_MESSAGES:
+        return f'Conversation history must have at most {HISTORY_MAX_MESSAGES} messages'
+    total = 0
+    for message in history:
+        if not isinstance(message, dict) or not isinstance(message.get('content'), str) \
+                or not isinstance(message.get('role'), str):
+            return 'Conversation history messages need a role and content'
+        total += len(message['content'])
+    if total > HISTORY_MAX_CHARS:
+        return f'Conversation history must be less than {HISTORY_MAX_CHARS} characters'
+    return None
+
+
+CONVERSATION_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+
+
+def open_conversation(raw_history, conversation_id=None, session_id=None,
+                      question: Optional[str] = None) -> Tuple[Optional[str], list, Optional[str]]:
+    """find or start the conversation a request belongs to
+    
+    a conversation held server-side is found by conversation_id or by the
+    session_id of the deliberation being followed up, and its history comes
+    from the store; anything the client sent is ignored. otherwise the
+    client's own history (older clients resend all of it) is validated and
+    seeds a new conversation.
+    
+    Args:
+        raw_history: conversation_history as sent (JSON value or form string)
+        conversation_id: conversation the client says it's in, if any
+        session_id: session of the deliberation being followed up, if any
+        question: the current question, dropped from the end of a client-sent history
+    
+    Returns:
+        (conversation id, previous messages, error message or None)
+    """
+    if not (isinstance(conversation_id, str) and CONVERSATION_ID_PATTERN.match(conversation_id)):
+        conversation_id = None
+    if not conversation_id and isinstance(session_id, str) and SessionAudioStore.is_valid_session_id(session_id):
+        conversation_id = conversation_store.resolve(session_id)
+    if conversation_id:
+        previous = conversation_store.load(conversation_id)
+        if previous is not None:
+            return conversation_id, previous, None
+    
+    try:
+        history = parse_history(raw_history)
+    except ValueError:
+        return None, [], 'Conversation history must be valid JSON'
+    error = validate_history(history)
+    if error:
+        return None, [], error
+    
+    last = history[-1] if history else None
+    if question and last and last['role'] == 'user' and last['content'].strip() == question:
+        history = history[:-1]
+    
+    conversation_id = conversation_id or uuid.uuid4().hex
+    if history:
+        conversation_store.append(conversation_id, history)
+    return conversation_id, history, None
+
+
+def turn_history(previous: list, question: str, conversation_id: str) -> list:
+    """history to prompt with for this turn: previous messages plus the question, compacted to budget"""
+    return history_manager.compact(previous + [{'role': 'user', 'content': question}], conversation_id)
+
+
+def record_turn(conversation_id: Optional[str], session_id: str, question: str, opinions: list):
+    """append a finished turn to its conversation and point the deliberation's session at it
+    
+    Args:
+        opinions: (speaker name, text) pairs in speaking order
+    """
+    if not conversation_id:
+        return
+    messages = [{'role': 'user', 'content': question}]
+    if opinions:
+        messages.append({'role': 'assistant', 'content': ' '.join(f"{name}: {text}" for name, text in opinions)})
+    conversation_store.append(conversation_id, messages)
+    conversation_store.alias(session_id, conversation_id)
+
+
+def parse_history(raw) -> list:
+    """conversation history from a JSON body value or a multipart form string"""
+    if not raw:
+        return []
+    if isinstance(raw, str):
+        return json.loads(raw)
+    return raw
+
+
+def is_truthy(value) -> bool:
+    """interpret a query/form/JSON flag"""
+    return str(value).lower() in ('1', 'true', 'yes')
+
+
+def client_key(forwarded_for: Optional[str], remote_addr: Optional[str]) -> str:
+    """who a request counts against for admission fairness
+    
+    the peer address, unless TRUSTED_PROXIES is set: then the address the
+    outermost trusted proxy saw, i.e. the TRUSTED_PROXIES-th X-Forwarded-For
+    hop from the right (as werkzeug's ProxyFix(x_for=N) reads it)
+    """
+    if TRUSTED_PROXIES and forwarded_for:
+        hops = [hop.strip() for hop in forwarded_for.split(',') if hop.strip()]
+        if len(hops) >= TRUSTED_PROXIES:
+            return hops[-TRUSTED_PROXIES]
+    return remote_addr or ''
+
+
+def overloaded_response(error: Overloaded) -> Tuple[Dict, Dict]:
+    """body and headers of the 429 sent when a request can't be admitted"""
+    return {
+        'error': 'Server is busy, please retry shortly',
+        'queue_position': error.position,
+        'retry_after': error.retry_after
+    }, {'Retry-After': str(error.retry_after)}
+
+
+def _resolve_speculation(speculation: Dict, final: str) -> Optional[list]:
+    """keep speculative opinions if the final transcript asks the same thing, else cancel them"""
+    if not speculation:
+        return None
+    if validate_question(final) is None and transcripts_match(speculation['question'], final,
+                                                              SPECULATION_MATCH_THRESHOLD):
+        print(f"✓ Final transcript matches the draft; keeping speculative opinions")
+        return speculation['opinions']
+    print(f"✗ Final transcript differs from draft '{speculation['question']}'; restarting opinions")
+    engine.cancel_speculation(speculation['opinions'])
+    return None
+
+
+def _can_speculate() -> bool:
+    return SPECULATIVE_ASR and engine is not None and hasattr(asr_service, 'transcribe_with_draft')
+
+
+def speculative_transcribe(audio_file, history_for: Callable[[str], list]) -> Tuple[str, Optional[list]]:
+    """transcribe an upload, starting the bears' opinions on the draft transcript when enabled
+    
+    Args:
+        audio_file: the upload
+        history_for: builds the prompt history for a question (see turn_history)
+    
+    Returns:
+        (final transcript, opinion futures started on a matching draft or None)
+    """
+    if not _can_speculate():
+        with span('asr'):
+            return asr_service.transcribe_audio(audio_file)['text'], None
+    
+    speculation = {}
+    
+    def on_draft(text):
+        if validate_question(text) is None:
+            speculation['question'] = text
+            speculation['opinions'] = engine.speculate_opinions(text, history_for(text))
+    
+    try:
+        with span('asr'):
+            final = asr_service.transcribe_with_draft(audio_file, on_draft)['text']
+    except Exception:
+        if speculation:
+            engine.cancel_speculation(speculation['opinions'])
+        raise
+    return final, _resolve_speculation(speculation, final)
+
+
+async def aspeculative_transcribe(audio_file, history_for: Callable[[str], list]) -> Tuple[str, Optional[list]]:
+    """non-blocking variant of speculative_transcribe, returning opinion tasks"""
+    if not _can_speculate():
+        with span('asr'):
+            return (await asr_service.atranscribe_audio(audio_file))['text'], None
+    
+    speculation = {}
+    
+    def on_draft(text):
+        if validate_question(text) is None:
+            speculation['question'] = text
+            speculation['opinions'] = engine.aspeculate_opinions(text, history_for(text))
+    
+    try:
+        with span('asr'):
+            final = (await asr_service.atranscribe_with_draft(audio_file, on_draft))['text']
+    except Exception:
+        if speculation:
+            engine.cancel_speculation(speculation['opinions'])
+        raise
+    return final, _resolve_speculation(speculation, final)
+
+
+def new_session() -> str:
+    """allocate a session in the audio backend for a deliberation's clips"""
+    return audio_backend.create_session()
+
+
+_variant_locks = {}
+_variant_locks_guard = threading.Lock()
+
+
+def get_session_audio(session_id: str, index: int, fmt: str = 'wav') -> Optional[AudioBlob]:
+    """a session's clip in the given format, or None if it's gone
+    
+    compressed variants are encoded from the stored WAV on first request and
+    kept in the session next to it, so Range requests and replays reuse them.
+    if encoding fails the WAV is returned instead.
+    """
+    blob = audio_backend.get(session_id, f'{index}.{fmt}')
+    if blob or fmt == 'wav':
+        return blob
+    
+    key = (session_id, index, fmt)
+    with _variant_locks_guard:
+        lock = _variant_locks.setdefault(key, threading.Lock())
+    try:
+        with lock:
+            # another request may have encoded it while we waited
+            blob = audio_backend.get(session_id, f'{index}.{fmt}')
+            if blob:
+                return blob
+            
+            source = audio_backend.get(session_id, f'{index}.wav')
+            if not source:
+                return None
+            try:
+                if source.data is not None:
+                    wav_bytes = source.data
+                else:
+                    with open(source.path, 'rb') as f:
+                        wav_bytes = f.read()
+                with span('transcode'):
+                    encoded = transcode(wav_bytes, fmt)
+                audio_backend.put(session_id, f'{index}.{fmt}', encoded)
+                print(f"✓ Encoded audio {index} as {fmt}: {len(wav_bytes)} -> {len(encoded)} bytes")
+            except Exception as e:
+                print(f"✗ Failed to encode audio {index} as {fmt}, serving wav: {str(e)}")
+                return source
+            return audio_backend.get(session_id, f'{index}.{fmt}') or source
+    finally:
+        with _variant_locks_guard:
+            if _variant_locks.get(key) is lock and not lock.locked():
+                _variant_locks.pop(key, None)
+
+
+def save_session_audio(session_id, idx, audio_bytes, member):
+    """write one bear's clip into the session, returning its index or None"""
+    if not audio_bytes:
+        print(f"✗ No audio generated for {member.name}")
+        return None
+    try:
+        with span('audio_write'):
+            audio_backend.put(session_id, f'{idx}.wav', audio_bytes)
+        add_bytes('audio_written', len(audio_bytes))
+        print(f"✓ Saved audio file {idx} for {member.name}")
+        return idx
+    except Exception as audio_error:
+        print(f"✗ Failed to save audio {idx} for {member.name}: {str(audio_error)}")
+        return None
+
+
+def build_opinions_response(question: str, result: Dict, conversation_id: Optional[str] = None) -> Dict:
+    """save a finished deliberation's clips, record the turn and build the /api/opinions body"""
+    session_id = new_session()
+    
+    opinions = []
+    for idx, (entry, audio_bytes) in enumerate(zip(result['opinions'], result['audio_files'])):
+        opinions.append({
+            'speaker': entry['member'].name,
+            'text': entry['text'],
+            'audio_index': save_session_audio(session_id, idx, audio_bytes, entry['member'])
+        })
+    audio_success_count = sum(1 for opinion in opinions if opinion['audio_index'] is not None)
+    record_turn(conversation_id, session_id, question, [(o['speaker'], o['text']) for o in opinions])
+    
+    print(f"\n{'='*60}")
+    print(f"✓ Generated {len(opinions)} opinions")
+    print(f"✓ Audio files saved: {audio_success_count}/{len(opinions)}")
+    print(f"✓ Session ID: {session_id}")
+    print(f"{'='*60}\n")
+    
+    return {
+        'session_id': session_id,
+        'conversation_id': conversation_id,
+        'question': question,
+        'opinions': opinions,
+        'cached': result['cached']
+    }
+
+
+def sse(event, data):
+    """format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def deliberation_sse(event: Dict, session_id: str) -> Tuple[str, str]:
+    """turn one engine event into an SSE message, saving audio to the session first
+    
+    Returns:
+        (event name, formatted message)
+    """
+    member = event['member']
+    if event['type'] == 'opinion':
+        name, data = 'opinion', {'index': event['index'], 'speaker': member.name, 'text': event['text'],
+                                 'cached': event.get('cached', False)}
+    elif event['type'] == 'audio':
+        if save_session_audio(session_id, event['index'], event['audio'], member) is None:
+            name, data = 'audio_failed', {'index': event['index'], 'speaker': member.name}
+        else:
+            name, data = 'audio_ready', {'session_id': session_id, 'index': event['index'], 'speaker': member.name}
+    else:
+        name, data = 'error', {'index': event['index'], 'speaker': member.name, 'error': event['error']}
+    return name, sse(name, data)
@@ -1,7 +1,39 @@
 # services package
-from .asr_service import WhisperService, GeminiASRService
+from .clients import (
+    configure_genai, get_gemini_model, get_openai_client, get_async_openai_client, pool_stats, is_transient_api_error
+)
+from .metrics import (
+    registry, span, add_bytes, observe_stage, observe_request, render_metrics,
+    bind_context, new_request_id, current_request_id
+)
+from .admission import Limiter, Overloaded, configure_upstream, upstream, upstream_stats
+from .resilience import CircuitBreaker, CircuitOpen, LatencyTracker, ResilientEndpoint, is_transient
+from .warmup import Readiness
+from .asr_service import WhisperService, GeminiASRService, LocalWhisperService, FallbackASRService, transcripts_match
 from .llm_service import LLMService
-from .tts_service import TTSService
+from .ref_audio_cache import ReferenceAudioCache, reference_audio_cache
+from .tts_cache import SynthesisCache
+from .deliberation_cache import DeliberationCache
+from .history import HistoryManager, estimate_tokens
+from .conversation_store import ConversationBackend, MemoryConversationBackend
+from .session_store import SessionAudioStore
+from .audio_backend import AudioBackend, AudioBlob, FileAudioBackend, MemoryAudioBackend
+from .audio_upload import UploadTooLarge
+from .transcode import negotiate_format, transcode, available_formats
+from .voice_prep import PreparedVoice, prepare_voice
+from .tts_service import TTSService, pcm_to_wav, wav_stream_header
 
-__all__ = ['WhisperService', 'GeminiASRService', 'LLMService', 'TTSService']
+__all__ = ['WhisperService', 'GeminiASRService', 'LocalWhisperService', 'FallbackASRService', 'transcripts_match',
+           'LLMService', 'TTSService', 'pcm_to_wav', 'wav_stream_header',
+           'ReferenceAudioCache', 'reference_audio_cache', 'PreparedVoice', 'prepare_voice',
+           'SynthesisCache', 'DeliberationCache', 'HistoryManager', 'estimate_tokens',
+           'ConversationBackend', 'MemoryConversationBackend',
+           'configure_genai', 'get_gemini_model', 'get_openai_client', 'get_async_openai_client', 'pool_stats',
+           'is_transient_api_error',
+           'SessionAudioStore', 'AudioBackend', 'AudioBlob', 'FileAudioBackend', 'MemoryAudioBackend', 'UploadTooLarge',
+           'negotiate_format', 'transcode', 'available_formats',
+           'Limiter', 'Overloaded', 'configure_upstream', 'upstream', 'upstream_stats',
+           'CircuitBreaker', 'CircuitOpen', 'LatencyTracker', 'ResilientEndpoint', 'is_transient', 'Readiness',
+           'registry', 'span', 'add_bytes', 'observe_stage', 'observe_request', 'render_metrics',
+           'bind_context', 'new_request_id', 'current_request_id']
 
@@ -0,0 +1,274 @@
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Optional
+
+
+class Overloaded(Exception):
+    """a request couldn't get a slot; carries what the 429 should tell the client"""
+
+    def __init__(self, name: str, position: int, retry_after: int):
+        super().__init__(f"{name} is at capacity (queue position {position})")
+        self.name = name
+        self.position = position
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    """one queued acquire, woken by whichever thread releases a slot to it"""
+
+    def __init__(self, client: str, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.client = client
+        self.loop = loop
+        self.future = loop.create_future() if loop else None
+        self.event = None if loop else threading.Event()
+        self.granted = False
+
+    def wake(self):
+        if self.loop is None:
+            self.event.set()
+            return
+        try:
+            self.loop.call_soon_threadsafe(self._resolve)
+        except RuntimeError:
+            pass  # loop already closed; nobody is waiting any more
+
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(True)
+
+
+class Permit:
+    """a held slot; release() is idempotent so it can sit in several cleanup paths"""
+
+    def __init__(self, limiter: "Limiter"):
+        self.limiter = limiter
+        self.started = time.monotonic()
+        self._released = False
+
+    def release(self):
+        if self._released:
+            return
+        self._released = True
+        self.limiter._release(time.monotonic() - self.started)
+
+
+class Limiter:
+    """concurrency limit with a bounded, per-client fair wait queue
+
+    usable from threads and from asyncio at once: a released slot is handed
+    straight to the next waiter, taking clients round-robin so one client's
+    burst can't starve everyone queued behind it. when the queue (or the
+    client's share of it) is full, or a waiter times out, Overloaded is raised
+    with the queue position and a Retry-After estimated from recent hold times.
+    """
+
+    def __init__(self, name: str, max_active: int = 0, max_queue: Optional[int] = None,
+                 max_per_client: Optional[int] = None, timeout: Optional[float] = None,
+                 expected_hold: float = 10.0):
+        """
+        Args:
+            name: label for errors and stats
+            max_active: slots held at once; 0 means unlimited (only counted)
+            max_queue: waiters allowed in total; None means unbounded
+            max_per_client: waiters allowed per client; None means no per-client cap
+            timeout: seconds a waiter waits for a slot; None waits indefinitely
+            expected_hold: seconds a slot is assumed to be held until real timings exist
+        """
+        self.name = name
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.max_per_client = max_per_client
+        self.timeout = timeout
+
+        self._queues = OrderedDict()  # client -> deque of waiters, in round-robin order
+        self._queued = 0
+        self._lock = threading.Lock()
+        self.active = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self._avg_hold = expected_hold
+
+    def _free(self) -> bool:
+        return self.max_active <= 0 or (self.active < self.max_active and not self._queued)
+
+    def _position(self, waiter: _Waiter) -> int:
+        """1-based place in line under round-robin service"""
+        queue = self._queues.get(waiter.client)
+        if queue is None or waiter not in queue:
+            return 0
+        rank = queue.index(waiter)
+        position = 1
+        before = True
+        for client, other in self._queues.items():
+            if client == waiter.client:
+                before = False
+                position += rank
+                continue
+            position += min(len(other), rank + 1 if before else rank)
+        return position
+
+    def _retry_after(self, position: int) -> int:
+        rounds = math.ceil(max(position, 1) / max(self.max_active, 1))
+        return max(1, math.ceil(self._avg_hold * rounds))
+
+    def _enqueue(self, client: str, loop: Optional[asyncio.AbstractEventLoop] = None) -> Optional[_Waiter]:
+        """take a slot (returns None) or join the queue (returns the waiter); raises Overloaded if full"""
+        with self._lock:
+            if self._free():
+                self.active += 1
+                self.admitted += 1
+                return None
+
+            queue = self._queues.get(client)
+            queued_by_client = len(queue) if queue else 0
+            if (self.max_queue is not None and self._queued >= self.max_queue) or \
+                    (self.max_per_client is not None and queued_by_client >= self.max_per_client):
+                self.rejected += 1
+                position = self._queued + 1
+                raise Overloaded(self.name, position, self._retry_after(position))
+
+            waiter = _Waiter(client, loop)
+            self._queues.setdefault(client, deque()).append(waiter)
+            self._queued += 1
+            return waiter
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        """take a waiter out of line after a timeout or cancellation
+
+        Returns:
+            True if a slot was granted before it could leave (the caller now holds it)
+
+        Raises:
+            Overloaded: after a timeout
+        """
+        with self._lock:
+            if waiter.granted:
+                return True
+            position = self._position(waiter)
+            queue = self._queues[waiter.client]
+            queue.remove(waiter)
+            if not queue:
+                del self._queues[waiter.client]
+            self._queued -= 1
+            self.timeouts += 1
+            retry_after = self._retry_after(position)
+        raise Overloaded(self.name, position, retry_after)
+
+    def acquire(self, client: str = '') -> Permit:
+        """wait for a slot on this thread
+
+        Raises:
+            Overloaded: if the queue is full or the wait times out
+        """
+        waiter = self._enqueue(client)
+        if waiter is not None and not waiter.event.wait(self.timeout):
+            self._abandon(waiter)
+        return Permit(self)
+
+    async def aacquire(self, client: str = '') -> Permit:
+        """wait for a slot without blocking the event loop
+
+        Raises:
+            Overloaded: if the queue is full or the wait times out
+        """
+        waiter = self._enqueue(client, asyncio.get_running_loop())
+        if waiter is not None:
+            try:
+                await asyncio.wait_for(waiter.future, self.timeout)
+            except asyncio.TimeoutError:
+                self._abandon(waiter)
+            except asyncio.CancelledError:
+                try:
+                    if self._abandon(waiter):
+                        self._release(None)
+                except Overloaded:
+                    pass
+                raise
+        return Permit(self)
+
+    def _release(self, held: Optional[float]):
+        with self._lock:
+            if held is not None:
+                self._avg_hold = self._avg_hold * 0.8 + held * 0.2
+            waiter = None
+            while self._queues:
+                client, queue = next(iter(self._queues.items()))
+                waiter = queue.popleft()
+                if queue:
+                    self._queues.move_to_end(client)
+                else:
+                    del self._queues[client]
+                self._queued -= 1
+                break
+            if waiter is None:
+                self.active -= 1
+            else:
+                # the slot passes straight to the waiter, so active is unchanged
+                waiter.granted = True
+                self.admitted += 1
+        if waiter is not None:
+            waiter.wake()
+
+    @contextmanager
+    def slot(self, client: str = ''):
+        permit = self.acquire(client)
+        try:
+            yield permit
+        finally:
+            permit.release()
+
+    @asynccontextmanager
+    async def aslot(self, client: str = ''):
+        permit = await self.aacquire(client)
+        try:
+            yield permit
+        finally:
+            permit.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'active': self.active,
+                'max_active': self.max_active or None,
+                'queued': self._queued,
+                'max_queue': self.max_queue,
+                'queued_clients': len(self._queues),
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts,
+                'avg_hold_seconds': round(self._avg_hold, 2)
+            }
+
+
+# one limiter per upstream service (llm, tts, asr), shared by every client of it
+_upstreams: Dict[str, Limiter] = {}
+_upstreams_lock = threading.Lock()
+
+
+def configure_upstream(name: str, max_active: int, timeout: Optional[float] = None) -> Limiter:
+    """set the concurrency limit for calls to one upstream"""
+    limiter = Limiter(name, max_active=max_active, timeout=timeout)
+    with _upstreams_lock:
+        _upstreams[name] = limiter
+    return limiter
+
+
+def upstream(name: str) -> Limiter:
+    """the limiter for an upstream (unlimited until configured)"""
+    limiter = _upstreams.get(name)
+    if limiter is None:
+        with _upstreams_lock:
+            limiter = _upstreams.setdefault(name, Limiter(name))
+    return limiter
+
+
+def upstream_stats() -> dict:
+    """active and queued calls per upstream"""
+    with _upstreams_lock:
+        limiters = dict(_upstreams)
+    return {name: limiter.stats() for name, limiter in limiters.items()}
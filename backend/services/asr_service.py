@@ -1,22 +1,59 @@
-from openai import OpenAI
-import google.generativeai as genai
+import asyncio
+import difflib
+import io
+import multiprocessing
 import os
+import re
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, List, Optional
+from .admission import Overloaded, upstream
+from .audio_upload import (SpooledUpload, UploadTooLarge, spool_upload, can_split, iter_speech_chunks,
+                           extension_for, DEFAULT_MIME)
+from .metrics import bind_context, span
+from .clients import (agenerate_content, configure_genai, describe_gemini_model, get_gemini_model,
+                      get_openai_client, open_connection, DEFAULT_MAX_CONNECTIONS)
+
+
+# hesitations that come and go between passes without changing the question
+FILLER_WORDS = {"um", "uh", "erm", "er", "ah", "hmm", "mm"}
+
+
+def transcripts_match(draft: str, final: str, threshold: float = 0.9) -> bool:
+    """whether two transcripts of one recording ask the same thing
+    
+    compares lowercased words with punctuation and fillers removed, so
+    capitalisation, commas and "um"s don't count as material differences
+    """
+    def words(text):
+        return [w for w in re.findall(r"[\w']+", (text or "").lower()) if w not in FILLER_WORDS]
+    
+    a, b = words(draft), words(final)
+    if a == b:
+        return True
+    return difflib.SequenceMatcher(None, a, b, autojunk=False).ratio() >= threshold
 
 
 class WhisperService:
     """handles audio transcription using OpenAI Whisper API"""
     
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, max_connections: int = DEFAULT_MAX_CONNECTIONS):
         """initialize Whisper client
         
         Args:
             api_key: OpenAI API key (defaults to OPENAI_API_KEY env var)
+            max_connections: size of the shared keep-alive connection pool
         """
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         if not self.api_key:
             raise ValueError("OpenAI API key is required for Whisper ASR")
         
-        self.client = OpenAI(api_key=self.api_key)
+        self.client = get_openai_client(self.api_key, max_connections=max_connections)
+    
+    def warm_up(self):
+        """open the connection to OpenAI before the first upload"""
+        open_connection(lambda: self.client.models.list(timeout=10))
     
     def transcribe_audio(self, audio_file) -> dict:
         """transcribe audio file to text
@@ -32,43 +69,70 @@ class WhisperService:
             Exception: if transcription fails
         """
         try:
-            if isinstance(audio_file, str):
-                with open(audio_file, "rb") as f:
+            upload = spool_upload(audio_file)
+            try:
+                # the API infers the format from the file name, so name it after the sniffed type
+                upload.file.seek(0)
+                with upstream('asr').slot(), span('asr_whisper'):
                     transcript = self.client.audio.transcriptions.create(
                         model="whisper-1",
-                        file=f,
+                        file=(f"audio.{extension_for(upload.mime_type)}", upload.file),
                         response_format="text"
                     )
-            else:
-                transcript = self.client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file,
-                    response_format="text"
-                )
+            finally:
+                upload.close()
             
             return {
                 "text": transcript.strip() if isinstance(transcript, str) else transcript.text.strip(),
                 "language": "en"
             }
         
+        except Overloaded:
+            raise
         except Exception as e:
             raise Exception(f"Whisper transcription failed: {str(e)}")
+    
+    async def atranscribe_audio(self, audio_file) -> dict:
+        """transcribe_audio in a worker thread for the asyncio server"""
+        return await asyncio.to_thread(self.transcribe_audio, audio_file)
 
 
 class GeminiASRService:
-    """handles audio transcription using Google Gemini multimodal API"""
+    """handles audio transcription using Google Gemini multimodal API
+    
+    uploads are spooled off the request stream (to disk past SPOOL_MEMORY_BYTES)
+    and their real container type is sniffed from magic bytes. recordings over
+    chunk_threshold bytes are split on silence and the chunks transcribed
+    concurrently, so memory per request is bounded by the chunks in flight
+    rather than the length of the recording.
+    """
     
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, chunk_threshold: int = 8 * 1024 * 1024,
+                 chunk_seconds: float = 20, max_workers: int = 4, draft_seconds: float = 4):
         """initialize Gemini client for audio transcription
         
         Args:
             api_key: Google API key (defaults to GOOGLE_API_KEY env var)
+            chunk_threshold: uploads larger than this many bytes are transcribed in chunks
+            chunk_seconds: target chunk length; chunks end at the next pause after this
+            max_workers: chunks transcribed at once (and up to as many more decoded ahead of the workers)
+            draft_seconds: segment length for the draft pass of transcribe_with_draft
         """
         self.api_key = api_key or os.getenv("GOOGLE_API_KEY")
         if not self.api_key:
             raise ValueError("Google API key is required for Gemini ASR")
         
-        genai.configure(api_key=self.api_key)
+        configure_genai(self.api_key)
+        self.chunk_threshold = chunk_threshold
+        self.chunk_seconds = chunk_seconds
+        self.max_workers = max_workers
+        self.draft_seconds = draft_seconds
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="asr-chunk")
+    
+    def warm_up(self):
+        """create the model handle and open the connection to Gemini before the first upload"""
+        get_gemini_model("gemini-2.5-flash")
+        describe_gemini_model("gemini-2.5-flash")
     
     def transcribe_audio(self, audio_file) -> dict:
         """transcribe audio file to text using Gemini
@@ -84,28 +148,395 @@ class GeminiASRService:
             Exception: if transcription fails
         """
         try:
-            if isinstance(audio_file, str):
-                with open(audio_file, "rb") as f:
-                    audio_data = f.read()
-            else:
-                audio_data = audio_file.read()
-            
-            model = genai.GenerativeModel("gemini-2.5-flash")
+            upload = spool_upload(audio_file)
+            try:
+                if self._use_chunks(upload):
+                    text = self._transcribe_chunked(upload)
+                else:
+                    text = self._transcribe_whole(upload.read(), upload.mime_type)
+            finally:
+                upload.close()
             
-            audio_part = {
-                "mime_type": "audio/webm",
-                "data": audio_data
+            return {
+                "text": text,
+                "language": "en"
             }
+        
+        except (UploadTooLarge, Overloaded):
+            raise
+        except Exception as e:
+            raise Exception(f"Gemini transcription failed: {str(e)}")
+    
+    async def atranscribe_audio(self, audio_file) -> dict:
+        """non-blocking variant of transcribe_audio for the asyncio server
+        
+        spooling and chunked transcription run in a worker thread; short
+        recordings are awaited on the event loop
+        """
+        try:
+            upload = await asyncio.to_thread(spool_upload, audio_file)
+            try:
+                if self._use_chunks(upload):
+                    text = await asyncio.to_thread(self._transcribe_chunked, upload)
+                else:
+                    # past SPOOL_MEMORY_BYTES the spool is a temp file, so read it off the loop
+                    text = await self._atranscribe_whole(await asyncio.to_thread(upload.read), upload.mime_type)
+            finally:
+                upload.close()
             
-            prompt = "Please transcribe this audio recording. Only provide the transcription text, nothing else."
+            return {
+                "text": text,
+                "language": "en"
+            }
+        
+        except (UploadTooLarge, Overloaded):
+            raise
+        except Exception as e:
+            raise Exception(f"Gemini transcription failed: {str(e)}")
+    
+    def transcribe_with_draft(self, audio_file, on_draft: Callable[[str], None]) -> dict:
+        """transcribe_audio, reporting a draft transcript before the final one
+        
+        the recording is transcribed whole, as transcribe_audio would, while it
+        is also split into short segments that are transcribed concurrently.
+        the stitched segments usually finish first and are passed to on_draft
+        so callers can start work on them. long recordings (chunked anyway)
+        and servers without ffmpeg get no draft.
+        
+        Args:
+            audio_file: file object or path to audio file
+            on_draft: called with the draft text from this thread
+        
+        Returns:
+            dict with 'text' and optional 'language' keys, as transcribe_audio
+        """
+        try:
+            upload = spool_upload(audio_file)
+            try:
+                if self._use_chunks(upload):
+                    text = self._transcribe_chunked(upload)
+                elif not can_split():
+                    text = self._transcribe_whole(upload.read(), upload.mime_type)
+                else:
+                    final = self.executor.submit(bind_context(self._transcribe_whole), upload.read(), upload.mime_type)
+                    try:
+                        draft = self._transcribe_chunked(upload, self.draft_seconds)
+                        if draft and not final.done():
+                            on_draft(draft)
+                    except Exception as e:
+                        print(f"✗ Draft transcription failed, waiting for the full pass: {str(e)}")
+                    text = final.result()
+            finally:
+                upload.close()
             
-            response = model.generate_content([prompt, audio_part])
+            return {
+                "text": text,
+                "language": "en"
+            }
+        
+        except (UploadTooLarge, Overloaded):
+            raise
+        except Exception as e:
+            raise Exception(f"Gemini transcription failed: {str(e)}")
+    
+    async def atranscribe_with_draft(self, audio_file, on_draft: Callable[[str], None]) -> dict:
+        """non-blocking variant of transcribe_with_draft; on_draft runs on the event loop"""
+        try:
+            upload = await asyncio.to_thread(spool_upload, audio_file)
+            try:
+                if self._use_chunks(upload):
+                    text = await asyncio.to_thread(self._transcribe_chunked, upload)
+                elif not can_split():
+                    text = await self._atranscribe_whole(await asyncio.to_thread(upload.read), upload.mime_type)
+                else:
+                    audio_data = await asyncio.to_thread(upload.read)
+                    final = asyncio.ensure_future(self._atranscribe_whole(audio_data, upload.mime_type))
+                    try:
+                        draft = await asyncio.to_thread(self._transcribe_chunked, upload, self.draft_seconds)
+                        if draft and not final.done():
+                            on_draft(draft)
+                    except Exception as e:
+                        print(f"✗ Draft transcription failed, waiting for the full pass: {str(e)}")
+                    text = await final
+            finally:
+                upload.close()
             
             return {
-                "text": response.text.strip(),
+                "text": text,
                 "language": "en"
             }
         
+        except (UploadTooLarge, Overloaded):
+            raise
         except Exception as e:
             raise Exception(f"Gemini transcription failed: {str(e)}")
+    
+    def _transcribe_whole(self, audio_data: bytes, mime_type: str) -> str:
+        model = get_gemini_model("gemini-2.5-flash")
+        with upstream('asr').slot(), span('asr_gemini'):
+            return model.generate_content(self._build_request(audio_data, mime_type)).text.strip()
+    
+    async def _atranscribe_whole(self, audio_data: bytes, mime_type: str) -> str:
+        model = get_gemini_model("gemini-2.5-flash")
+        async with upstream('asr').aslot():
+            with span('asr_gemini'):
+                response = await agenerate_content(model, self._build_request(audio_data, mime_type))
+        return response.text.strip()
+    
+    def _use_chunks(self, upload: SpooledUpload) -> bool:
+        """whether an upload is long enough for chunked mode
+        
+        Raises:
+            UploadTooLarge: if it is but ffmpeg isn't there to split it; sending it
+                whole would mean holding all of it in memory and one oversized request
+        """
+        if upload.size <= self.chunk_threshold:
+            return False
+        if not can_split():
+            print(f"✗ {upload.size} byte upload but ffmpeg is unavailable to split it; rejecting it")
+            raise UploadTooLarge(upload.size, self.chunk_threshold)
+        return True
+    
+    def _transcribe_chunked(self, upload: SpooledUpload, chunk_seconds: Optional[float] = None) -> str:
+        """split on silence, transcribe chunks concurrently, stitch them in order
+        
+        decoding stays at most max_workers chunks ahead of the transcriptions in flight,
+        so at most 2 * max_workers chunks are held at once
+        """
+        chunk_seconds = chunk_seconds or self.chunk_seconds
+        in_flight = threading.BoundedSemaphore(self.max_workers * 2)
+        futures = []
+        try:
+            for wav_bytes in iter_speech_chunks(upload, target_seconds=chunk_seconds,
+                                                max_seconds=chunk_seconds * 1.5):
+                in_flight.acquire()
+                future = self.executor.submit(bind_context(self._transcribe_whole), wav_bytes, "audio/wav")
+                future.add_done_callback(lambda _: in_flight.release())
+                futures.append(future)
+        except Exception:
+            for future in futures:
+                future.cancel()
+            raise
+        
+        texts = [future.result() for future in futures]
+        print(f"✓ Transcribed {upload.size} byte upload in {len(futures)} chunks")
+        return " ".join(text for text in texts if text)
+    
+    def _build_request(self, audio_data: bytes, mime_type: str = DEFAULT_MIME) -> list:
+        """transcription prompt plus inline audio"""
+        audio_part = {
+            "mime_type": mime_type,
+            "data": audio_data
+        }
+        
+        prompt = "Please transcribe this audio recording. Only provide the transcription text, nothing else."
+        return [prompt, audio_part]
+
+
+# per-process model for LocalWhisperService workers, loaded once by the pool initializer
+_local_model = None
+
+
+def _load_local_model(model_size: str, device: str, compute_type: str, cpu_threads: int):
+    global _local_model
+    from faster_whisper import WhisperModel
+    _local_model = WhisperModel(model_size, device=device, compute_type=compute_type, cpu_threads=cpu_threads)
+
+
+def _local_ping() -> int:
+    """no-op used to start workers and load their models ahead of the first request"""
+    return os.getpid()
 
+
+def _local_transcribe(audio, language: str, beam_size: int) -> dict:
+    """run the worker's model over WAV/compressed bytes or a file path"""
+    source = io.BytesIO(audio) if isinstance(audio, bytes) else audio
+    segments, info = _local_model.transcribe(source, language=language, beam_size=beam_size, vad_filter=True)
+    return {
+        "text": " ".join(segment.text.strip() for segment in segments).strip(),
+        "language": info.language or language or "en"
+    }
+
+
+class LocalWhisperService:
+    """transcribes on this machine with faster-whisper, no network hop
+    
+    the model runs in a process pool so decoding doesn't contend with the
+    server for the GIL; each worker loads the model once at startup.
+    """
+    
+    def __init__(self, model_size: str = "base.en", workers: int = 1, device: str = "cpu",
+                 compute_type: str = "int8", cpu_threads: int = 0, language: str = "en",
+                 beam_size: int = 1, warm: bool = True):
+        """start the worker processes
+        
+        Args:
+            model_size: faster-whisper model name or local model directory
+            workers: worker processes, each holding its own copy of the model
+            device: "cpu" or "cuda"
+            compute_type: CTranslate2 quantization, int8 is fastest on CPU
+            cpu_threads: threads per worker (0 splits the machine's cores across workers)
+            language: spoken language, skipping detection
+            beam_size: 1 (greedy) keeps short utterances well under a second
+            warm: load the model in every worker before returning
+        """
+        try:
+            import faster_whisper  # noqa: F401 -- fail here rather than in a worker
+        except ImportError:
+            raise ValueError("faster-whisper is required for local ASR (pip install faster-whisper)")
+        
+        self.model_size = model_size
+        self.language = language
+        self.beam_size = beam_size
+        cpu_threads = cpu_threads or max(1, (os.cpu_count() or 1) // workers)
+        
+        # fork before the server has started any threads where we can; spawn
+        # would re-import the entry script in every worker
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("fork" if "fork" in methods else None)
+        self.pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_load_local_model,
+            initargs=(model_size, device, compute_type, cpu_threads)
+        )
+        self.workers = workers
+        if warm:
+            self.warm_up()
+    
+    def warm_up(self):
+        """load the model in every worker (a no-op once they're loaded)"""
+        pids = {future.result() for future in [self.pool.submit(_local_ping) for _ in range(self.workers)]}
+        print(f"✓ Local ASR model {self.model_size} loaded in {len(pids)} worker(s)")
+    
+    def _prepare(self, audio_file):
+        """bytes for small uploads, a temp path for ones that spilled to disk"""
+        upload = spool_upload(audio_file)
+        if upload.in_memory:
+            data = upload.read()
+            upload.close()
+            return data, None
+        
+        handle = tempfile.NamedTemporaryFile(suffix=f".{extension_for(upload.mime_type)}", delete=False)
+        with handle:
+            for block in upload.iter_blocks():
+                handle.write(block)
+        upload.close()
+        return handle.name, handle.name
+    
+    def transcribe_audio(self, audio_file) -> dict:
+        """transcribe audio file to text with the local model
+        
+        Args:
+            audio_file: file object or path to audio file
+        
+        Returns:
+            dict with 'text' and 'language' keys
+        
+        Raises:
+            Exception: if transcription fails
+        """
+        try:
+            audio, cleanup = self._prepare(audio_file)
+            try:
+                with span('asr_local'):
+                    return self.pool.submit(_local_transcribe, audio, self.language, self.beam_size).result()
+            finally:
+                if cleanup:
+                    os.remove(cleanup)
+        except Exception as e:
+            raise Exception(f"Local transcription failed: {str(e)}")
+    
+    async def atranscribe_audio(self, audio_file) -> dict:
+        """non-blocking variant of transcribe_audio for the asyncio server"""
+        try:
+            audio, cleanup = await asyncio.to_thread(self._prepare, audio_file)
+            try:
+                future = self.pool.submit(_local_transcribe, audio, self.language, self.beam_size)
+                with span('asr_local'):
+                    return await asyncio.wrap_future(future)
+            finally:
+                if cleanup:
+                    os.remove(cleanup)
+        except Exception as e:
+            raise Exception(f"Local transcription failed: {str(e)}")
+
+
+class FallbackASRService:
+    """tries ASR backends in order, moving on when one fails
+    
+    the upload is spooled once up front so every backend can re-read it
+    """
+    
+    def __init__(self, backends: List):
+        """
+        Args:
+            backends: (name, service) pairs in order of preference
+        """
+        if not backends:
+            raise ValueError("At least one ASR backend is required")
+        self.backends = backends
+    
+    @property
+    def names(self) -> List[str]:
+        return [name for name, _ in self.backends]
+    
+    def warm_up(self):
+        """warm every backend; one failing doesn't stop the others"""
+        errors = []
+        for name, backend in self.backends:
+            try:
+                backend.warm_up()
+            except Exception as e:
+                errors.append(f"{name}: {str(e)}")
+        if errors:
+            raise Exception(f"ASR warm-up failed for {'; '.join(errors)}")
+    
+    def _failure(self, errors: List[Exception]) -> Exception:
+        """what to raise once every backend has failed"""
+        if all(isinstance(error, UploadTooLarge) for error in errors):
+            return errors[0]
+        # only turned away (or too large) everywhere: the caller may retry later
+        busy = [error for error in errors if isinstance(error, Overloaded)]
+        if busy and all(isinstance(error, (Overloaded, UploadTooLarge)) for error in errors):
+            return busy[0]
+        return Exception(f"All ASR backends failed "
+                         f"({'; '.join(f'{name}: {str(e)}' for (name, _), e in zip(self.backends, errors))})")
+    
+    def transcribe_audio(self, audio_file) -> dict:
+        """transcribe with the first backend that succeeds
+        
+        Raises:
+            UploadTooLarge: if every backend turned the upload down for its size
+            Overloaded: if every backend was at capacity (or turned the upload down)
+            Exception: if every backend fails
+        """
+        upload = spool_upload(audio_file)
+        errors = []
+        try:
+            for name, backend in self.backends:
+                upload.file.seek(0)
+                try:
+                    return backend.transcribe_audio(upload.file)
+                except Exception as e:
+                    print(f"✗ {name} ASR failed, trying next backend: {str(e)}")
+                    errors.append(e)
+        finally:
+            upload.close()
+        raise self._failure(errors)
+    
+    async def atranscribe_audio(self, audio_file) -> dict:
+        """non-blocking variant of transcribe_audio for the asyncio server"""
+        upload = await asyncio.to_thread(spool_upload, audio_file)
+        errors = []
+        try:
+            for name, backend in self.backends:
+                upload.file.seek(0)
+                try:
+                    return await backend.atranscribe_audio(upload.file)
+                except Exception as e:
+                    print(f"✗ {name} ASR failed, trying next backend: {str(e)}")
+                    errors.append(e)
+        finally:
+            upload.close()
+        raise self._failure(errors)
@@ -0,0 +1,224 @@
+import hashlib
+import os
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from .session_store import SessionAudioStore
+
+
+MIMETYPES = {
+    'wav': 'audio/wav',
+    'opus': 'audio/ogg',
+    'ogg': 'audio/ogg',
+    'mp3': 'audio/mpeg',
+    'flac': 'audio/flac',
+}
+
+
+def mimetype_for(name: str) -> str:
+    """content type for a stored clip, from its extension"""
+    return MIMETYPES.get(name.rsplit('.', 1)[-1].lower(), 'application/octet-stream')
+
+
+def content_etag(data: bytes) -> str:
+    """etag for a clip, from its bytes; every tier derives it this way so it doesn't change between them"""
+    return hashlib.sha1(data).hexdigest()[:20]
+
+
+def _file_etag(path: str) -> str:
+    """content_etag of a file, read block by block"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()[:20]
+
+
+@dataclass
+class AudioBlob:
+    """a stored clip, either in memory (data) or on disk (path)"""
+    size: int
+    etag: str
+    last_modified: float
+    mimetype: str
+    data: Optional[bytes] = None
+    path: Optional[str] = None
+
+
+class AudioBackend(ABC):
+    """where session clips live between generation and playback"""
+    
+    @abstractmethod
+    def create_session(self) -> str:
+        ...
+    
+    @abstractmethod
+    def put(self, session_id: str, name: str, data: bytes):
+        ...
+    
+    @abstractmethod
+    def get(self, session_id: str, name: str) -> Optional[AudioBlob]:
+        ...
+    
+    def touch(self, session_id: str) -> bool:
+        """mark a session as recently used, returning whether it still exists"""
+        return True
+    
+    @abstractmethod
+    def stats(self) -> dict:
+        ...
+
+
+class FileAudioBackend(AudioBackend):
+    """clips on disk via the session audio store; served with sendfile by the server
+    
+    etags are hashed from the bytes at put and remembered per (path, size,
+    mtime), so a rewritten file never keeps a stale one; clips left by a
+    previous process are hashed from disk on first read
+    """
+    
+    def __init__(self, store: SessionAudioStore, max_etags: int = 4096):
+        self.store = store
+        self.max_etags = max_etags
+        self._etags = OrderedDict()  # (path, size, mtime_ns) -> etag
+        self._lock = threading.Lock()
+    
+    def create_session(self) -> str:
+        return self.store.create_session()
+    
+    def _remember_etag(self, key, etag: str):
+        with self._lock:
+            self._etags[key] = etag
+            self._etags.move_to_end(key)
+            while len(self._etags) > self.max_etags:
+                self._etags.popitem(last=False)
+    
+    def put(self, session_id: str, name: str, data: bytes):
+        path = self.store.write(session_id, name, data)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        self._remember_etag((path, st.st_size, st.st_mtime_ns), content_etag(data))
+    
+    def touch(self, session_id: str) -> bool:
+        return self.store.touch(session_id)
+    
+    def get(self, session_id: str, name: str) -> Optional[AudioBlob]:
+        path = self.store.path(session_id, name)
+        if not path:
+            return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        key = (path, st.st_size, st.st_mtime_ns)
+        with self._lock:
+            etag = self._etags.get(key)
+        if etag is None:
+            try:
+                etag = _file_etag(path)
+            except OSError:
+                return None
+            self._remember_etag(key, etag)
+        return AudioBlob(
+            size=st.st_size,
+            etag=etag,
+            last_modified=st.st_mtime,
+            mimetype=mimetype_for(name),
+            path=path
+        )
+    
+    def stats(self) -> dict:
+        return {'type': 'file', **self.store.stats()}
+
+
+class MemoryAudioBackend(AudioBackend):
+    """byte-bounded in-memory LRU of clips, optionally in front of another backend
+    
+    with a backing backend, writes go to both and reads fall through to the
+    backing store on a miss; without one, evicted clips are simply gone
+    """
+    
+    def __init__(self, max_bytes: int = 128 * 1024 * 1024, backing: Optional[AudioBackend] = None):
+        self.max_bytes = max_bytes
+        self.backing = backing
+        self._blobs = OrderedDict()  # (session_id, name) -> AudioBlob
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def create_session(self) -> str:
+        if self.backing:
+            return self.backing.create_session()
+        return str(uuid.uuid4())
+    
+    def put(self, session_id: str, name: str, data: bytes):
+        if self.backing:
+            self.backing.put(session_id, name, data)
+        if len(data) > self.max_bytes:
+            return
+        blob = AudioBlob(
+            size=len(data),
+            etag=content_etag(data),
+            last_modified=time.time(),
+            mimetype=mimetype_for(name),
+            data=data
+        )
+        key = (session_id, name)
+        with self._lock:
+            previous = self._blobs.pop(key, None)
+            if previous:
+                self._bytes -= previous.size
+            self._blobs[key] = blob
+            self._bytes += blob.size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._blobs.popitem(last=False)
+                self._bytes -= evicted.size
+                self.evictions += 1
+    
+    def get(self, session_id: str, name: str) -> Optional[AudioBlob]:
+        key = (session_id, name)
+        with self._lock:
+            blob = self._blobs.get(key)
+            if blob is not None:
+                self._blobs.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        if blob is not None:
+            # the backing store owns session lifetime: keep it alive while the clip
+            # is being played from memory, and stop serving it once it has expired
+            if self.backing and not self.backing.touch(session_id):
+                self._discard(key)
+                return None
+            return blob
+        return self.backing.get(session_id, name) if self.backing else None
+    
+    def _discard(self, key):
+        with self._lock:
+            blob = self._blobs.pop(key, None)
+            if blob:
+                self._bytes -= blob.size
+    
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {
+                'type': 'memory',
+                'entries': len(self._blobs),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+        if self.backing:
+            stats['backing'] = self.backing.stats()
+        return stats
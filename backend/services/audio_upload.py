@@ -0,0 +1,242 @@
+import io
+import shutil
+import subprocess
+import tempfile
+import threading
+import warnings
+import wave
+from dataclasses import dataclass
+from typing import Iterator
+
+with warnings.catch_warnings():
+    # stdlib on <=3.12, provided by the audioop-lts package on 3.13+
+    warnings.simplefilter("ignore", DeprecationWarning)
+    import audioop
+
+from .transcode import ffmpeg_binary
+
+
+# uploads up to this size stay in memory; bigger ones roll over to a temp file
+SPOOL_MEMORY_BYTES = 1024 * 1024
+COPY_BLOCK = 64 * 1024
+
+# speech recognisers don't gain anything above 16 kHz mono
+CHUNK_RATE = 16000
+CHUNK_WIDTH = 2
+WINDOW_MS = 20
+
+# what MediaRecorder produces when nothing else matches
+DEFAULT_MIME = "audio/webm"
+
+
+def sniff_mime(head: bytes) -> str:
+    """container format from the first bytes of an upload
+
+    Args:
+        head: at least the first 64 bytes of the file
+
+    Returns:
+        MIME type, DEFAULT_MIME if the format isn't recognised
+    """
+    if head.startswith(b"\x1a\x45\xdf\xa3"):
+        # EBML; the doctype tells webm from matroska
+        return "audio/webm" if b"webm" in head[:64] else "audio/x-matroska"
+    if head.startswith(b"OggS"):
+        return "audio/ogg"
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return "audio/wav"
+    if head.startswith(b"fLaC"):
+        return "audio/flac"
+    if head[4:8] == b"ftyp":
+        return "audio/mp4"
+    if head.startswith(b"ID3"):
+        return "audio/mpeg"
+    if len(head) > 1 and head[0] == 0xFF and head[1] & 0xF6 == 0xF0:
+        return "audio/aac"  # ADTS
+    if len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0:
+        return "audio/mpeg"  # bare MPEG frame sync
+    return DEFAULT_MIME
+
+
+EXTENSIONS = {
+    "audio/webm": "webm",
+    "audio/x-matroska": "mkv",
+    "audio/ogg": "ogg",
+    "audio/wav": "wav",
+    "audio/flac": "flac",
+    "audio/mp4": "m4a",
+    "audio/mpeg": "mp3",
+    "audio/aac": "aac",
+}
+
+
+def extension_for(mime_type: str) -> str:
+    """file extension for a sniffed MIME type"""
+    return EXTENSIONS.get(mime_type, "webm")
+
+
+class UploadTooLarge(Exception):
+    """an upload is over the size a backend can take in one request and it can't be split"""
+
+    def __init__(self, size: int, limit: int):
+        super().__init__(f"Audio upload is {size} bytes; recordings over {limit} bytes can't be transcribed "
+                         f"on this server")
+        self.size = size
+        self.limit = limit
+
+
+@dataclass
+class SpooledUpload:
+    """an upload copied off the request stream, in memory or in a temp file"""
+    file: tempfile.SpooledTemporaryFile
+    size: int
+    mime_type: str
+    max_memory: int = SPOOL_MEMORY_BYTES
+
+    @property
+    def in_memory(self) -> bool:
+        """whether the upload is still held in memory rather than a temp file"""
+        return self.size <= self.max_memory
+
+    def read(self) -> bytes:
+        """the whole upload; only call this for small uploads"""
+        self.file.seek(0)
+        return self.file.read()
+
+    def iter_blocks(self) -> Iterator[bytes]:
+        self.file.seek(0)
+        while True:
+            block = self.file.read(COPY_BLOCK)
+            if not block:
+                return
+            yield block
+
+    def close(self):
+        self.file.close()
+
+
+def spool_upload(audio_file, max_memory: int = SPOOL_MEMORY_BYTES) -> SpooledUpload:
+    """copy an upload (file object or path) into a spooled temp file block by block
+
+    Args:
+        audio_file: file object or path to audio file
+        max_memory: bytes kept in memory before rolling over to disk
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=max_memory)
+    if isinstance(audio_file, str):
+        with open(audio_file, "rb") as f:
+            shutil.copyfileobj(f, spool, COPY_BLOCK)
+    else:
+        shutil.copyfileobj(audio_file, spool, COPY_BLOCK)
+    size = spool.tell()
+
+    spool.seek(0)
+    head = spool.read(64)
+    return SpooledUpload(file=spool, size=size, mime_type=sniff_mime(head), max_memory=max_memory)
+
+
+def can_split() -> bool:
+    """whether silence splitting is possible (needs ffmpeg to decode)"""
+    return ffmpeg_binary() is not None
+
+
+def _pcm_to_wav(pcm: bytes) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(CHUNK_WIDTH)
+        wf.setframerate(CHUNK_RATE)
+        wf.writeframes(pcm)
+    return buffer.getvalue()
+
+
+def _decode_windows(upload: SpooledUpload) -> Iterator[bytes]:
+    """decode an upload to 16 kHz mono PCM16 with ffmpeg, WINDOW_MS at a time
+
+    the upload is fed to ffmpeg's stdin from a thread while PCM is read back,
+    so neither the compressed nor the decoded audio is ever held in full
+    """
+    proc = subprocess.Popen(
+        [ffmpeg_binary(), "-hide_banner", "-loglevel", "error", "-i", "pipe:0",
+         "-f", "s16le", "-ac", "1", "-ar", str(CHUNK_RATE), "pipe:1"],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+
+    def feed():
+        try:
+            for block in upload.iter_blocks():
+                proc.stdin.write(block)
+        except (BrokenPipeError, ValueError):
+            pass
+        finally:
+            try:
+                proc.stdin.close()
+            except OSError:
+                pass
+
+    writer = threading.Thread(target=feed, daemon=True)
+    writer.start()
+
+    window = CHUNK_RATE * CHUNK_WIDTH * WINDOW_MS // 1000
+    pending = b""
+    finished = False
+    try:
+        while True:
+            block = proc.stdout.read(COPY_BLOCK)
+            if not block:
+                break
+            pending += block
+            usable = len(pending) - len(pending) % window
+            for start in range(0, usable, window):
+                yield pending[start:start + window]
+            pending = pending[usable:]
+        finished = True
+    finally:
+        if not finished:
+            proc.kill()
+        proc.stdout.close()
+        writer.join()
+        stderr = proc.stderr.read().decode(errors="replace").strip()
+        proc.stderr.close()
+        returncode = proc.wait()
+
+    if returncode != 0:
+        raise RuntimeError(f"ffmpeg could not decode upload: {stderr}")
+    if pending:
+        yield pending
+
+
+def iter_speech_chunks(upload: SpooledUpload, target_seconds: float = 20, max_seconds: float = 30,
+                       silence_threshold: int = 500, min_silence_ms: int = 300) -> Iterator[bytes]:
+    """split an upload into WAV chunks at pauses in speech
+
+    a chunk is cut at the first pause of at least min_silence_ms once it is
+    target_seconds long, and unconditionally at max_seconds. chunks that are
+    silence throughout are dropped.
+
+    Yields:
+        16 kHz mono WAV bytes, in order
+    """
+    bytes_per_second = CHUNK_RATE * CHUNK_WIDTH
+    current = bytearray()
+    voiced = False
+    silent_ms = 0
+
+    for window in _decode_windows(upload):
+        current += window
+        if audioop.rms(window, CHUNK_WIDTH) < silence_threshold:
+            silent_ms += WINDOW_MS
+        else:
+            silent_ms = 0
+            voiced = True
+
+        seconds = len(current) / bytes_per_second
+        if (seconds >= target_seconds and silent_ms >= min_silence_ms) or seconds >= max_seconds:
+            if voiced:
+                yield _pcm_to_wav(bytes(current))
+            current = bytearray()
+            voiced = False
+            silent_ms = 0
+
+    if current and voiced:
+        yield _pcm_to_wav(bytes(current))
@@ -0,0 +1,161 @@
+import asyncio
+import os
+import threading
+from typing import Awaitable, Callable, Dict, Tuple
+
+import google.generativeai as genai
+import httpx
+from openai import APIConnectionError, OpenAI, AsyncOpenAI
+
+from .resilience import is_transient
+
+
+BOSON_BASE_URL = os.getenv("BOSON_BASE_URL", "https://hackathon.boson.ai/v1")
+# point Gemini at another endpoint (e.g. the offline benchmark's stand-in); REST transport, which
+# the SDK's async calls don't support, so agenerate_content runs those calls on a thread instead
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL")
+
+# sized for a few dozen concurrent deliberations per process; override per service. Gemini
+# has no equivalent: the SDK takes no transport or channel options and gRPC multiplexes every
+# call over one channel, so its concurrency is capped by the llm/asr upstream limiters instead
+DEFAULT_MAX_CONNECTIONS = 64
+DEFAULT_KEEPALIVE_EXPIRY = 60.0
+# the OpenAI SDK's own retries on timeouts, connection errors, 429 and 5xx
+DEFAULT_MAX_RETRIES = 2
+
+_lock = threading.Lock()
+_genai_key = None
+_models: Dict[str, "genai.GenerativeModel"] = {}
+_openai_clients: Dict[Tuple, OpenAI] = {}
+_async_openai_clients: Dict[Tuple, AsyncOpenAI] = {}
+
+
+def configure_genai(api_key: str):
+    """configure the Gemini SDK once per key instead of from every constructor"""
+    global _genai_key
+    with _lock:
+        if _genai_key == api_key:
+            return
+        if GEMINI_BASE_URL:
+            genai.configure(api_key=api_key, transport="rest", client_options={"api_endpoint": GEMINI_BASE_URL})
+        else:
+            genai.configure(api_key=api_key)
+        _genai_key = api_key
+        # handles built against the old key must not be reused
+        _models.clear()
+
+
+def get_gemini_model(model_name: str) -> "genai.GenerativeModel":
+    """shared GenerativeModel handle for model_name (configure_genai first)"""
+    with _lock:
+        model = _models.get(model_name)
+        if model is None:
+            model = genai.GenerativeModel(model_name)
+            _models[model_name] = model
+        return model
+
+
+async def agenerate_content(model: "genai.GenerativeModel", *args, **kwargs):
+    """generate_content_async, or generate_content on a worker thread over the REST transport"""
+    if GEMINI_BASE_URL:
+        return await asyncio.to_thread(model.generate_content, *args, **kwargs)
+    return await model.generate_content_async(*args, **kwargs)
+
+
+async def aopen_gemini(model: "genai.GenerativeModel"):
+    """count tokens (free) so the SDK opens its asyncio channel, which describe_gemini_model doesn't
+
+    nothing to do over the REST transport: agenerate_content uses the threaded client there
+    """
+    if not GEMINI_BASE_URL:
+        await model.count_tokens_async("ready")
+
+
+def describe_gemini_model(model_name: str):
+    """fetch a model's metadata: a free call that opens the connection to Gemini"""
+    return genai.get_model(f"models/{model_name}")
+
+
+def open_connection(request: Callable[[], object]):
+    """make a cheap request only so a pooled connection (and its TLS session) is established
+    
+    an HTTP error response is fine, the connection is up either way
+    """
+    try:
+        request()
+    except Exception as e:
+        if getattr(e, 'status_code', None) is None:
+            raise
+
+
+async def aopen_connection(request: Callable[[], Awaitable]):
+    """asyncio counterpart of open_connection"""
+    try:
+        await request()
+    except Exception as e:
+        if getattr(e, 'status_code', None) is None:
+            raise
+
+
+def is_transient_api_error(error: BaseException) -> bool:
+    """is_transient, also recognising the OpenAI SDK's and httpx's own timeout and connection errors"""
+    return isinstance(error, (APIConnectionError, httpx.TransportError)) or is_transient(error)
+
+
+def _limits(max_connections: int) -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_connections,
+        keepalive_expiry=DEFAULT_KEEPALIVE_EXPIRY
+    )
+
+
+def get_openai_client(api_key: str, base_url: str = None,
+                      max_connections: int = DEFAULT_MAX_CONNECTIONS,
+                      max_retries: int = DEFAULT_MAX_RETRIES) -> OpenAI:
+    """shared OpenAI-compatible client with a keep-alive pool of max_connections
+    
+    clients are cached per (key, base_url, pool size, retries), so services pointing
+    at the same upstream reuse warm connections. pass max_retries=0 when a
+    ResilientEndpoint retries the calls, so each of its attempts is one request
+    """
+    cache_key = (api_key, base_url, max_connections, max_retries)
+    with _lock:
+        client = _openai_clients.get(cache_key)
+        if client is None:
+            client = OpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                max_retries=max_retries,
+                http_client=httpx.Client(limits=_limits(max_connections))
+            )
+            _openai_clients[cache_key] = client
+        return client
+
+
+def get_async_openai_client(api_key: str, base_url: str = None,
+                            max_connections: int = DEFAULT_MAX_CONNECTIONS,
+                            max_retries: int = DEFAULT_MAX_RETRIES) -> AsyncOpenAI:
+    """asyncio counterpart of get_openai_client"""
+    cache_key = (api_key, base_url, max_connections, max_retries)
+    with _lock:
+        client = _async_openai_clients.get(cache_key)
+        if client is None:
+            client = AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                max_retries=max_retries,
+                http_client=httpx.AsyncClient(limits=_limits(max_connections))
+            )
+            _async_openai_clients[cache_key] = client
+        return client
+
+
+def pool_stats() -> dict:
+    """how many shared handles exist (for /health)"""
+    with _lock:
+        return {
+            'gemini_models': sorted(_models),
+            'openai_clients': len(_openai_clients),
+            'async_openai_clients': len(_async_openai_clients)
+        }
@@ -0,0 +1,133 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+
+class ConversationBackend(ABC):
+    """where server-held conversations live between turns
+
+    a conversation is an append-only list of {role, content} messages; every
+    deliberation's audio session_id is aliased to the conversation it belongs
+    to, so a follow-up only has to name the session it is replying to.
+    implementations must make append atomic per conversation.
+    """
+
+    @abstractmethod
+    def load(self, conversation_id: str) -> Optional[List[Dict[str, str]]]:
+        """the conversation's messages, or None if it doesn't exist (or expired)"""
+
+    @abstractmethod
+    def append(self, conversation_id: str, messages: List[Dict[str, str]]):
+        """add messages to a conversation, creating it if needed"""
+
+    @abstractmethod
+    def alias(self, session_id: str, conversation_id: str):
+        """record that a deliberation's session belongs to a conversation"""
+
+    @abstractmethod
+    def resolve(self, session_id: str) -> Optional[str]:
+        """the conversation a session belongs to, or None"""
+
+    @abstractmethod
+    def delete(self, conversation_id: str):
+        ...
+
+    @abstractmethod
+    def stats(self) -> dict:
+        ...
+
+
+class MemoryConversationBackend(ConversationBackend):
+    """in-process conversation store with idle TTL and LRU eviction
+
+    stands in for a shared store (e.g. Redis lists with EXPIRE) on a single
+    process; conversations are lost on restart, after which clients simply
+    start a new one
+    """
+
+    def __init__(self, ttl: float = 3600, max_conversations: int = 10000, max_messages: int = 200):
+        """
+        Args:
+            ttl: seconds an idle conversation is kept
+            max_conversations: conversations kept before the least recently used is dropped
+            max_messages: messages kept per conversation (oldest are dropped first)
+        """
+        self.ttl = ttl
+        self.max_conversations = max_conversations
+        self.max_messages = max_messages
+
+        self._conversations = OrderedDict()  # conversation id -> {messages, expires_at}
+        self._aliases = OrderedDict()  # session id -> (conversation id, expires_at)
+        self._lock = threading.Lock()
+        self.expirations = 0
+        self.evictions = 0
+
+    def _live(self, conversation_id: str, now: float) -> Optional[Dict]:
+        record = self._conversations.get(conversation_id)
+        if record is None:
+            return None
+        if record['expires_at'] <= now:
+            del self._conversations[conversation_id]
+            self.expirations += 1
+            return None
+        return record
+
+    def load(self, conversation_id: str) -> Optional[List[Dict[str, str]]]:
+        now = time.monotonic()
+        with self._lock:
+            record = self._live(conversation_id, now)
+            if record is None:
+                return None
+            record['expires_at'] = now + self.ttl
+            self._conversations.move_to_end(conversation_id)
+            return list(record['messages'])
+
+    def append(self, conversation_id: str, messages: List[Dict[str, str]]):
+        now = time.monotonic()
+        with self._lock:
+            record = self._live(conversation_id, now)
+            if record is None:
+                record = self._conversations[conversation_id] = {'messages': [], 'expires_at': now}
+            record['messages'].extend({'role': m['role'], 'content': m['content']} for m in messages)
+            del record['messages'][:-self.max_messages]
+            record['expires_at'] = now + self.ttl
+            self._conversations.move_to_end(conversation_id)
+            while len(self._conversations) > self.max_conversations:
+                self._conversations.popitem(last=False)
+                self.evictions += 1
+
+    def alias(self, session_id: str, conversation_id: str):
+        with self._lock:
+            self._aliases[session_id] = (conversation_id, time.monotonic() + self.ttl)
+            self._aliases.move_to_end(session_id)
+            # an alias is useless once its conversation could be gone, so this bound is generous
+            while len(self._aliases) > self.max_conversations * 4:
+                self._aliases.popitem(last=False)
+
+    def resolve(self, session_id: str) -> Optional[str]:
+        with self._lock:
+            item = self._aliases.get(session_id)
+            if item is None:
+                return None
+            conversation_id, expires_at = item
+            if expires_at <= time.monotonic():
+                del self._aliases[session_id]
+                return None
+            return conversation_id
+
+    def delete(self, conversation_id: str):
+        with self._lock:
+            self._conversations.pop(conversation_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'type': 'memory',
+                'conversations': len(self._conversations),
+                'sessions': len(self._aliases),
+                'messages': sum(len(r['messages']) for r in self._conversations.values()),
+                'expirations': self.expirations,
+                'evictions': self.evictions
+            }
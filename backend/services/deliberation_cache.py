@@ -0,0 +1,97 @@
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+
+class DeliberationCache:
+    """TTL cache of finished deliberations keyed on the normalized question
+    
+    entries hold each bear's text plus a reference to its clip in the TTS
+    synthesis cache, so a hit replays without touching Gemini or BosonAI
+    """
+    
+    def __init__(self, ttl: float = 3600, max_entries: int = 256, history_window: int = 6):
+        """
+        Args:
+            ttl: seconds an entry stays valid
+            max_entries: entries kept before the least recently used is dropped
+            history_window: trailing conversation messages that count towards the key
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.history_window = history_window
+        
+        self._entries = OrderedDict()  # key -> (expires_at, entry)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+    
+    @staticmethod
+    def normalize_question(question: str) -> str:
+        """case- and whitespace-insensitive form, ignoring trailing punctuation"""
+        return re.sub(r"\s+", " ", question).strip().lower().rstrip("?!. ")
+    
+    def make_key(self, question: str, conversation_history: Optional[List[Dict[str, str]]],
+                 member_ids: List[str], variant: Optional[Dict] = None) -> str:
+        """hash the question, the relevant history tail and the panel
+        
+        Args:
+            question: user's question
+            conversation_history: previous messages (only the last history_window count)
+            member_ids: ids of the members answering, in order
+            variant: other settings that change the output (e.g. independent voices)
+        """
+        tail = (conversation_history or [])[-self.history_window:] if self.history_window else []
+        payload = json.dumps([
+            self.normalize_question(question),
+            [[m.get('role'), m.get('content')] for m in tail],
+            member_ids,
+            variant or {}
+        ], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def get(self, key: str) -> Optional[Dict]:
+        """return the cached entry for key if it hasn't expired"""
+        now = time.monotonic()
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            expires_at, entry = item
+            if expires_at <= now:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+    
+    def put(self, key: str, entry: Dict):
+        """store an entry, evicting the least recently used one when full"""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        """drop every cached deliberation"""
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> dict:
+        """hit/miss counters and current size"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'expirations': self.expirations
+            }
@@ -0,0 +1,170 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+from .metrics import bind_context
+
+
+# role of the synthetic message carrying the rolling summary of older turns
+SUMMARY_ROLE = "summary"
+
+
+def estimate_tokens(text: str) -> int:
+    """rough token count (~4 characters per token for English), good enough for budgeting"""
+    return len(text or "") // 4 + 1
+
+
+def _digest(messages: List[Dict[str, str]], digest=None):
+    """running sha1 over messages in order, continuing digest if given (it isn't modified)"""
+    digest = digest.copy() if digest is not None else hashlib.sha1()
+    for message in messages:
+        digest.update(f"{message.get('role')}\x00{message.get('content')}\x01".encode("utf-8"))
+    return digest
+
+
+class HistoryManager:
+    """caps the conversation context sent with each prompt to a token budget
+
+    the newest messages are kept verbatim; anything older that doesn't fit is
+    folded into a rolling summary in the background. summaries are cached per
+    conversation id, so a turn only pays to summarize messages that are new
+    since the last fold, and clients that know their conversation id may stop
+    resending turns the summary already covers.
+    """
+
+    def __init__(self, summarize: Optional[Callable[[Optional[str], List[Dict[str, str]]], str]] = None,
+                 token_budget: int = 1200, ttl: float = 3600, max_conversations: int = 1024):
+        """
+        Args:
+            summarize: (previous summary, messages) -> new summary; None just drops old turns
+            token_budget: estimated tokens of context (summary + previous turns) per prompt
+            ttl: seconds an idle conversation's summary is kept
+            max_conversations: summaries kept before the least recently used is dropped
+        """
+        self.summarize = summarize
+        self.token_budget = token_budget
+        self.ttl = ttl
+        self.max_conversations = max_conversations
+
+        self._states = OrderedDict()  # conversation id -> {summary, folded, digest, expires_at}
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="history-summary")
+        self.folds = 0
+        self.dropped_messages = 0
+
+    def _state(self, conversation_id: Optional[str]) -> Optional[Dict]:
+        if not conversation_id:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            state = self._states.get(conversation_id)
+            if state is None:
+                return None
+            if state['expires_at'] <= now:
+                del self._states[conversation_id]
+                return None
+            state['expires_at'] = now + self.ttl
+            self._states.move_to_end(conversation_id)
+            return dict(state)
+
+    def compact(self, conversation_history: Optional[List[Dict[str, str]]],
+                conversation_id: Optional[str] = None) -> List[Dict[str, str]]:
+        """the history to prompt with: [summary message] + newest turns that fit + current question
+
+        the last message is treated as the current question and always kept,
+        matching how the prompt builders read conversation_history
+
+        Args:
+            conversation_history: messages as sent by the client
+            conversation_id: key for the cached summary; without one old turns are just dropped
+        """
+        if not conversation_history:
+            return conversation_history or []
+
+        previous, current = conversation_history[:-1], conversation_history[-1:]
+        state = self._state(conversation_id)
+        summary = state['summary'] if state else None
+
+        # skip whatever the cached summary already covers: the first `folded` messages, if the
+        # history still starts with them; otherwise the client already left them out
+        folded, digest = (state['folded'], state['digest']) if state else (0, None)
+        if folded and len(previous) >= folded and \
+                _digest(previous[:folded]).hexdigest() == digest.hexdigest():
+            previous = previous[folded:]
+
+        budget = self.token_budget - (estimate_tokens(summary) if summary else 0)
+        keep = 0
+        for message in reversed(previous):
+            cost = estimate_tokens(message.get('content')) + 2
+            if cost > budget:
+                break
+            budget -= cost
+            keep += 1
+        overflow = previous[:len(previous) - keep]
+        recent = previous[len(previous) - keep:]
+
+        if overflow:
+            if conversation_id and self.summarize:
+                self._schedule_fold(conversation_id, summary, overflow, folded, digest)
+            else:
+                with self._lock:
+                    self.dropped_messages += len(overflow)
+
+        compacted = [{'role': SUMMARY_ROLE, 'content': summary}] if summary else []
+        return compacted + recent + current
+
+    def _schedule_fold(self, conversation_id: str, summary: Optional[str], messages: List[Dict[str, str]],
+                       folded: int = 0, digest=None):
+        """summarize overflowing turns off the request path; this turn prompts without them
+
+        Args:
+            folded: messages the current summary covers, with digest their running sha1
+        """
+        with self._lock:
+            if conversation_id in self._pending:
+                return
+            self._pending.add(conversation_id)
+        self._executor.submit(bind_context(self._fold), conversation_id, summary, messages, folded, digest)
+
+    def _fold(self, conversation_id: str, summary: Optional[str], messages: List[Dict[str, str]],
+              folded: int = 0, digest=None):
+        try:
+            start = time.monotonic()
+            new_summary = self.summarize(summary, messages).strip()
+            with self._lock:
+                self._states[conversation_id] = {
+                    'summary': new_summary,
+                    'folded': folded + len(messages),
+                    'digest': _digest(messages, digest),
+                    'expires_at': time.monotonic() + self.ttl
+                }
+                self._states.move_to_end(conversation_id)
+                while len(self._states) > self.max_conversations:
+                    self._states.popitem(last=False)
+                self.folds += 1
+            print(f"✓ Folded {len(messages)} messages into summary for {conversation_id} "
+                  f"in {time.monotonic() - start:.1f}s")
+        except Exception as e:
+            print(f"✗ History summary for {conversation_id} failed: {str(e)}")
+        finally:
+            with self._lock:
+                self._pending.discard(conversation_id)
+
+    def forget(self, conversation_id: str):
+        """drop a conversation's summary"""
+        with self._lock:
+            self._states.pop(conversation_id, None)
+
+    def stats(self) -> dict:
+        """cached summaries and how much history has been folded or dropped"""
+        with self._lock:
+            return {
+                'conversations': len(self._states),
+                'token_budget': self.token_budget,
+                'folds': self.folds,
+                'pending': len(self._pending),
+                'dropped_messages': self.dropped_messages
+            }
@@ -1,6 +1,15 @@
-import google.generativeai as genai
+import json
 import os
+import threading
 from typing import List, Dict, Optional
+from .admission import Overloaded, upstream
+from .clients import agenerate_content, aopen_gemini, configure_genai, describe_gemini_model, get_gemini_model
+from .metrics import span
+from .history import SUMMARY_ROLE
+
+
+# a panel answer longer than this is the model ignoring the brief, not an opinion
+MAX_PANEL_OPINION_WORDS = 120
 
 
 class LLMService:
@@ -17,8 +26,49 @@ class LLMService:
         if not self.api_key:
             raise ValueError("Google API key is required for Gemini LLM")
         
-        genai.configure(api_key=self.api_key)
+        configure_genai(self.api_key)
         self.model_name = model
+        
+        self._usage_lock = threading.Lock()
+        self._usage = {'requests': 0, 'prompt_tokens': 0, 'output_tokens': 0}
+    
+    def _record_usage(self, response):
+        """add a response's token counts (when Gemini reports them) to the running totals"""
+        metadata = getattr(response, 'usage_metadata', None)
+        with self._usage_lock:
+            self._usage['requests'] += 1
+            if metadata is not None:
+                self._usage['prompt_tokens'] += getattr(metadata, 'prompt_token_count', 0) or 0
+                self._usage['output_tokens'] += getattr(metadata, 'candidates_token_count', 0) or 0
+    
+    def warm_up(self, prime: bool = False):
+        """open the connection to Gemini before the first opinion needs it
+        
+        Args:
+            prime: also generate a few tokens, so the first real prompt finds the whole path hot
+        """
+        model = get_gemini_model(self.model_name)
+        describe_gemini_model(self.model_name)
+        if prime:
+            with upstream('llm').slot():
+                response = model.generate_content("Reply with the single word: ready",
+                                                  generation_config={"max_output_tokens": 5})
+            self._record_usage(response)
+    
+    async def awarm_up(self, prime: bool = False):
+        """warm_up for the SDK's asyncio channel, which the threaded warm-up doesn't touch"""
+        model = get_gemini_model(self.model_name)
+        await aopen_gemini(model)
+        if prime:
+            async with upstream('llm').aslot():
+                response = await agenerate_content(model, "Reply with the single word: ready",
+                                                   generation_config={"max_output_tokens": 5})
+            self._record_usage(response)
+    
+    def usage_stats(self) -> Dict[str, int]:
+        """requests sent and tokens billed since startup"""
+        with self._usage_lock:
+            return dict(self._usage)
     
     def generate_opinion(self, personality_prompt: str, question: str, 
                         conversation_history: Optional[List[Dict[str, str]]] = None) -> str:
@@ -33,20 +83,181 @@ class LLMService:
             generated text response (30-60 words)
         """
         try:
-            model = genai.GenerativeModel(self.model_name)
-            
-            context = ""
-            if conversation_history and len(conversation_history) > 1:
-                context = "\n\nPrevious conversation:\n"
-                for msg in conversation_history[:-1]:
-                    context += f"{msg['role'].upper()}: {msg['content']}\n"
-                context += "\n"
-            
-            user_message = f"{personality_prompt}\n{context}Question: {question}\n\nGive your opinion in 30-60 words. Stay in character."
-            
-            response = model.generate_content(user_message)
+            model = get_gemini_model(self.model_name)
+            with upstream('llm').slot(), span('llm_opinion'):
+                response = model.generate_content(self._build_prompt(personality_prompt, question, conversation_history))
+            self._record_usage(response)
             return response.text.strip()
         
+        except Overloaded:
+            raise
         except Exception as e:
             raise Exception(f"Gemini text generation failed: {str(e)}")
-
+    
+    async def agenerate_opinion(self, personality_prompt: str, question: str,
+                                conversation_history: Optional[List[Dict[str, str]]] = None) -> str:
+        """non-blocking variant of generate_opinion for the asyncio server"""
+        try:
+            model = get_gemini_model(self.model_name)
+            async with upstream('llm').aslot():
+                with span('llm_opinion'):
+                    response = await agenerate_content(
+                        model, self._build_prompt(personality_prompt, question, conversation_history)
+                    )
+            self._record_usage(response)
+            return response.text.strip()
+        
+        except Overloaded:
+            raise
+        except Exception as e:
+            raise Exception(f"Gemini text generation failed: {str(e)}")
+    
+    def generate_panel(self, personas: List[Dict[str, str]], question: str,
+                       conversation_history: Optional[List[Dict[str, str]]] = None) -> Dict[str, str]:
+        """generate every persona's opinion in one JSON-mode request
+        
+        the question and conversation context are sent once instead of once per persona
+        
+        Args:
+            personas: list of {"id", "name", "personality_prompt"}
+            question: user's question or follow-up
+            conversation_history: optional list of previous messages
+        
+        Returns:
+            {persona id: opinion} for every persona whose answer passed validation;
+            callers should fall back to generate_opinion for the rest
+        
+        Raises:
+            Exception: if the request fails or the response isn't a JSON object
+        """
+        try:
+            model = get_gemini_model(self.model_name)
+            with upstream('llm').slot(), span('llm_panel'):
+                response = model.generate_content(
+                    self._build_panel_prompt(personas, question, conversation_history),
+                    generation_config={"response_mime_type": "application/json"}
+                )
+            self._record_usage(response)
+            return self.parse_panel_response(response.text, [persona['id'] for persona in personas])
+        
+        except Overloaded:
+            raise
+        except Exception as e:
+            raise Exception(f"Gemini panel generation failed: {str(e)}")
+    
+    async def agenerate_panel(self, personas: List[Dict[str, str]], question: str,
+                              conversation_history: Optional[List[Dict[str, str]]] = None) -> Dict[str, str]:
+        """non-blocking variant of generate_panel for the asyncio server"""
+        try:
+            model = get_gemini_model(self.model_name)
+            async with upstream('llm').aslot():
+                with span('llm_panel'):
+                    response = await agenerate_content(
+                        model, self._build_panel_prompt(personas, question, conversation_history),
+                        generation_config={"response_mime_type": "application/json"}
+                    )
+            self._record_usage(response)
+            return self.parse_panel_response(response.text, [persona['id'] for persona in personas])
+        
+        except Overloaded:
+            raise
+        except Exception as e:
+            raise Exception(f"Gemini panel generation failed: {str(e)}")
+    
+    @staticmethod
+    def parse_panel_response(text: str, persona_ids: List[str]) -> Dict[str, str]:
+        """validate a panel response, keeping only well-formed opinions for known personas
+        
+        Raises:
+            ValueError: if the text isn't a JSON object
+        """
+        data = json.loads(text)
+        if not isinstance(data, dict):
+            raise ValueError(f"expected a JSON object, got {type(data).__name__}")
+        
+        opinions = {}
+        for persona_id in persona_ids:
+            opinion = data.get(persona_id)
+            if not isinstance(opinion, str):
+                continue
+            opinion = opinion.strip()
+            if opinion and len(opinion.split()) <= MAX_PANEL_OPINION_WORDS:
+                opinions[persona_id] = opinion
+        return opinions
+    
+    def _build_panel_prompt(self, personas: List[Dict[str, str]], question: str,
+                            conversation_history: Optional[List[Dict[str, str]]] = None) -> str:
+        """one prompt carrying every persona, the shared context once, and the JSON contract"""
+        parts = ["You are writing for a panel of characters who each answer the same question in their own voice."]
+        for persona in personas:
+            parts.append(f'=== Character "{persona["id"]}" ({persona["name"]}) ===\n{persona["personality_prompt"]}')
+        
+        context = self._format_context(conversation_history)
+        if context:
+            parts.append(context)
+        
+        ids = ", ".join(f'"{persona["id"]}"' for persona in personas)
+        parts.append(
+            f"Question: {question}\n\n"
+            f"Give each character's opinion in 30-60 words, fully in that character's voice and unaware of the others. "
+            f"Respond with only a JSON object whose keys are exactly {ids} and whose values are the opinions as strings."
+        )
+        return "\n\n".join(parts)
+    
+    def summarize_history(self, previous_summary: Optional[str], messages: List[Dict[str, str]]) -> str:
+        """fold older conversation messages into a short running summary
+        
+        Args:
+            previous_summary: summary of everything before messages, if any
+            messages: turns to add to the summary, oldest first
+        
+        Returns:
+            the updated summary
+        """
+        parts = ["Summarize this conversation between a user and a panel of bear characters in at most "
+                 "120 words. Keep the user's questions, decisions, preferences and any facts they shared; "
+                 "drop small talk. Reply with the summary only."]
+        if previous_summary:
+            parts.append(f"Summary so far:\n{previous_summary}")
+        parts.append("New messages:\n" + "\n".join(
+            f"{msg['role'].upper()}: {msg['content']}" for msg in messages
+        ))
+        
+        try:
+            model = get_gemini_model(self.model_name)
+            with upstream('llm').slot(), span('llm_summary'):
+                response = model.generate_content("\n\n".join(parts))
+            self._record_usage(response)
+            return response.text.strip()
+        
+        except Overloaded:
+            raise
+        except Exception as e:
+            raise Exception(f"Gemini history summary failed: {str(e)}")
+    
+    @staticmethod
+    def _format_context(conversation_history: Optional[List[Dict[str, str]]]) -> Optional[str]:
+        """previous turns (everything but the current question) as one block, or None
+        
+        a leading summary message from the history manager stands in for older turns
+        """
+        if not conversation_history or len(conversation_history) <= 1:
+            return None
+        
+        lines = []
+        for msg in conversation_history[:-1]:
+            if msg['role'] == SUMMARY_ROLE:
+                lines.append(f"Summary of earlier conversation: {msg['content']}")
+            else:
+                lines.append(f"{msg['role'].upper()}: {msg['content']}")
+        return "Previous conversation:\n" + "\n".join(lines)
+    
+    def _build_prompt(self, personality_prompt: str, question: str,
+                      conversation_history: Optional[List[Dict[str, str]]] = None) -> str:
+        """assemble the persona prompt with prior conversation context"""
+        parts = [personality_prompt]
+        context = self._format_context(conversation_history)
+        if context:
+            parts.append(context)
+        parts.append(f"Question: {question}\n\nGive your opinion in 30-60 words. Stay in character.")
+        return "\n\n".join(parts)
@@ -0,0 +1,254 @@
+import contextvars
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+
+# print one JSON line per finished span (request id, stage, seconds)
+SPAN_LOG = os.getenv('SPAN_LOG', 'false').lower() == 'true'
+
+# seconds; spans run from a few ms (disk writes) to minutes (voice cloning)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+_REQUEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+request_id_var: contextvars.ContextVar = contextvars.ContextVar('request_id', default=None)
+
+
+def new_request_id(incoming: Optional[str] = None) -> str:
+    """set the current request's id (the caller's X-Request-ID if it's sane, else a fresh one)"""
+    request_id = incoming if incoming and _REQUEST_ID_PATTERN.match(incoming) else uuid.uuid4().hex[:16]
+    request_id_var.set(request_id)
+    return request_id
+
+
+def current_request_id() -> Optional[str]:
+    return request_id_var.get()
+
+
+def bind_context(fn: Callable) -> Callable:
+    """fn wrapped to run in a copy of the caller's context
+
+    thread pools and future callbacks don't inherit contextvars, so anything
+    handed to them from a request should be wrapped to keep its request id
+    """
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        # a fresh copy per call: one Context can't be entered by two threads at once
+        return context.copy().run(fn, *args, **kwargs)
+    return run
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _number(value) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(labels.get(name, '') for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield f"{self.name}{_labels(self.label_names, key)} {_number(value)}"
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple, list] = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, '') for name in self.label_names)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            snapshot = sorted((key, list(series)) for key, series in self._series.items())
+        for key, series in snapshot:
+            counts = series[:len(self.buckets)]
+            counts.append(series[-1] - sum(counts))  # observations above the last bound
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = 'le="%s"' % _number(bound)
+                yield f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.label_names, key)} {_number(series[-2])}"
+            yield f"{self.name}_count{_labels(self.label_names, key)} {series[-1]}"
+
+
+class StatsGauges:
+    """exposes every number in a component's stats() dict as a gauge, read at scrape time
+
+    nested dicts are flattened with underscores, e.g. {'backing': {'bytes': 1}}
+    under prefix jury_audio_store becomes jury_audio_store_backing_bytes
+    """
+
+    def __init__(self, prefix: str, read: Callable[[], Optional[dict]]):
+        self.prefix = prefix
+        self.read = read
+
+    @staticmethod
+    def _flatten(prefix: str, stats: dict) -> Iterable[Tuple[str, float]]:
+        for key, value in stats.items():
+            name = f"{prefix}_{re.sub(r'[^A-Za-z0-9_]', '_', str(key))}"
+            if isinstance(value, dict):
+                yield from StatsGauges._flatten(name, value)
+            elif isinstance(value, bool):
+                yield name, int(value)
+            elif isinstance(value, (int, float)):
+                yield name, value
+
+    def render(self) -> Iterable[str]:
+        try:
+            stats = self.read()
+        except Exception as e:
+            print(f"✗ Metrics for {self.prefix} failed: {str(e)}")
+            return
+        for name, value in self._flatten(self.prefix, stats or {}):
+            yield f"# TYPE {name} gauge"
+            yield f"{name} {_number(value)}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def _add(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._add(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help, labels, buckets))
+
+    def stats_gauges(self, prefix: str, read: Callable[[], Optional[dict]]) -> StatsGauges:
+        return self._add(StatsGauges(prefix, read))
+
+    def render(self) -> str:
+        """everything in Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.histogram('jury_stage_seconds', 'Time spent in each pipeline stage', ('stage',))
+STAGE_ERRORS = registry.counter('jury_stage_errors_total', 'Pipeline stages that raised', ('stage',))
+BYTES = registry.counter('jury_bytes_total', 'Bytes moved by kind', ('kind',))
+HTTP_REQUESTS = registry.counter('jury_http_requests_total', 'HTTP requests by route and status',
+                                 ('method', 'route', 'status'))
+HTTP_SECONDS = registry.histogram('jury_http_request_seconds',
+                                  'Time to first byte of each HTTP response by route', ('method', 'route'))
+
+# callables taking (stage, seconds), for tools that want raw timings rather than buckets
+_stage_listeners = []
+
+
+def add_stage_listener(listener: Callable[[str, float], None]):
+    """call listener(stage, seconds) for every finished stage (the benchmarks use this for exact percentiles)"""
+    _stage_listeners.append(listener)
+
+
+def _record_stage(stage: str, seconds: float):
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    for listener in _stage_listeners:
+        listener(stage, seconds)
+
+
+@contextmanager
+def span(stage: str, **fields):
+    """time one stage of the current request into jury_stage_seconds
+
+    works around awaits as well as blocking calls; extra fields only go to the span log
+    """
+    start = time.perf_counter()
+    failed = False
+    try:
+        yield
+    except BaseException:
+        failed = True
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        _record_stage(stage, seconds)
+        if SPAN_LOG:
+            print(json.dumps({'request_id': request_id_var.get(), 'stage': stage,
+                              'seconds': round(seconds, 4), 'error': failed, **fields}))
+
+
+def observe_stage(stage: str, seconds: float):
+    """record a stage timed by the caller (for stages that don't fit a with block)"""
+    _record_stage(stage, seconds)
+
+
+def add_bytes(kind: str, count: int):
+    """count bytes moved for one kind (reference_payload, response_audio, ...)"""
+    if count:
+        BYTES.inc(count, kind=kind)
+
+
+def observe_request(method: str, route: str, status: int, seconds: float):
+    """record one HTTP response"""
+    HTTP_REQUESTS.inc(method=method, route=route, status=status)
+    HTTP_SECONDS.observe(seconds, method=method, route=route)
+
+
+def render_metrics() -> str:
+    return registry.render()
@@ -0,0 +1,97 @@
+import base64
+import os
+import threading
+import wave
+from typing import Dict, Iterable
+
+
+class ReferenceAudioCache:
+    """process-wide cache of base64-encoded reference voices
+    
+    entries are keyed by path and revalidated against the file's mtime and size
+    on every lookup, so an edited clip is re-encoded on its next use
+    """
+    
+    def __init__(self):
+        self._entries = {}  # path -> (mtime_ns, size, b64)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+    
+    @staticmethod
+    def _validate(path: str, data: bytes):
+        """make sure the reference clip is a readable WAV before we ship it upstream"""
+        if data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+            raise ValueError(f"Reference audio is not a WAV file: {path}")
+        with wave.open(path, "rb") as wf:
+            if wf.getnframes() == 0:
+                raise ValueError(f"Reference audio is empty: {path}")
+    
+    def get(self, path: str) -> str:
+        """return the base64 payload for a reference clip, loading it on a miss
+        
+        Args:
+            path: path to the reference WAV
+        
+        Returns:
+            base64-encoded file contents
+        
+        Raises:
+            OSError: if the file can't be read
+            ValueError: if the file isn't a valid WAV
+        """
+        st = os.stat(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+            if entry:
+                self.invalidations += 1
+        
+        with open(path, "rb") as f:
+            data = f.read()
+        self._validate(path, data)
+        encoded = base64.b64encode(data).decode("utf-8")
+        
+        with self._lock:
+            self._entries[path] = (st.st_mtime_ns, st.st_size, encoded)
+        return encoded
+    
+    def warm(self, paths: Iterable[str]) -> Dict[str, bool]:
+        """load a set of reference clips ahead of the first request
+        
+        Returns:
+            {path: loaded} for every path given; missing or invalid clips are reported, not raised
+        """
+        loaded = {}
+        for path in paths:
+            try:
+                self.get(path)
+                loaded[path] = True
+            except (OSError, ValueError, wave.Error) as e:
+                print(f"WARNING: Could not preload reference audio {path}: {str(e)}")
+                loaded[path] = False
+        return loaded
+    
+    def clear(self):
+        """drop every cached entry"""
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> dict:
+        """hit/miss counters and current footprint"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': sum(len(entry[2]) for entry in self._entries.values()),
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations
+            }
+
+
+# shared by every TTSService in the process
+reference_audio_cache = ReferenceAudioCache()
@@ -0,0 +1,366 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from .admission import Overloaded
+from .metrics import bind_context
+
+T = TypeVar("T")
+
+# HTTP statuses that say "try again later" rather than "this request is wrong"
+RETRYABLE_STATUSES = {408, 425, 429}
+
+
+def is_transient(error: BaseException) -> bool:
+    """whether an error is worth retrying: a timeout, a dropped connection, a 429 or a 5xx
+
+    anything else (a 400 for an oversized payload, a 401 for a bad key, a bug)
+    fails the same way on every attempt and says nothing about the endpoint's health
+    """
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    status = getattr(error, 'status_code', None)
+    return status is not None and (status in RETRYABLE_STATUSES or status >= 500)
+
+
+class CircuitOpen(Exception):
+    """the endpoint is considered unhealthy; callers should go straight to their fallback"""
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"{name} circuit is open (retrying in {retry_in:.0f}s)")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class LatencyTracker:
+    """rolling window of recent successful call latencies"""
+
+    def __init__(self, window: int = 200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """nearest-rank percentile of the window, None while it's empty"""
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        rank = min(len(samples) - 1, max(0, int(round(p / 100 * len(samples))) - 1))
+        return samples[rank]
+
+    def __len__(self):
+        return len(self._samples)
+
+
+class CircuitBreaker:
+    """trips after consecutive failures and lets a single trial call through after a cool-down
+
+    closed: calls pass. open: calls are refused for reset_after seconds.
+    half-open: one trial call passes; its success closes the circuit, its
+    failure opens it again. a trial that never reports back (an abandoned
+    stream, say) stops blocking further trials after another reset_after.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_after: float = 30):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self._failures = 0
+        self._opened_at = None
+        self._trial_started = None
+        self._lock = threading.Lock()
+        self.trips = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state(time.monotonic())
+
+    def _state(self, now: float) -> str:
+        if self._opened_at is None:
+            return 'closed'
+        return 'half_open' if now - self._opened_at >= self.reset_after else 'open'
+
+    def retry_in(self) -> float:
+        with self._lock:
+            if self._opened_at is None:
+                return 0.0
+            return max(0.0, self._opened_at + self.reset_after - time.monotonic())
+
+    def allow(self) -> bool:
+        """whether a call may go out now (claims the trial slot when half-open)"""
+        now = time.monotonic()
+        with self._lock:
+            state = self._state(now)
+            if state == 'closed':
+                return True
+            if state == 'open':
+                return False
+            if self._trial_started is not None and now - self._trial_started < self.reset_after:
+                return False
+            self._trial_started = now
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_started = None
+
+    def record_failure(self):
+        now = time.monotonic()
+        with self._lock:
+            self._failures += 1
+            state = self._state(now)
+            if state == 'half_open' or (state == 'closed' and self._failures >= self.failure_threshold):
+                self._opened_at = now
+                self._trial_started = None
+                self.trips += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            state = self._state(time.monotonic())
+            return {
+                'state': state,
+                'open': state != 'closed',
+                'consecutive_failures': self._failures,
+                'trips': self.trips
+            }
+
+
+class ResilientEndpoint:
+    """adaptive timeouts, jittered retries, hedging and a circuit breaker for one upstream endpoint
+
+    each attempt's timeout follows the endpoint's observed latency (a multiple
+    of p99, clamped) instead of a flat worst case. an attempt still running
+    at p95 gets one hedged duplicate and whichever answers first wins. failed
+    attempts are retried with full-jitter exponential backoff within the
+    caller's time budget, and after enough consecutive failures the breaker
+    refuses calls outright so callers fall back immediately.
+    """
+
+    def __init__(self, name: str, min_timeout: float = 10, default_timeout: float = 120,
+                 timeout_factor: float = 2.0, min_samples: int = 20, hedge: bool = True,
+                 retries: int = 2, backoff: float = 0.5, max_backoff: float = 8,
+                 failure_threshold: int = 5, reset_after: float = 30, hedge_workers: int = 16,
+                 retryable: Callable[[BaseException], bool] = is_transient):
+        """
+        Args:
+            name: label for errors and stats
+            min_timeout: floor for adaptive attempt timeouts (seconds)
+            default_timeout: attempt timeout until min_samples latencies are known
+            timeout_factor: attempt timeout as a multiple of observed p99
+            min_samples: latencies needed before timeouts adapt and hedging starts
+            hedge: send a duplicate request when an attempt outlives p95
+            retries: extra attempts after a failure
+            backoff: base of the exponential backoff between attempts (seconds)
+            max_backoff: cap on a single backoff
+            failure_threshold: consecutive failures that open the circuit
+            reset_after: seconds the circuit stays open before a trial call
+            hedge_workers: threads running attempts when hedging (sync callers only)
+            retryable: which errors are retried and counted against the breaker; the rest are raised at once
+        """
+        self.name = name
+        self.min_timeout = min_timeout
+        self.default_timeout = default_timeout
+        self.timeout_factor = timeout_factor
+        self.min_samples = min_samples
+        self.hedge = hedge
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retryable = retryable
+
+        self.latency = LatencyTracker()
+        self.breaker = CircuitBreaker(failure_threshold, reset_after)
+        self._executor = ThreadPoolExecutor(max_workers=hedge_workers, thread_name_prefix=f"{name}-hedge") \
+            if hedge else None
+        self._lock = threading.Lock()
+        self._counts = {'calls': 0, 'attempts': 0, 'retries': 0, 'hedges': 0, 'hedge_wins': 0,
+                        'failures': 0, 'non_retryable': 0, 'short_circuits': 0}
+
+    def _count(self, key: str):
+        with self._lock:
+            self._counts[key] += 1
+
+    def timeout(self, cap: Optional[float] = None) -> float:
+        """timeout for the next attempt"""
+        p99 = self.latency.percentile(99) if len(self.latency) >= self.min_samples else None
+        timeout = max(self.min_timeout, p99 * self.timeout_factor) if p99 else self.default_timeout
+        return min(timeout, cap) if cap else timeout
+
+    def hedge_delay(self) -> Optional[float]:
+        """how long an attempt may run before it's hedged, None if hedging is off or unwarranted"""
+        if not self.hedge or len(self.latency) < self.min_samples:
+            return None
+        return self.latency.percentile(95)
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** (attempt - 1)))
+
+    def _admit(self):
+        if not self.breaker.allow():
+            self._count('short_circuits')
+            raise CircuitOpen(self.name, self.breaker.retry_in())
+
+    def record_success(self, started: Optional[float] = None):
+        """report a call made outside call()/acall(); pass started to count its latency too"""
+        if started is not None:
+            self.latency.record(time.monotonic() - started)
+        self.breaker.record_success()
+
+    def record_failure(self, error: Exception):
+        """report a failed call made outside call()/acall()"""
+        # waiting for a local slot says nothing about the endpoint's health
+        if isinstance(error, Overloaded):
+            return
+        if not self.retryable(error):
+            self._count('non_retryable')
+            return
+        self._count('failures')
+        self.breaker.record_failure()
+
+    def _budget_left(self, deadline: Optional[float]) -> Optional[float]:
+        return None if deadline is None else deadline - time.monotonic()
+
+    def _run(self, fn: Callable[[float], T], timeout: float) -> T:
+        self._count('attempts')
+        started = time.monotonic()
+        try:
+            result = fn(timeout)
+        except Exception as e:
+            self.record_failure(e)
+            raise
+        self.record_success(started)
+        return result
+
+    def _attempt(self, fn: Callable[[float], T], timeout: float) -> T:
+        delay = self.hedge_delay()
+        if delay is None or delay >= timeout:
+            return self._run(fn, timeout)
+
+        primary = self._executor.submit(bind_context(self._run), fn, timeout)
+        pending = {primary}
+        done, _ = wait(pending, timeout=delay)
+        if not done:
+            self._count('hedges')
+            pending.add(self._executor.submit(bind_context(self._run), fn, timeout))
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    # the loser can't be interrupted; it finishes within its own timeout
+                    if future is not primary:
+                        self._count('hedge_wins')
+                    return future.result()
+                error = error or future.exception()
+        raise error
+
+    def call(self, fn: Callable[[float], T], budget: Optional[float] = None) -> T:
+        """run fn(timeout) with retries, hedging and the breaker
+
+        Args:
+            fn: makes one request; receives the timeout to apply to it
+            budget: seconds the whole call (all attempts and backoffs) may take
+
+        Raises:
+            CircuitOpen: if the breaker refuses the call
+            Exception: the last attempt's error once retries or budget run out
+        """
+        self._count('calls')
+        deadline = time.monotonic() + budget if budget else None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self._count('retries')
+                time.sleep(self._backoff(attempt))
+            self._admit()
+            try:
+                return self._attempt(fn, self.timeout(self._budget_left(deadline)))
+            except Overloaded:
+                raise
+            except Exception as e:
+                left = self._budget_left(deadline)
+                if not self.retryable(e) or attempt == self.retries or \
+                        (left is not None and left < self.min_timeout):
+                    raise
+
+    async def _arun(self, fn: Callable[[float], Awaitable[T]], timeout: float) -> T:
+        self._count('attempts')
+        started = time.monotonic()
+        try:
+            result = await fn(timeout)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.record_failure(e)
+            raise
+        self.record_success(started)
+        return result
+
+    async def _aattempt(self, fn: Callable[[float], Awaitable[T]], timeout: float) -> T:
+        delay = self.hedge_delay()
+        if delay is None or delay >= timeout:
+            return await self._arun(fn, timeout)
+
+        primary = asyncio.ensure_future(self._arun(fn, timeout))
+        pending = {primary}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if not done:
+                self._count('hedges')
+                pending.add(asyncio.ensure_future(self._arun(fn, timeout)))
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self._count('hedge_wins')
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def acall(self, fn: Callable[[float], Awaitable[T]], budget: Optional[float] = None) -> T:
+        """non-blocking variant of call; losing hedges are cancelled"""
+        self._count('calls')
+        deadline = time.monotonic() + budget if budget else None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self._count('retries')
+                await asyncio.sleep(self._backoff(attempt))
+            self._admit()
+            try:
+                return await self._aattempt(fn, self.timeout(self._budget_left(deadline)))
+            except Overloaded:
+                raise
+            except Exception as e:
+                left = self._budget_left(deadline)
+                if not self.retryable(e) or attempt == self.retries or \
+                        (left is not None and left < self.min_timeout):
+                    raise
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self._counts)
+        p50, p95, p99 = (self.latency.percentile(p) for p in (50, 95, 99))
+        return {
+            **counts,
+            'circuit': self.breaker.stats(),
+            'latency_samples': len(self.latency),
+            'p50_seconds': round(p50, 2) if p50 else None,
+            'p95_seconds': round(p95, 2) if p95 else None,
+            'p99_seconds': round(p99, 2) if p99 else None,
+            'attempt_timeout_seconds': round(self.timeout(), 1),
+            'hedge_after_seconds': round(self.hedge_delay(), 2) if self.hedge_delay() else None
+        }
@@ -0,0 +1,211 @@
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+
+SESSION_ID_PATTERN = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$")
+
+
+class SessionAudioStore:
+    """per-session audio directories under a root, with TTL and a global byte budget
+    
+    sessions expire ttl seconds after their last write or read; when the store
+    exceeds max_bytes the least recently used sessions are deleted first. a
+    background janitor applies both rules periodically, and reconcile() adopts
+    (or deletes) directories left behind by a previous process
+    """
+    
+    def __init__(self, root: str, ttl: float = 3600, max_bytes: int = 1024 * 1024 * 1024,
+                 janitor_interval: float = 60):
+        """
+        Args:
+            root: directory holding one subdirectory per session
+            ttl: seconds of inactivity before a session is deleted
+            max_bytes: total size budget across all sessions
+            janitor_interval: seconds between background sweeps
+        """
+        self.root = root
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.janitor_interval = janitor_interval
+        
+        self._sessions = OrderedDict()  # session_id -> {'bytes', 'last_access'}, least recent first
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self._janitor = None
+        self._stop = threading.Event()
+        
+        self.expired = 0
+        self.evicted = 0
+        self.orphans_removed = 0
+        
+        os.makedirs(self.root, exist_ok=True)
+    
+    @staticmethod
+    def is_valid_session_id(session_id: str) -> bool:
+        """session ids are uuid4 strings; anything else could escape the root"""
+        return bool(SESSION_ID_PATTERN.match(session_id or ""))
+    
+    def _session_dir(self, session_id: str) -> str:
+        return os.path.join(self.root, session_id)
+    
+    def create_session(self) -> str:
+        """allocate a new session directory, returning its id"""
+        session_id = str(uuid.uuid4())
+        os.makedirs(self._session_dir(session_id), exist_ok=True)
+        with self._lock:
+            self._sessions[session_id] = {'bytes': 0, 'last_access': time.time()}
+        return session_id
+    
+    def write(self, session_id: str, name: str, data: bytes) -> str:
+        """atomically write a file into a session, returning its path
+        
+        Raises:
+            KeyError: if the session doesn't exist (or was already evicted)
+        """
+        if os.path.basename(name) != name:
+            raise ValueError(f"Invalid file name: {name}")
+        with self._lock:
+            if session_id not in self._sessions:
+                raise KeyError(f"Unknown session: {session_id}")
+        
+        path = os.path.join(self._session_dir(session_id), name)
+        previous = os.path.getsize(path) if os.path.exists(path) else 0
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        
+        with self._lock:
+            info = self._sessions.get(session_id)
+            if info is not None:
+                info['bytes'] += len(data) - previous
+                info['last_access'] = time.time()
+                self._sessions.move_to_end(session_id)
+                self._total_bytes += len(data) - previous
+            over_budget = self._total_bytes > self.max_bytes
+        if over_budget:
+            self.enforce_budget(keep=session_id)
+        return path
+    
+    def path(self, session_id: str, name: str) -> Optional[str]:
+        """path of a stored file, or None if the session or file is gone; counts as an access"""
+        if not self.is_valid_session_id(session_id) or os.path.basename(name) != name:
+            return None
+        path = os.path.join(self._session_dir(session_id), name)
+        if not os.path.exists(path):
+            return None
+        self.touch(session_id)
+        return path
+    
+    def touch(self, session_id: str) -> bool:
+        """mark a session as recently used, returning whether it still exists"""
+        with self._lock:
+            info = self._sessions.get(session_id)
+            if info is None:
+                return False
+            info['last_access'] = time.time()
+            self._sessions.move_to_end(session_id)
+            return True
+    
+    def _delete(self, session_id: str):
+        """drop a session from disk and the index (caller doesn't hold the lock)"""
+        with self._lock:
+            info = self._sessions.pop(session_id, None)
+            if info:
+                self._total_bytes -= info['bytes']
+        shutil.rmtree(self._session_dir(session_id), ignore_errors=True)
+    
+    def evict_expired(self) -> int:
+        """delete sessions idle for longer than ttl, returning how many"""
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            expired = [sid for sid, info in self._sessions.items() if info['last_access'] < cutoff]
+        for session_id in expired:
+            self._delete(session_id)
+        with self._lock:
+            self.expired += len(expired)
+        return len(expired)
+    
+    def enforce_budget(self, keep: Optional[str] = None) -> int:
+        """delete least recently used sessions until under max_bytes, returning how many"""
+        removed = 0
+        while True:
+            with self._lock:
+                if self._total_bytes <= self.max_bytes:
+                    break
+                victim = next((sid for sid in self._sessions if sid != keep), None)
+            if victim is None:
+                break
+            self._delete(victim)
+            removed += 1
+        with self._lock:
+            self.evicted += removed
+        return removed
+    
+    def reconcile(self):
+        """index session directories left by a previous process and remove stale or stray entries"""
+        cutoff = time.time() - self.ttl
+        adopted = {}
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if not os.path.isdir(path) or not self.is_valid_session_id(name):
+                continue
+            size = 0
+            last_access = 0.0
+            for entry in os.scandir(path):
+                if entry.is_file():
+                    st = entry.stat()
+                    size += st.st_size
+                    last_access = max(last_access, st.st_mtime)
+            last_access = last_access or os.path.getmtime(path)
+            if last_access < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+                self.orphans_removed += 1
+                continue
+            adopted[name] = {'bytes': size, 'last_access': last_access}
+        
+        with self._lock:
+            for session_id, info in sorted(adopted.items(), key=lambda item: item[1]['last_access']):
+                if session_id not in self._sessions:
+                    self._sessions[session_id] = info
+                    self._total_bytes += info['bytes']
+        self.enforce_budget()
+        print(f"Session audio store: adopted {len(adopted)} sessions, removed {self.orphans_removed} stale")
+    
+    def _run_janitor(self):
+        while not self._stop.wait(self.janitor_interval):
+            try:
+                self.evict_expired()
+                self.enforce_budget()
+            except Exception as e:
+                print(f"WARNING: Session audio janitor failed: {str(e)}")
+    
+    def start_janitor(self):
+        """sweep expired and over-budget sessions in a background thread"""
+        if self._janitor and self._janitor.is_alive():
+            return
+        self._stop.clear()
+        self._janitor = threading.Thread(target=self._run_janitor, name="session-audio-janitor", daemon=True)
+        self._janitor.start()
+    
+    def stop_janitor(self):
+        self._stop.set()
+    
+    def stats(self) -> dict:
+        """disk usage and eviction counters"""
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl,
+                'expired': self.expired,
+                'evicted': self.evicted,
+                'orphans_removed': self.orphans_removed
+            }
@@ -0,0 +1,117 @@
+import os
+import shutil
+import subprocess
+from typing import Optional
+
+
+# ffmpeg output arguments per format; speech at 24 kHz mono needs very little bitrate
+ENCODER_ARGS = {
+    'opus': ['-c:a', 'libopus', '-b:a', '24k', '-application', 'voip', '-f', 'ogg'],
+    'mp3': ['-c:a', 'libmp3lame', '-b:a', '48k', '-f', 'mp3'],
+    'flac': ['-c:a', 'flac', '-compression_level', '5', '-f', 'flac'],
+}
+FORMATS = ('wav',) + tuple(ENCODER_ARGS)
+
+# when the client weighs several formats equally, send the smallest
+PREFERENCE = ('opus', 'mp3', 'flac', 'wav')
+
+ACCEPT_TYPES = {
+    'audio/ogg': 'opus',
+    'audio/opus': 'opus',
+    'audio/mpeg': 'mp3',
+    'audio/mp3': 'mp3',
+    'audio/flac': 'flac',
+    'audio/x-flac': 'flac',
+    'audio/wav': 'wav',
+    'audio/wave': 'wav',
+    'audio/x-wav': 'wav',
+}
+
+FFMPEG_PATH = os.getenv('FFMPEG_PATH', 'ffmpeg')
+TRANSCODE_TIMEOUT = float(os.getenv('TRANSCODE_TIMEOUT', 30))
+
+_encoder = None
+
+
+def ffmpeg_binary() -> Optional[str]:
+    """resolved path of the local ffmpeg binary, or None (looked up once)"""
+    global _encoder
+    if _encoder is None:
+        _encoder = shutil.which(FFMPEG_PATH) or ''
+    return _encoder or None
+
+
+def encoder_available() -> bool:
+    """whether the local ffmpeg binary can be found"""
+    return ffmpeg_binary() is not None
+
+
+def available_formats() -> tuple:
+    """formats this server can actually serve"""
+    return FORMATS if encoder_available() else ('wav',)
+
+
+def negotiate_format(requested: Optional[str], accept: Optional[str]) -> Optional[str]:
+    """pick the output format for an audio request
+
+    an explicit format parameter wins; otherwise the Accept header is matched
+    against concrete audio types only, since wildcards say nothing about which
+    codecs the client can decode. compressed formats fall back to wav when no
+    encoder is installed.
+
+    Args:
+        requested: value of the `format` query parameter, if any
+        accept: the Accept header, if any
+
+    Returns:
+        format name, or None if `requested` isn't a format we know
+    """
+    if requested:
+        requested = requested.lower()
+        if requested not in FORMATS:
+            return None
+        return requested if requested in available_formats() else 'wav'
+
+    weights = {}
+    for part in (accept or '').split(','):
+        media, _, params = part.strip().partition(';')
+        fmt = ACCEPT_TYPES.get(media.strip().lower())
+        if not fmt or fmt not in available_formats():
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[fmt] = max(weights.get(fmt, 0.0), q)
+
+    candidates = [fmt for fmt in PREFERENCE if weights.get(fmt, 0) > 0]
+    if not candidates:
+        return 'wav'
+    return max(candidates, key=lambda fmt: (weights[fmt], -PREFERENCE.index(fmt)))
+
+
+def transcode(wav_bytes: bytes, fmt: str) -> bytes:
+    """encode a WAV clip with the local ffmpeg, entirely through pipes
+
+    Raises:
+        RuntimeError: if no encoder is installed or ffmpeg fails
+    """
+    if fmt == 'wav':
+        return wav_bytes
+    if not encoder_available():
+        raise RuntimeError(f"{FFMPEG_PATH} not found; cannot encode {fmt}")
+
+    result = subprocess.run(
+        [ffmpeg_binary(), '-hide_banner', '-loglevel', 'error', '-f', 'wav', '-i', 'pipe:0',
+         *ENCODER_ARGS[fmt], 'pipe:1'],
+        input=wav_bytes,
+        capture_output=True,
+        timeout=TRANSCODE_TIMEOUT
+    )
+    if result.returncode != 0 or not result.stdout:
+        raise RuntimeError(f"ffmpeg failed encoding {fmt}: {result.stderr.decode(errors='replace').strip()}")
+    return result.stdout
@@ -0,0 +1,169 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+
+class SynthesisCache:
+    """content-addressed cache for synthesized clips
+    
+    two tiers: an in-memory LRU bounded by bytes, and an optional on-disk tier
+    bounded by total size that evicts least-recently-used files (by mtime)
+    """
+    
+    def __init__(self, memory_max_bytes: int = 64 * 1024 * 1024, disk_dir: Optional[str] = None,
+                 disk_max_bytes: int = 512 * 1024 * 1024):
+        """
+        Args:
+            memory_max_bytes: byte budget for the in-memory tier (0 disables it)
+            disk_dir: directory for the on-disk tier (None disables it)
+            disk_max_bytes: byte budget for the on-disk tier
+        """
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = disk_max_bytes
+        
+        self._memory = OrderedDict()  # key -> bytes, oldest first
+        self._memory_bytes = 0
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._disk_bytes = sum(size for _, _, size in self._scan_disk())
+    
+    @staticmethod
+    def make_key(speaker_tag: str, ref_audio_path: str, ref_transcript: str, text: str,
+                 params: Dict, history: Optional[List[Dict]] = None) -> str:
+        """hash everything that influences the generated audio
+        
+        the reference voice is identified by path, mtime and size rather than by
+        content so building a key never reads the clip
+        """
+        st = os.stat(ref_audio_path) if ref_audio_path and os.path.exists(ref_audio_path) else None
+        voice = [os.path.abspath(ref_audio_path), st.st_mtime_ns, st.st_size] if st else None
+        payload = json.dumps([speaker_tag, voice, ref_transcript, text, params, history or []],
+                             sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.wav")
+    
+    def _scan_disk(self):
+        """(mtime, path, size) for every file in the disk tier"""
+        entries = []
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, path, st.st_size))
+        return entries
+    
+    def _remember(self, key: str, audio: bytes):
+        """insert into the memory tier and evict down to budget (caller holds the lock)"""
+        if len(audio) > self.memory_max_bytes:
+            return
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key))
+        self._memory[key] = audio
+        self._memory_bytes += len(audio)
+        while self._memory_bytes > self.memory_max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self.evictions += 1
+    
+    def get(self, key: str) -> Optional[bytes]:
+        """return cached audio for key, promoting disk hits into memory"""
+        with self._lock:
+            audio = self._memory.get(key)
+            if audio is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return audio
+        
+        if self.disk_dir:
+            path = self._disk_path(key)
+            try:
+                with open(path, "rb") as f:
+                    audio = f.read()
+                os.utime(path)  # mtime doubles as the LRU clock
+            except OSError:
+                audio = None
+            if audio is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                    self._remember(key, audio)
+                return audio
+        
+        with self._lock:
+            self.misses += 1
+        return None
+    
+    def put(self, key: str, audio: bytes):
+        """store audio in both tiers"""
+        if not audio:
+            return
+        with self._lock:
+            self._remember(key, audio)
+        
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            existed = os.path.getsize(path) if os.path.exists(path) else 0
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(audio)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"WARNING: Could not write TTS cache entry: {str(e)}")
+            return
+        
+        with self._lock:
+            self._disk_bytes += len(audio) - existed
+            over_budget = self._disk_bytes > self.disk_max_bytes
+        if over_budget:
+            self._evict_disk()
+    
+    def _evict_disk(self):
+        """delete least-recently-used files until the disk tier fits its budget"""
+        entries = sorted(self._scan_disk())
+        total = sum(size for _, _, size in entries)
+        # leave some headroom so we don't rescan on every write
+        target = self.disk_max_bytes * 0.9
+        for _, path, size in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            with self._lock:
+                self.evictions += 1
+        with self._lock:
+            self._disk_bytes = total
+    
+    def stats(self) -> dict:
+        """hit/miss counters and tier footprints"""
+        with self._lock:
+            return {
+                'memory_entries': len(self._memory),
+                'memory_bytes': self._memory_bytes,
+                'disk_bytes': self._disk_bytes if self.disk_dir else None,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
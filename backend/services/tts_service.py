@@ -1,27 +1,93 @@
-from openai import OpenAI
+from typing import AsyncIterator, Iterator
 import base64
 import os
 import io
+import struct
 import wave
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from .admission import Overloaded, upstream
+from .metrics import add_bytes, current_request_id, span
+from .resilience import ResilientEndpoint
+from .ref_audio_cache import ReferenceAudioCache, reference_audio_cache
+from .tts_cache import SynthesisCache
+from .clients import (BOSON_BASE_URL, DEFAULT_MAX_CONNECTIONS, get_openai_client, get_async_openai_client,
+                      open_connection, aopen_connection, is_transient_api_error)
+
+
+# BosonAI generation output: PCM16 mono @ 24kHz
+SAMPLE_RATE = 24000
+SAMPLE_WIDTH = 2
+CHANNELS = 1
+
+# sampling settings shared by buffered and streamed cloning (and part of the cache key)
+GENERATION_PARAMS = {
+    "max_completion_tokens": 4096,
+    "temperature": 0.7,  # lowered from 1.0 to reduce over-the-top emotions
+    "top_p": 0.85,       # lowered from 0.95 for more consistency
+    "top_k": 40,         # lowered from 50 for more focused output
+}
+
+
+def pcm_to_wav(pcm_bytes: bytes) -> bytes:
+    """wrap raw PCM16 output in a WAV container"""
+    wav_buffer = io.BytesIO()
+    with wave.open(wav_buffer, "wb") as wf:
+        wf.setnchannels(CHANNELS)
+        wf.setsampwidth(SAMPLE_WIDTH)
+        wf.setframerate(SAMPLE_RATE)
+        wf.writeframes(pcm_bytes)
+    return wav_buffer.getvalue()
+
+
+def wav_stream_header() -> bytes:
+    """WAV header for a stream of unknown length
+    
+    the RIFF and data sizes are set to the maximum, which browsers and most
+    players treat as "read until the connection closes"
+    """
+    byte_rate = SAMPLE_RATE * CHANNELS * SAMPLE_WIDTH
+    return (
+        b"RIFF" + struct.pack("<I", 0xFFFFFFFF) + b"WAVE"
+        + b"fmt " + struct.pack("<IHHIIHH", 16, 1, CHANNELS, SAMPLE_RATE, byte_rate,
+                                CHANNELS * SAMPLE_WIDTH, SAMPLE_WIDTH * 8)
+        + b"data" + struct.pack("<I", 0xFFFFFFFF)
+    )
 
 
 class TTSService:
     """handles text-to-speech using BosonAI"""
     
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, ref_audio_cache: ReferenceAudioCache = None,
+                 cache: SynthesisCache = None, cache_history: bool = True,
+                 max_connections: int = DEFAULT_MAX_CONNECTIONS,
+                 resilience: ResilientEndpoint = None, fallback_timeout: float = 60):
         """initialize BosonAI client
         
         Args:
             api_key: BosonAI API key (defaults to BOSON_API_KEY env var)
+            ref_audio_cache: cache for encoded reference voices (defaults to the process-wide one)
+            cache: optional cache of synthesized clips; hits skip the network entirely
+            cache_history: include the preceding TTS conversation in the cache key
+            max_connections: size of the shared keep-alive connection pool to BosonAI
+            resilience: timeouts, retries, hedging and circuit breaking for voice cloning
+                        (defaults to a ResilientEndpoint with stock settings)
+            fallback_timeout: timeout in seconds for the simple (non-cloned) voice
         """
         self.api_key = api_key or os.getenv("BOSON_API_KEY")
         if not self.api_key:
             raise ValueError("BosonAI API key is required for TTS")
         
-        self.client = OpenAI(
-            api_key=self.api_key,
-            base_url="https://hackathon.boson.ai/v1"
-        )
+        # no retries inside the SDK: self.resilience is the only layer that retries, so its
+        # per-attempt timeouts, hedging and latency stats see every request
+        self.client = get_openai_client(self.api_key, BOSON_BASE_URL, max_connections, max_retries=0)
+        # used by the asyncio server so in-flight syntheses don't hold threads
+        self.async_client = get_async_openai_client(self.api_key, BOSON_BASE_URL, max_connections, max_retries=0)
+        self.ref_audio_cache = ref_audio_cache or reference_audio_cache
+        self.cache = cache
+        self.cache_history = cache_history
+        self.resilience = resilience or ResilientEndpoint("bosonai-clone", retryable=is_transient_api_error)
+        self.fallback_timeout = fallback_timeout
         
         # system prompt for TTS with courtroom scene
         self.system_prompt = (
@@ -31,11 +97,107 @@ class TTSService:
             "<|scene_desc_start|>\nAudio is recorded in a dramatic courtroom setting with slight reverb.\n<|scene_desc_end|>"
         )
     
+    def warm_up(self, connections: int = 4, prime: bool = False):
+        """open keep-alive connections to BosonAI before the first clip needs them
+        
+        Args:
+            connections: connections to open; the requests go out together so each gets its own
+            prime: also synthesize a short clip with the fallback voice
+        """
+        connections = max(1, connections)
+        with ThreadPoolExecutor(max_workers=connections, thread_name_prefix="tts-warmup") as pool:
+            list(pool.map(lambda _: open_connection(lambda: self.client.models.list(timeout=10)), range(connections)))
+        if prime:
+            self._simple_tts("Ready.", timeout=self.fallback_timeout)
+    
+    async def awarm_up(self, connections: int = 4, prime: bool = False):
+        """warm_up for the asyncio client's pool, which the threaded warm-up doesn't touch"""
+        await asyncio.gather(*(aopen_connection(lambda: self.async_client.models.list(timeout=10))
+                               for _ in range(max(1, connections))))
+        if prime:
+            await self._asimple_tts("Ready.", timeout=self.fallback_timeout)
+    
     def _b64_encode(self, audio_path: str) -> str:
-        """base64 encode audio file"""
-        with open(audio_path, "rb") as f:
-            return base64.b64encode(f.read()).decode("utf-8")
+        """base64 encode audio file (cached per path and mtime)"""
+        return self.ref_audio_cache.get(audio_path)
     
+    def _build_messages(self, speaker_tag: str, reference_audio_b64: str, ref_transcript: str,
+                        text: str, conversation_history: list = None) -> list:
+        """build the in-context cloning conversation for one utterance"""
+        messages = [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": ref_transcript},
+            {
+                "role": "assistant",
+                "content": [{
+                    "type": "input_audio",
+                    "input_audio": {"data": reference_audio_b64, "format": "wav"}
+                }],
+            },
+        ]
+
+        # add conversation history if provided
+        if conversation_history:
+            messages.extend(conversation_history)
+
+        # add current text request
+        messages.append({"role": "user", "content": f"{speaker_tag} {text}"})
+        return messages
+
+    def _clone_request(self, messages: list, timeout: int, stream: bool) -> dict:
+        """chat completion arguments for an in-context cloning call"""
+        request = dict(
+            model="higgs-audio-generation-Hackathon",
+            messages=messages,
+            modalities=["text", "audio"],
+            max_completion_tokens=GENERATION_PARAMS["max_completion_tokens"],
+            temperature=GENERATION_PARAMS["temperature"],
+            top_p=GENERATION_PARAMS["top_p"],
+            stream=stream,
+            stop=["<|eot_id|>", "<|end_of_text|>", "<|audio_eos|>"],
+            extra_body={"top_k": GENERATION_PARAMS["top_k"]},
+            timeout=timeout,
+        )
+        if stream:
+            request["audio"] = {"format": "pcm16"}
+        # lets BosonAI-side logs be matched to ours
+        request_id = current_request_id()
+        if request_id:
+            request["extra_headers"] = {"X-Request-ID": request_id}
+        # the reference clip is resent with every attempt and is most of the upload
+        add_bytes('reference_payload', len(messages[2]["content"][0]["input_audio"]["data"]))
+        return request
+
+    @staticmethod
+    def _chunk_pcm(chunk) -> bytes:
+        """decoded PCM from one streamed completion chunk, or b'' if it carries no audio"""
+        if not chunk.choices:
+            return b""
+        delta = getattr(chunk.choices[0], "delta", None)
+        audio = getattr(delta, "audio", None)
+        if not audio:
+            return b""
+        data = audio.get("data") if isinstance(audio, dict) else getattr(audio, "data", None)
+        return base64.b64decode(data) if data else b""
+
+    def _simple_tts_request(self, text: str, timeout: int) -> dict:
+        """speech endpoint arguments for the non-cloned fallback voice"""
+        return dict(
+            model="higgs-audio-generation-Hackathon",
+            voice="en_woman",
+            input=text,
+            response_format="pcm",
+            timeout=timeout,
+        )
+
+    def cache_key(self, speaker_tag: str, ref_audio_path: str, ref_transcript: str, text: str,
+                  conversation_history: list = None) -> str:
+        """key under which synthesize_speech caches a cloned clip"""
+        return SynthesisCache.make_key(
+            speaker_tag, ref_audio_path, ref_transcript, text, GENERATION_PARAMS,
+            conversation_history if self.cache_history else None
+        )
+
     def synthesize_speech(self, speaker_tag: str, ref_audio_path: str, 
                          ref_transcript: str, text: str,
                          conversation_history: list = None, timeout: int = 300) -> bytes:
@@ -47,7 +209,8 @@ class TTSService:
             ref_transcript: transcript of reference audio with speaker tag
             text: text to convert to speech
             conversation_history: previous messages for context (optional)
-            timeout: timeout in seconds for API call (default 300s = 5min)
+            timeout: budget in seconds for cloning, retries included (default 300s = 5min);
+                     each attempt gets an adaptive timeout within it
         
         Returns:
             audio data as bytes (WAV format)
@@ -55,67 +218,59 @@ class TTSService:
         # If reference audio is missing, fall back to simple TTS
         if not ref_audio_path or not os.path.exists(ref_audio_path):
             print(f"WARNING: Reference audio not found: {ref_audio_path}, falling back to simple TTS")
-            return self._simple_tts(text)
+            return self._simple_tts(text, timeout=self.fallback_timeout)
         
+        cache_key = None
+        if self.cache:
+            cache_key = self.cache_key(speaker_tag, ref_audio_path, ref_transcript, text, conversation_history)
+            cached = self.cache.get(cache_key)
+            if cached:
+                print(f"✓ TTS cache hit for {speaker_tag}")
+                return cached
+
         print(f"Using reference audio: {ref_audio_path}")
 
         try:
             # encode reference audio
             reference_audio_b64 = self._b64_encode(ref_audio_path)
 
-            # build messages array
-            messages = [
-                {"role": "system", "content": self.system_prompt},
-                {"role": "user", "content": ref_transcript},
-                {
-                    "role": "assistant",
-                    "content": [{
-                        "type": "input_audio",
-                        "input_audio": {"data": reference_audio_b64, "format": "wav"}
-                    }],
-                },
-            ]
-
-            # add conversation history if provided
-            if conversation_history:
-                messages.extend(conversation_history)
-
-            # add current text request
-            messages.append({"role": "user", "content": f"{speaker_tag} {text}"})
-
-            # call BosonAI API for cloning with controlled parameters and timeout
-            print(f"Calling BosonAI API with timeout={timeout}s...")
-            resp = self.client.chat.completions.create(
-                model="higgs-audio-generation-Hackathon",
-                messages=messages,
-                modalities=["text", "audio"],
-                max_completion_tokens=4096,
-                temperature=0.7,  # lowered from 1.0 to reduce over-the-top emotions
-                top_p=0.85,       # lowered from 0.95 for more consistency
-                stream=False,
-                stop=["<|eot_id|>", "<|end_of_text|>", "<|audio_eos|>"],
-                extra_body={"top_k": 40},  # lowered from 50 for more focused output
-                timeout=timeout,
-            )
+            messages = self._build_messages(speaker_tag, reference_audio_b64, ref_transcript,
+                                            text, conversation_history)
+
+            def clone(attempt_timeout):
+                with upstream('tts').slot(), span('tts_clone'):
+                    return self.client.chat.completions.create(
+                        **self._clone_request(messages, attempt_timeout, stream=False))
+
+            # call BosonAI API for cloning; slow attempts are hedged and failures retried
+            print(f"Calling BosonAI API (attempt timeout {self.resilience.timeout(timeout):.0f}s, budget {timeout}s)...")
+            resp = self.resilience.call(clone, budget=timeout)
 
             # extract and decode audio
             audio_b64 = resp.choices[0].message.audio.data
             print(f"✓ Voice cloning successful")
-            return base64.b64decode(audio_b64)
+            audio_bytes = base64.b64decode(audio_b64)
+            add_bytes('synthesized_audio', len(audio_bytes))
+            if cache_key:
+                self.cache.put(cache_key, audio_bytes)
+            return audio_bytes
 
+        except Overloaded:
+            # the fallback would queue on the same full limiter; let the route answer 429 instead
+            raise
         except Exception as e:
-            # graceful fallback to simple TTS if cloning fails
+            # graceful fallback to simple TTS if cloning fails (or the circuit is open)
             error_msg = str(e)
-            if 'timeout' in error_msg.lower():
-                print(f"✗ Voice cloning timed out after {timeout}s, falling back to simple TTS")
+            if 'timeout' in error_msg.lower() or 'timed out' in error_msg.lower():
+                print(f"✗ Voice cloning timed out, falling back to simple TTS")
             else:
                 print(f"✗ Voice cloning failed: {error_msg}, falling back to simple TTS")
-            import traceback
-            traceback.print_exc()
             
             # try simple TTS as fallback
             try:
-                return self._simple_tts(text)
+                return self._simple_tts(text, timeout=self.fallback_timeout)
+            except Overloaded:
+                raise
             except Exception as fallback_error:
                 print(f"✗ Fallback TTS also failed: {str(fallback_error)}")
                 # return None instead of crashing the entire backend
@@ -125,20 +280,218 @@ class TTSService:
         """Simple TTS fallback (no cloning). Returns WAV bytes."""
         print(f"WARNING: Using fallback TTS with 'en_woman' voice")
         # Request PCM16 stream and wrap into WAV container in-memory
-        res = self.client.audio.speech.create(
-            model="higgs-audio-generation-Hackathon",
-            voice="en_woman",
-            input=text,
-            response_format="pcm",
-            timeout=timeout,
-        )
+        with upstream('tts').slot(), span('tts_fallback'):
+            res = self.client.audio.speech.create(**self._simple_tts_request(text, timeout))
+
+        add_bytes('synthesized_audio', len(res.content))
+        return pcm_to_wav(res.content)
 
-        pcm_bytes = res.content
-        wav_buffer = io.BytesIO()
-        with wave.open(wav_buffer, "wb") as wf:
-            wf.setnchannels(1)
-            wf.setsampwidth(2)  # 16-bit PCM
-            wf.setframerate(24000)
-            wf.writeframes(pcm_bytes)
-        return wav_buffer.getvalue()
+    def stream_speech(self, speaker_tag: str, ref_audio_path: str,
+                      ref_transcript: str, text: str,
+                      conversation_history: list = None, timeout: int = 300) -> Iterator[bytes]:
+        """generate speech with voice cloning, yielding PCM16 chunks as they arrive
+        
+        Args:
+            speaker_tag: speaker identifier like "[SPEAKER1]"
+            ref_audio_path: path to reference audio file for voice cloning
+            ref_transcript: transcript of reference audio with speaker tag
+            text: text to convert to speech
+            conversation_history: previous messages for context (optional)
+            timeout: timeout in seconds for API call (default 300s = 5min)
+        
+        Yields:
+            raw PCM16 mono 24kHz chunks (wrap with wav_stream_header to play)
+        
+        Raises:
+            Overloaded: if the tts upstream limiter is full (before any audio)
+        """
+        if not ref_audio_path or not os.path.exists(ref_audio_path):
+            print(f"WARNING: Reference audio not found: {ref_audio_path}, falling back to simple TTS")
+            yield from self._simple_tts_stream(text, timeout=self.fallback_timeout)
+            return
+        if not self.resilience.breaker.allow():
+            print(f"✗ Voice cloning circuit open, streaming simple TTS")
+            yield from self._simple_tts_stream(text, timeout=self.fallback_timeout)
+            return
+
+        started = False
+        try:
+            reference_audio_b64 = self._b64_encode(ref_audio_path)
+            messages = self._build_messages(speaker_tag, reference_audio_b64, ref_transcript,
+                                            text, conversation_history)
+
+            # a stream can't be hedged or retried once audio is out, but it gets the adaptive timeout
+            timeout = self.resilience.timeout(timeout)
+            print(f"Streaming BosonAI audio with timeout={timeout:.0f}s...")
+            # the slot is held for as long as the upstream stream is open
+            with upstream('tts').slot(), span('tts_stream'):
+                stream = self.client.chat.completions.create(**self._clone_request(messages, timeout, stream=True))
+
+                # base64 chunks needn't end on a sample boundary; carry the odd byte over
+                remainder = b""
+                for chunk in stream:
+                    pcm = remainder + self._chunk_pcm(chunk)
+                    cut = len(pcm) - len(pcm) % SAMPLE_WIDTH
+                    remainder = pcm[cut:]
+                    if cut:
+                        started = True
+                        add_bytes('synthesized_audio', cut)
+                        yield pcm[:cut]
+
+            self.resilience.record_success()
+            print(f"✓ Voice cloning stream finished")
+
+        except Overloaded:
+            # the fallback would queue on the same full limiter
+            raise
+        except Exception as e:
+            self.resilience.record_failure(e)
+            # once audio has gone out we can't switch voices mid-clip
+            if started:
+                print(f"✗ Voice cloning stream broke off: {str(e)}")
+                return
+            print(f"✗ Voice cloning stream failed: {str(e)}, falling back to simple TTS")
+            yield from self._simple_tts_stream(text, timeout=self.fallback_timeout)
+
+    def _simple_tts_stream(self, text: str, timeout: int = 300) -> Iterator[bytes]:
+        """Simple TTS fallback (no cloning), yielding PCM16 chunks as they arrive."""
+        print(f"WARNING: Using fallback TTS stream with 'en_woman' voice")
+        with upstream('tts').slot(), span('tts_fallback_stream'), \
+                self.client.audio.speech.with_streaming_response.create(**self._simple_tts_request(text, timeout)) as res:
+            # keep chunks sample-aligned so a client can play them as they land
+            remainder = b""
+            for chunk in res.iter_bytes(chunk_size=4800):
+                chunk = remainder + chunk
+                cut = len(chunk) - len(chunk) % SAMPLE_WIDTH
+                remainder = chunk[cut:]
+                if cut:
+                    add_bytes('synthesized_audio', cut)
+                    yield chunk[:cut]
+
+    async def asynthesize_speech(self, speaker_tag: str, ref_audio_path: str,
+                                 ref_transcript: str, text: str,
+                                 conversation_history: list = None, timeout: int = 300) -> bytes:
+        """non-blocking variant of synthesize_speech for the asyncio server
+        
+        cache lookups and reference voice reads (disk, on a miss) run in worker threads
+        """
+        if not ref_audio_path or not os.path.exists(ref_audio_path):
+            print(f"WARNING: Reference audio not found: {ref_audio_path}, falling back to simple TTS")
+            return await self._asimple_tts(text, timeout=self.fallback_timeout)
+
+        cache_key = None
+        if self.cache:
+            cache_key = self.cache_key(speaker_tag, ref_audio_path, ref_transcript, text, conversation_history)
+            cached = await asyncio.to_thread(self.cache.get, cache_key)
+            if cached:
+                print(f"✓ TTS cache hit for {speaker_tag}")
+                return cached
+
+        try:
+            reference_audio_b64 = await asyncio.to_thread(self._b64_encode, ref_audio_path)
+            messages = self._build_messages(speaker_tag, reference_audio_b64, ref_transcript,
+                                            text, conversation_history)
+
+            async def clone(attempt_timeout):
+                async with upstream('tts').aslot():
+                    with span('tts_clone'):
+                        return await self.async_client.chat.completions.create(
+                            **self._clone_request(messages, attempt_timeout, stream=False))
+
+            print(f"Calling BosonAI API (attempt timeout {self.resilience.timeout(timeout):.0f}s, budget {timeout}s)...")
+            resp = await self.resilience.acall(clone, budget=timeout)
+
+            print(f"✓ Voice cloning successful")
+            audio_bytes = base64.b64decode(resp.choices[0].message.audio.data)
+            add_bytes('synthesized_audio', len(audio_bytes))
+            if cache_key:
+                await asyncio.to_thread(self.cache.put, cache_key, audio_bytes)
+            return audio_bytes
+
+        except Overloaded:
+            raise
+        except Exception as e:
+            print(f"✗ Voice cloning failed: {str(e)}, falling back to simple TTS")
+            try:
+                return await self._asimple_tts(text, timeout=self.fallback_timeout)
+            except Overloaded:
+                raise
+            except Exception as fallback_error:
+                print(f"✗ Fallback TTS also failed: {str(fallback_error)}")
+                return None
+
+    async def _asimple_tts(self, text: str, timeout: int = 300) -> bytes:
+        """non-blocking simple TTS fallback (no cloning). Returns WAV bytes."""
+        print(f"WARNING: Using fallback TTS with 'en_woman' voice")
+        async with upstream('tts').aslot():
+            with span('tts_fallback'):
+                res = await self.async_client.audio.speech.create(**self._simple_tts_request(text, timeout))
+        add_bytes('synthesized_audio', len(res.content))
+        return pcm_to_wav(res.content)
+
+    async def astream_speech(self, speaker_tag: str, ref_audio_path: str,
+                             ref_transcript: str, text: str,
+                             conversation_history: list = None, timeout: int = 300) -> AsyncIterator[bytes]:
+        """non-blocking variant of stream_speech for the asyncio server"""
+        if not ref_audio_path or not os.path.exists(ref_audio_path):
+            print(f"WARNING: Reference audio not found: {ref_audio_path}, falling back to simple TTS")
+            async for pcm in self._asimple_tts_stream(text, timeout=self.fallback_timeout):
+                yield pcm
+            return
+        if not self.resilience.breaker.allow():
+            print(f"✗ Voice cloning circuit open, streaming simple TTS")
+            async for pcm in self._asimple_tts_stream(text, timeout=self.fallback_timeout):
+                yield pcm
+            return
+
+        started = False
+        try:
+            reference_audio_b64 = await asyncio.to_thread(self._b64_encode, ref_audio_path)
+            messages = self._build_messages(speaker_tag, reference_audio_b64, ref_transcript,
+                                            text, conversation_history)
+
+            timeout = self.resilience.timeout(timeout)
+            print(f"Streaming BosonAI audio with timeout={timeout:.0f}s...")
+            async with upstream('tts').aslot():
+                with span('tts_stream'):
+                    stream = await self.async_client.chat.completions.create(
+                        **self._clone_request(messages, timeout, stream=True))
+                    remainder = b""
+                    async for chunk in stream:
+                        pcm = remainder + self._chunk_pcm(chunk)
+                        cut = len(pcm) - len(pcm) % SAMPLE_WIDTH
+                        remainder = pcm[cut:]
+                        if cut:
+                            started = True
+                            add_bytes('synthesized_audio', cut)
+                            yield pcm[:cut]
+
+            self.resilience.record_success()
+            print(f"✓ Voice cloning stream finished")
+
+        except Overloaded:
+            # the fallback would queue on the same full limiter
+            raise
+        except Exception as e:
+            self.resilience.record_failure(e)
+            if started:
+                print(f"✗ Voice cloning stream broke off: {str(e)}")
+                return
+            print(f"✗ Voice cloning stream failed: {str(e)}, falling back to simple TTS")
+            async for pcm in self._asimple_tts_stream(text, timeout=self.fallback_timeout):
+                yield pcm
 
+    async def _asimple_tts_stream(self, text: str, timeout: int = 300) -> AsyncIterator[bytes]:
+        """non-blocking simple TTS fallback stream, yielding sample-aligned PCM16 chunks"""
+        print(f"WARNING: Using fallback TTS stream with 'en_woman' voice")
+        async with upstream('tts').aslot(), self.async_client.audio.speech.with_streaming_response.create(
+                **self._simple_tts_request(text, timeout)) as res:
+            with span('tts_fallback_stream'):
+                remainder = b""
+                async for chunk in res.iter_bytes(chunk_size=4800):
+                    chunk = remainder + chunk
+                    cut = len(chunk) - len(chunk) % SAMPLE_WIDTH
+                    remainder = chunk[cut:]
+                    if cut:
+                        add_bytes('synthesized_audio', cut)
+                        yield chunk[:cut]
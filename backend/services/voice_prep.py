@@ -0,0 +1,209 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import warnings
+import wave
+from dataclasses import dataclass, asdict
+from typing import Optional
+
+with warnings.catch_warnings():
+    # stdlib on <=3.12, provided by the audioop-lts package on 3.13+
+    warnings.simplefilter("ignore", DeprecationWarning)
+    import audioop
+
+
+# higgs-audio native output format; anything richer is wasted upload
+TARGET_RATE = 24000
+TARGET_WIDTH = 2
+
+# prepared clips live next to the voice docs, outside the committed ref-audio/
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'voices', 'cache')
+
+WINDOW_MS = 10
+PAD_MS = 150
+
+
+@dataclass
+class PreparedVoice:
+    """a compact reference clip plus the transcript that matches it"""
+    path: str
+    transcript: str
+    source_path: str
+    source_bytes: int
+    prepared_bytes: int
+    source_seconds: float
+    prepared_seconds: float
+
+
+def _read_pcm16_mono(path: str, sample_rate: int):
+    """decode a WAV into PCM16 mono at the requested rate"""
+    with wave.open(path, "rb") as wf:
+        channels = wf.getnchannels()
+        width = wf.getsampwidth()
+        rate = wf.getframerate()
+        frames = wf.readframes(wf.getnframes())
+    
+    source_seconds = len(frames) / float(channels * width * rate) if rate else 0.0
+    if width != TARGET_WIDTH:
+        frames = audioop.lin2lin(frames, width, TARGET_WIDTH)
+    if channels == 2:
+        frames = audioop.tomono(frames, TARGET_WIDTH, 0.5, 0.5)
+    elif channels != 1:
+        raise ValueError(f"Unsupported channel count {channels} in {path}")
+    if rate != sample_rate:
+        frames, _ = audioop.ratecv(frames, TARGET_WIDTH, 1, rate, sample_rate, None)
+    return frames, source_seconds
+
+
+def _window_rms(pcm: bytes, sample_rate: int):
+    """rms level of each WINDOW_MS slice"""
+    step = sample_rate * WINDOW_MS // 1000 * TARGET_WIDTH
+    return step, [audioop.rms(pcm[i:i + step], TARGET_WIDTH) for i in range(0, len(pcm), step)]
+
+
+def _trim_silence(pcm: bytes, sample_rate: int, threshold: int) -> bytes:
+    """drop leading and trailing silence, keeping a short pad so onsets aren't clipped"""
+    step, levels = _window_rms(pcm, sample_rate)
+    voiced = [i for i, level in enumerate(levels) if level > threshold]
+    if not voiced:
+        return pcm
+    pad = PAD_MS // WINDOW_MS
+    start = max(0, voiced[0] - pad) * step
+    end = min(len(levels), voiced[-1] + 1 + pad) * step
+    return pcm[start:end]
+
+
+def _cap_duration(pcm: bytes, sample_rate: int, max_seconds: float, threshold: int) -> bytes:
+    """shorten to max_seconds, cutting in the last pause before the limit when there is one"""
+    limit = int(max_seconds * sample_rate) * TARGET_WIDTH
+    if len(pcm) <= limit:
+        return pcm
+    step, levels = _window_rms(pcm[:limit], sample_rate)
+    # look for a pause in the back half so we don't cut mid-word
+    for i in range(len(levels) - 1, len(levels) // 2, -1):
+        if levels[i] <= threshold:
+            return pcm[:i * step]
+    return pcm[:limit]
+
+
+def _truncate_transcript(transcript: str, fraction: float) -> str:
+    """keep the leading sentences that roughly cover the first `fraction` of the clip"""
+    match = re.match(r"\s*(\[SPEAKER\d+\])\s*", transcript)
+    tag = match.group(1) + " " if match else ""
+    body = transcript[match.end():] if match else transcript
+    
+    sentences = re.split(r"(?<=[.!?])\s+", body.strip())
+    budget = fraction * len(body.split())
+    kept = []
+    words = 0
+    for sentence in sentences:
+        words += len(sentence.split())
+        if kept and words > budget:
+            break
+        kept.append(sentence)
+    return tag + " ".join(kept)
+
+
+def prepare_voice(source_path: str, transcript: str, cache_dir: str = DEFAULT_CACHE_DIR,
+                  sample_rate: int = TARGET_RATE, max_seconds: Optional[float] = None,
+                  silence_threshold: int = 500, capped_transcript: Optional[str] = None,
+                  force: bool = False) -> PreparedVoice:
+    """resample, trim and re-encode a reference clip for upload
+    
+    the artifact is cached under cache_dir keyed by the source file's identity
+    and the preparation settings, so repeated calls are just a stat and a read
+    
+    Args:
+        source_path: original reference WAV
+        transcript: transcript of the full clip, including its speaker tag
+        cache_dir: where prepared clips and their metadata are written
+        sample_rate: output rate (24kHz matches the model)
+        max_seconds: optional duration cap
+        silence_threshold: rms level below which a window counts as silence
+        capped_transcript: exact transcript of the capped clip; if omitted when the
+                           cap applies, leading sentences are kept proportionally
+        force: rebuild even if a cached artifact exists
+    
+    Returns:
+        PreparedVoice describing the compact clip
+    """
+    st = os.stat(source_path)
+    key = hashlib.sha1(json.dumps([
+        os.path.abspath(source_path), st.st_mtime_ns, st.st_size,
+        sample_rate, max_seconds, silence_threshold, transcript, capped_transcript
+    ]).encode("utf-8")).hexdigest()[:12]
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    out_path = os.path.join(cache_dir, f"{stem}-{key}.wav")
+    meta_path = os.path.join(cache_dir, f"{stem}-{key}.json")
+    
+    if not force and os.path.exists(out_path) and os.path.exists(meta_path):
+        with open(meta_path) as f:
+            return PreparedVoice(**json.load(f))
+    
+    pcm, source_seconds = _read_pcm16_mono(source_path, sample_rate)
+    pcm = _trim_silence(pcm, sample_rate, silence_threshold)
+    trimmed_seconds = len(pcm) / float(sample_rate * TARGET_WIDTH)
+    
+    prepared_transcript = transcript
+    if max_seconds and trimmed_seconds > max_seconds:
+        pcm = _cap_duration(pcm, sample_rate, max_seconds, silence_threshold)
+        if capped_transcript:
+            prepared_transcript = capped_transcript
+        else:
+            fraction = len(pcm) / float(sample_rate * TARGET_WIDTH) / trimmed_seconds
+            prepared_transcript = _truncate_transcript(transcript, fraction)
+            print(f"WARNING: {stem} capped at {max_seconds}s; transcript estimated, "
+                  f"pass capped_transcript for an exact match")
+    
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = out_path + ".tmp"
+    with wave.open(tmp_path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(TARGET_WIDTH)
+        wf.setframerate(sample_rate)
+        wf.writeframes(pcm)
+    os.replace(tmp_path, out_path)
+    
+    prepared = PreparedVoice(
+        path=out_path,
+        transcript=prepared_transcript,
+        source_path=source_path,
+        source_bytes=st.st_size,
+        prepared_bytes=os.path.getsize(out_path),
+        source_seconds=round(source_seconds, 3),
+        prepared_seconds=round(len(pcm) / float(sample_rate * TARGET_WIDTH), 3)
+    )
+    with open(meta_path, "w") as f:
+        json.dump(asdict(prepared), f, indent=2)
+    return prepared
+
+
+def main():
+    """prepare reference clips from the command line"""
+    parser = argparse.ArgumentParser(description="Resample, trim and cache reference voices for TTS cloning")
+    parser.add_argument("source", help="reference WAV to prepare")
+    parser.add_argument("--transcript", default="", help="transcript of the full clip, including its speaker tag")
+    parser.add_argument("--capped-transcript", default=None, help="exact transcript of the clip after --max-seconds")
+    parser.add_argument("--max-seconds", type=float, default=None, help="cap the prepared clip's duration")
+    parser.add_argument("--sample-rate", type=int, default=TARGET_RATE)
+    parser.add_argument("--silence-threshold", type=int, default=500)
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--force", action="store_true", help="rebuild even if cached")
+    args = parser.parse_args()
+    
+    prepared = prepare_voice(
+        args.source, args.transcript, cache_dir=args.cache_dir, sample_rate=args.sample_rate,
+        max_seconds=args.max_seconds, silence_threshold=args.silence_threshold,
+        capped_transcript=args.capped_transcript, force=args.force
+    )
+    print(f"Prepared: {prepared.path}")
+    print(f"  {prepared.source_bytes} -> {prepared.prepared_bytes} bytes "
+          f"({prepared.source_seconds}s -> {prepared.prepared_seconds}s)")
+    if prepared.transcript:
+        print(f"  Transcript: {prepared.transcript}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+class Readiness:
+    """tracks the start-up warm-up so readiness can be reported apart from liveness
+
+    the process is live (and serves requests) from the start; it is ready once
+    every expected warm-up step has finished, or once timeout seconds have
+    passed, whichever comes first. a failed step doesn't hold readiness back:
+    an unreachable upstream is the fallbacks' problem, and keeping every pod
+    out of the load balancer over it would turn an outage into a total one.
+    """
+
+    def __init__(self, timeout: float = 60):
+        """
+        Args:
+            timeout: seconds after which the process reports ready even if steps are still running
+        """
+        self.timeout = timeout
+        self.started = time.monotonic()
+        self._expected = set()
+        self._steps: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    def expect(self, *names: str):
+        """declare steps that must finish before the process is ready"""
+        with self._lock:
+            self._expected.update(names)
+
+    def _ready(self) -> bool:
+        finished = all(self._steps.get(name, {}).get('finished') for name in self._expected)
+        return finished or time.monotonic() - self.started >= self.timeout
+
+    @property
+    def ready(self) -> bool:
+        with self._lock:
+            return self._ready()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """block until ready (or timeout); returns whether the process is ready"""
+        deadline = time.monotonic() + (timeout if timeout is not None else self.timeout)
+        with self._changed:
+            while not self._ready():
+                left = min(deadline, self.started + self.timeout) - time.monotonic()
+                if left <= 0:
+                    break
+                self._changed.wait(left)
+            return self._ready()
+
+    @contextmanager
+    def step(self, name: str):
+        """time one warm-up step; an exception is recorded (and swallowed) as the step's error"""
+        start = time.monotonic()
+        with self._lock:
+            self._steps[name] = {'finished': False, 'ok': None, 'seconds': None, 'error': None}
+        ok, error = True, None
+        try:
+            yield
+        except Exception as e:
+            ok, error = False, str(e)
+            print(f"✗ Warm-up step {name} failed: {error}")
+        with self._changed:
+            self._steps[name] = {'finished': True, 'ok': ok, 'seconds': round(time.monotonic() - start, 3),
+                                 'error': error}
+            self._changed.notify_all()
+        if ok:
+            print(f"✓ Warm-up step {name} done in {time.monotonic() - start:.2f}s")
+
+    def run(self, steps: List[Tuple[str, Callable[[], object]]]):
+        """run steps concurrently and wait for them"""
+        self.expect(*(name for name, _ in steps))
+
+        def run_step(name, fn):
+            with self.step(name):
+                fn()
+
+        with ThreadPoolExecutor(max_workers=max(1, len(steps)), thread_name_prefix="warmup") as pool:
+            for name, fn in steps:
+                pool.submit(run_step, name, fn)
+
+    def start(self, steps: List[Tuple[str, Callable[[], object]]]) -> threading.Thread:
+        """run steps in the background; the server answers (not yet ready) meanwhile"""
+        self.expect(*(name for name, _ in steps))
+        thread = threading.Thread(target=self.run, args=(steps,), name="warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self) -> dict:
+        with self._lock:
+            steps = {name: dict(self._steps.get(name, {'finished': False, 'ok': None, 'seconds': None,
+                                                         'error': None}))
+                     for name in sorted(self._expected | set(self._steps))}
+            finished = all(steps[name]['finished'] for name in self._expected)
+            failed = any(step['ok'] is False for step in steps.values())
+            if not finished:
+                state = 'timed_out' if self._ready() else 'warming'
+            else:
+                state = 'degraded' if failed else 'warm'
+            return {
+                'ready': self._ready(),
+                'state': state,
+                'seconds_since_start': round(time.monotonic() - self.started, 1),
+                'steps': steps
+            }
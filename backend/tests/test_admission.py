@@ -0,0 +1,269 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from services.admission import Limiter, Overloaded, configure_upstream, upstream
+
+
+def _queue_in_thread(limiter, client, granted):
+    """acquire from a new thread, appending (client, permit) to granted once admitted"""
+    queued = limiter.stats()['queued']
+
+    def run():
+        granted.append((client, limiter.acquire(client)))
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    # wait until it's in line, so queue order is deterministic
+    deadline = time.monotonic() + 2
+    while limiter.stats()['queued'] == queued:
+        assert time.monotonic() < deadline, "waiter never queued"
+        time.sleep(0.001)
+    return thread
+
+
+def _wait_for(predicate, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "condition never met"
+        time.sleep(0.001)
+
+
+def test_admits_immediately_while_slots_are_free():
+    limiter = Limiter('t', max_active=2)
+    first, second = limiter.acquire('a'), limiter.acquire('b')
+    assert limiter.stats()['active'] == 2
+    first.release()
+    second.release()
+    assert limiter.stats()['active'] == 0
+    assert limiter.stats()['admitted'] == 2
+
+
+def test_unlimited_only_counts():
+    limiter = Limiter('t')
+    permits = [limiter.acquire() for _ in range(50)]
+    assert limiter.stats()['active'] == 50
+    for permit in permits:
+        permit.release()
+    assert limiter.stats()['active'] == 0
+
+
+def test_release_is_idempotent():
+    limiter = Limiter('t', max_active=1, timeout=0.01)
+    permit = limiter.acquire()
+    permit.release()
+    permit.release()
+    assert limiter.stats()['active'] == 0
+    # the slot was freed once, not twice
+    limiter.acquire()
+    with pytest.raises(Overloaded):
+        limiter.acquire()
+
+
+def test_full_queue_is_rejected_with_position_and_retry_after():
+    limiter = Limiter('t', max_active=1, max_queue=1, expected_hold=10)
+    holder = limiter.acquire('a')
+    granted = []
+    _queue_in_thread(limiter, 'b', granted)
+
+    with pytest.raises(Overloaded) as excinfo:
+        limiter.acquire('c')
+    assert excinfo.value.position == 2
+    # two rounds of one slot held ~10s each
+    assert excinfo.value.retry_after == 20
+    assert limiter.stats()['rejected'] == 1
+
+    holder.release()
+    _wait_for(lambda: granted)
+    granted[0][1].release()
+
+
+def test_per_client_cap_leaves_room_for_others():
+    limiter = Limiter('t', max_active=1, max_per_client=1)
+    holder = limiter.acquire('a')
+    granted = []
+    _queue_in_thread(limiter, 'a', granted)
+
+    with pytest.raises(Overloaded):
+        limiter.acquire('a')
+    _queue_in_thread(limiter, 'b', granted)
+    assert limiter.stats()['queued'] == 2
+
+    holder.release()
+    _wait_for(lambda: len(granted) == 1)
+    granted[0][1].release()
+    _wait_for(lambda: len(granted) == 2)
+    granted[1][1].release()
+    assert limiter.stats()['active'] == 0
+
+
+def test_released_slots_go_round_robin_across_clients():
+    limiter = Limiter('t', max_active=1)
+    holder = limiter.acquire('x')
+    granted = []
+    for client in ('a', 'a', 'a', 'b', 'c'):
+        _queue_in_thread(limiter, client, granted)
+
+    order = []
+    permit = holder
+    for _ in range(5):
+        permit.release()
+        _wait_for(lambda: len(granted) > len(order))
+        client, permit = granted[len(order)]
+        order.append(client)
+    permit.release()
+
+    # a's burst doesn't starve b and c, who queued behind it
+    assert order == ['a', 'b', 'c', 'a', 'a']
+    assert limiter.stats()['active'] == 0
+    assert limiter.stats()['queued'] == 0
+
+
+def test_queue_position_follows_round_robin_order():
+    limiter = Limiter('t', max_active=1)
+    limiter.acquire('x')
+    a1, a2 = limiter._enqueue('a'), limiter._enqueue('a')
+    b1 = limiter._enqueue('b')
+    # served a1, b1, a2
+    assert limiter._position(a1) == 1
+    assert limiter._position(b1) == 2
+    assert limiter._position(a2) == 3
+
+
+def test_wait_timeout_raises_and_leaves_the_queue():
+    limiter = Limiter('t', max_active=1, timeout=0.05)
+    holder = limiter.acquire('a')
+    with pytest.raises(Overloaded) as excinfo:
+        limiter.acquire('b')
+    assert excinfo.value.position == 1
+    stats = limiter.stats()
+    assert stats['queued'] == 0
+    assert stats['queued_clients'] == 0
+    assert stats['timeouts'] == 1
+    holder.release()
+    assert limiter.stats()['active'] == 0
+
+
+def test_abandon_after_grant_keeps_the_slot():
+    """a waiter that times out just as a slot is handed to it owns that slot"""
+    limiter = Limiter('t', max_active=1)
+    holder = limiter.acquire('a')
+    waiter = limiter._enqueue('b')
+    holder.release()
+    assert waiter.granted
+    assert limiter._abandon(waiter) is True
+    assert limiter.stats()['active'] == 1
+    assert limiter.stats()['timeouts'] == 0
+
+
+def test_hold_times_feed_retry_after():
+    limiter = Limiter('t', max_active=1, expected_hold=10)
+    permit = limiter.acquire()
+    # held just under a minute (the release adds a few microseconds)
+    permit.started -= 59.99
+    permit.release()
+    # moving average: 10 * 0.8 + 60 * 0.2
+    assert limiter.stats()['avg_hold_seconds'] == pytest.approx(20.0, abs=0.01)
+    assert limiter._retry_after(1) == 20
+    # three waiters ahead on one slot wait three holds
+    assert limiter._retry_after(3) == 60
+
+
+def test_async_acquire_waits_for_a_release():
+    async def main():
+        limiter = Limiter('t', max_active=1)
+        holder = await limiter.aacquire('a')
+        waiting = asyncio.ensure_future(limiter.aacquire('b'))
+        await asyncio.sleep(0.01)
+        assert not waiting.done()
+        holder.release()
+        permit = await asyncio.wait_for(waiting, 1)
+        assert limiter.stats()['active'] == 1
+        permit.release()
+        assert limiter.stats()['active'] == 0
+
+    asyncio.run(main())
+
+
+def test_async_timeout_raises_overloaded():
+    async def main():
+        limiter = Limiter('t', max_active=1, timeout=0.05)
+        holder = await limiter.aacquire('a')
+        with pytest.raises(Overloaded):
+            await limiter.aacquire('b')
+        assert limiter.stats()['queued'] == 0
+        holder.release()
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def main():
+        limiter = Limiter('t', max_active=1)
+        holder = await limiter.aacquire('a')
+        waiting = asyncio.ensure_future(limiter.aacquire('b'))
+        await asyncio.sleep(0.01)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert limiter.stats()['queued'] == 0
+        holder.release()
+        assert limiter.stats()['active'] == 0
+
+    asyncio.run(main())
+
+
+def test_cancelled_after_grant_returns_the_slot():
+    """a slot handed to a waiter that is cancelled before it wakes goes back, not astray"""
+    async def main():
+        limiter = Limiter('t', max_active=1)
+        holder = await limiter.aacquire('a')
+        waiting = asyncio.ensure_future(limiter.aacquire('b'))
+        await asyncio.sleep(0.01)
+        # the release grants the slot; the wake-up is only scheduled, so cancel before it runs
+        holder.release()
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert limiter.stats()['active'] == 0
+        assert limiter.stats()['queued'] == 0
+
+    asyncio.run(main())
+
+
+def test_threads_and_asyncio_share_one_limiter():
+    limiter = Limiter('t', max_active=1)
+    holder = limiter.acquire('thread')
+
+    async def main():
+        waiting = asyncio.ensure_future(limiter.aacquire('loop'))
+        await asyncio.sleep(0.01)
+        threading.Timer(0.01, holder.release).start()
+        permit = await asyncio.wait_for(waiting, 1)
+        permit.release()
+
+    asyncio.run(main())
+    assert limiter.stats()['active'] == 0
+
+
+def test_slot_context_managers_release():
+    limiter = Limiter('t', max_active=1)
+    with limiter.slot('a'):
+        assert limiter.stats()['active'] == 1
+    assert limiter.stats()['active'] == 0
+
+    async def main():
+        async with limiter.aslot('a'):
+            assert limiter.stats()['active'] == 1
+
+    asyncio.run(main())
+    assert limiter.stats()['active'] == 0
+
+
+def test_upstream_is_unlimited_until_configured():
+    assert upstream('test-upstream').max_active == 0
+    configured = configure_upstream('test-upstream', 3)
+    assert upstream('test-upstream') is configured
+    assert configured.max_active == 3
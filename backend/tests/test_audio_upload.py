@@ -0,0 +1,168 @@
+import io
+import wave
+
+import pytest
+
+from services import asr_service, audio_upload
+from services.admission import Overloaded
+from services.asr_service import FallbackASRService, GeminiASRService
+from services.audio_upload import (CHUNK_RATE, CHUNK_WIDTH, DEFAULT_MIME, UploadTooLarge, can_split, extension_for,
+                                   iter_speech_chunks, sniff_mime, spool_upload)
+
+
+# one 20 ms window of 16 kHz PCM16: 320 samples
+LOUD = b'\x00\x10' * 320
+SILENT = b'\x00' * 640
+
+
+def _windows(*runs):
+    """(window, count) runs flattened into the windows _decode_windows would yield"""
+    return [window for window, count in runs for _ in range(count)]
+
+
+def _frames(wav_bytes):
+    with wave.open(io.BytesIO(wav_bytes)) as wf:
+        assert (wf.getnchannels(), wf.getsampwidth(), wf.getframerate()) == (1, CHUNK_WIDTH, CHUNK_RATE)
+        return wf.getnframes()
+
+
+def _chunk(monkeypatch, windows, **kwargs):
+    """run iter_speech_chunks over synthetic windows; returns each chunk's length in windows"""
+    monkeypatch.setattr(audio_upload, '_decode_windows', lambda upload: iter(windows))
+    options = dict(target_seconds=0.2, max_seconds=0.4, min_silence_ms=60)
+    options.update(kwargs)
+    return [_frames(chunk) // 320 for chunk in iter_speech_chunks(None, **options)]
+
+
+# --- sniffing ---
+
+@pytest.mark.parametrize('head, mime_type', [
+    (b'\x1a\x45\xdf\xa3\x9f\x42\x86\x81\x01\x42\x82\x84webm', 'audio/webm'),
+    (b'\x1a\x45\xdf\xa3\x9f\x42\x86\x81\x01\x42\x82\x88matroska', 'audio/x-matroska'),
+    (b'OggS\x00\x02', 'audio/ogg'),
+    (b'RIFF\x24\x08\x00\x00WAVEfmt ', 'audio/wav'),
+    (b'fLaC\x00\x00\x00\x22', 'audio/flac'),
+    (b'\x00\x00\x00\x20ftypM4A ', 'audio/mp4'),
+    (b'ID3\x04\x00\x00', 'audio/mpeg'),
+    (b'\xff\xf1\x50\x80', 'audio/aac'),
+    (b'\xff\xfb\x90\x64', 'audio/mpeg'),
+    (b'not audio at all', DEFAULT_MIME),
+    (b'', DEFAULT_MIME),
+])
+def test_sniff_mime(head, mime_type):
+    assert sniff_mime(head) == mime_type
+
+
+def test_extension_for():
+    assert extension_for('audio/mp4') == 'm4a'
+    assert extension_for('audio/x-matroska') == 'mkv'
+    assert extension_for('application/octet-stream') == 'webm'
+
+
+# --- spooling ---
+
+def test_small_upload_stays_in_memory():
+    upload = spool_upload(io.BytesIO(b'OggS' + b'\x00' * 100), max_memory=1024)
+    try:
+        assert (upload.size, upload.mime_type, upload.in_memory) == (104, 'audio/ogg', True)
+        assert upload.read()[:4] == b'OggS'
+    finally:
+        upload.close()
+
+
+def test_large_upload_rolls_over_to_disk():
+    data = b'fLaC' + bytes(range(256)) * 1024
+    upload = spool_upload(io.BytesIO(data), max_memory=1024)
+    try:
+        assert (upload.size, upload.mime_type, upload.in_memory) == (len(data), 'audio/flac', False)
+        assert upload.file._rolled
+        assert b''.join(upload.iter_blocks()) == data
+    finally:
+        upload.close()
+
+
+def test_upload_from_path(tmp_path):
+    path = tmp_path / 'clip.mp3'
+    path.write_bytes(b'ID3' + b'\x00' * 61)
+    upload = spool_upload(str(path))
+    try:
+        assert (upload.size, upload.mime_type) == (64, 'audio/mpeg')
+    finally:
+        upload.close()
+
+
+# --- silence chunking ---
+
+def test_cut_at_the_first_pause_past_the_target(monkeypatch):
+    # 12 voiced windows pass the 10-window target; the cut comes after 3 silent ones
+    assert _chunk(monkeypatch, _windows((LOUD, 12), (SILENT, 3), (LOUD, 5))) == [15, 5]
+
+
+def test_pause_before_the_target_does_not_cut(monkeypatch):
+    assert _chunk(monkeypatch, _windows((LOUD, 3), (SILENT, 5), (LOUD, 3))) == [11]
+
+
+def test_hard_cut_at_max_seconds(monkeypatch):
+    assert _chunk(monkeypatch, _windows((LOUD, 25))) == [20, 5]
+
+
+def test_silent_chunks_are_dropped(monkeypatch):
+    assert _chunk(monkeypatch, _windows((SILENT, 20), (LOUD, 5), (SILENT, 3))) == [8]
+    assert _chunk(monkeypatch, _windows((SILENT, 30))) == []
+
+
+@pytest.mark.skipif(not can_split(), reason="needs ffmpeg")
+def test_decoded_upload_is_split_on_silence():
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(CHUNK_WIDTH)
+        wf.setframerate(CHUNK_RATE)
+        wf.writeframes(LOUD * 15 + SILENT * 5 + LOUD * 5)
+    upload = spool_upload(io.BytesIO(buffer.getvalue()))
+    try:
+        chunks = list(iter_speech_chunks(upload, target_seconds=0.2, max_seconds=0.4, min_silence_ms=60))
+    finally:
+        upload.close()
+    assert len(chunks) == 2
+
+
+# --- chunked transcription ---
+
+@pytest.fixture
+def gemini():
+    service = GeminiASRService(api_key='test-key', chunk_threshold=64)
+    yield service
+    service.executor.shutdown(wait=False)
+
+
+def test_large_upload_without_ffmpeg_is_rejected(gemini, monkeypatch):
+    monkeypatch.setattr(asr_service, 'can_split', lambda: False)
+    upload = spool_upload(io.BytesIO(b'\x00' * 65))
+    try:
+        with pytest.raises(UploadTooLarge):
+            gemini._use_chunks(upload)
+    finally:
+        upload.close()
+
+
+def test_chunks_are_transcribed_and_stitched_in_order(gemini, monkeypatch):
+    monkeypatch.setattr(asr_service, 'iter_speech_chunks', lambda upload, **kwargs: iter([b'one', b'', b'three']))
+    gemini._transcribe_whole = lambda audio_data, mime_type: audio_data.decode()
+    upload = spool_upload(io.BytesIO(b'\x00' * 65))
+    try:
+        assert gemini._transcribe_chunked(upload) == 'one three'
+    finally:
+        upload.close()
+
+
+# --- fallback ---
+
+def test_fallback_failure_keeps_the_retryable_errors():
+    fallback = FallbackASRService([('gemini', None), ('whisper', None)])
+    too_large, busy = UploadTooLarge(100, 10), Overloaded('asr', 1, 5)
+    assert fallback._failure([too_large, UploadTooLarge(100, 50)]) is too_large
+    assert fallback._failure([too_large, busy]) is busy
+    failure = fallback._failure([busy, Exception('boom')])
+    assert not isinstance(failure, Overloaded)
+    assert 'whisper: boom' in str(failure)
@@ -0,0 +1,196 @@
+import threading
+import time
+
+from services.history import SUMMARY_ROLE, HistoryManager, estimate_tokens
+
+
+def _msg(role, content):
+    return {'role': role, 'content': content}
+
+
+def _turns(*contents):
+    """alternating user/assistant messages"""
+    return [_msg('user' if index % 2 == 0 else 'assistant', content) for index, content in enumerate(contents)]
+
+
+# each costs estimate_tokens (10) + 2 = 12 tokens of budget
+def _long(tag):
+    return tag * 36
+
+
+class Recorder:
+    """summarize() that remembers what it was asked to fold"""
+
+    def __init__(self, fail=False, release=None):
+        self.calls = []
+        self.fail = fail
+        self.release = release
+
+    def __call__(self, summary, messages):
+        if self.release:
+            self.release.wait(2)
+        self.calls.append((summary, [message['content'] for message in messages]))
+        if self.fail:
+            raise Exception("summary upstream down")
+        return f"summary #{len(self.calls)}"
+
+
+def _settle(manager, timeout=2):
+    deadline = time.monotonic() + timeout
+    while manager.stats()['pending']:
+        assert time.monotonic() < deadline, "fold never finished"
+        time.sleep(0.001)
+
+
+def _contents(history):
+    return [message['content'] for message in history]
+
+
+def test_estimate_tokens():
+    assert estimate_tokens('') == 1
+    assert estimate_tokens(None) == 1
+    assert estimate_tokens('a' * 40) == 11
+
+
+def test_empty_history_is_returned_as_is():
+    manager = HistoryManager()
+    assert manager.compact(None) == []
+    assert manager.compact([]) == []
+
+
+def test_history_within_budget_is_untouched():
+    manager = HistoryManager(token_budget=100)
+    history = _turns('hi', 'hello', 'how are you?')
+    assert manager.compact(history, 'c1') == history
+    assert manager.stats()['folds'] == 0
+
+
+def test_current_question_is_always_kept():
+    manager = HistoryManager(token_budget=1)
+    history = _turns(_long('a'), _long('b'), _long('q'))
+    assert _contents(manager.compact(history)) == [_long('q')]
+
+
+def test_newest_turns_fill_the_budget_and_older_ones_drop_without_an_id():
+    manager = HistoryManager(summarize=Recorder(), token_budget=30)
+    history = _turns(_long('a'), _long('b'), _long('c'), 'question?')
+    assert _contents(manager.compact(history)) == [_long('b'), _long('c'), 'question?']
+    assert manager.stats()['dropped_messages'] == 1
+    assert manager.summarize.calls == []
+
+
+def test_overflow_is_folded_in_the_background():
+    summarize = Recorder()
+    manager = HistoryManager(summarize=summarize, token_budget=30)
+    history = _turns(_long('a'), _long('b'), _long('c'), 'question?')
+
+    # this turn goes out without the overflow; the summary is ready for the next
+    assert _contents(manager.compact(history, 'c1')) == [_long('b'), _long('c'), 'question?']
+    _settle(manager)
+    assert summarize.calls == [(None, [_long('a')])]
+
+    compacted = manager.compact(history + _turns('answer', 'follow-up?')[1:], 'c1')
+    assert compacted[0] == {'role': SUMMARY_ROLE, 'content': 'summary #1'}
+
+
+def test_summary_counts_against_the_budget():
+    summarize = Recorder()
+    manager = HistoryManager(summarize=summarize, token_budget=30)
+    history = _turns(_long('a'), _long('b'), _long('c'), 'question?')
+    manager.compact(history, 'c1')
+    _settle(manager)
+
+    # 30 - 3 (summary) leaves room for two long messages; the oldest uncovered one overflows
+    history = history[:-1] + [_msg('assistant', _long('d')), _msg('user', 'again?')]
+    assert _contents(manager.compact(history, 'c1')) == ['summary #1', _long('c'), _long('d'), 'again?']
+    _settle(manager)
+    assert summarize.calls[-1] == ('summary #1', [_long('b')])
+
+
+def test_resent_history_skips_the_folded_prefix():
+    summarize = Recorder()
+    manager = HistoryManager(summarize=summarize, token_budget=30)
+    history = _turns(_long('a'), _long('b'), _long('c'), _long('d'), 'question?')
+    manager.compact(history, 'c1')
+    _settle(manager)
+    assert summarize.calls == [(None, [_long('a'), _long('b')])]
+
+    history = history[:-1] + _turns('q', _long('e'), _long('f'), 'next?')[1:]
+    manager.compact(history, 'c1')
+    _settle(manager)
+    # only what the first summary didn't cover is folded
+    assert summarize.calls[-1][1][0] == _long('c')
+
+
+def test_repeated_message_does_not_hide_unsummarized_turns():
+    """a short turn that recurs after the fold point mustn't be mistaken for it"""
+    summarize = Recorder()
+    manager = HistoryManager(summarize=summarize, token_budget=30)
+    # the 29-token answer fills the budget, so the fold ends on 'why?'
+    history = _turns(_long('a'), 'why?', 'x' * 104, 'question?')
+    manager.compact(history, 'c1')
+    _settle(manager)
+    assert summarize.calls[-1][1] == [_long('a'), 'why?']
+
+    history = history + [_msg('assistant', 'why?'), _msg('user', _long('g')),
+                         _msg('assistant', _long('h')), _msg('user', 'last?')]
+    manager.compact(history, 'c1')
+    _settle(manager)
+    # the long answer, the question and the repeated 'why?' all still need summarizing
+    assert summarize.calls[-1][1] == ['x' * 104, 'question?', 'why?']
+
+
+def test_client_may_stop_resending_covered_turns():
+    summarize = Recorder()
+    manager = HistoryManager(summarize=summarize, token_budget=30)
+    history = _turns(_long('a'), _long('b'), _long('c'), 'question?')
+    manager.compact(history, 'c1')
+    _settle(manager)
+
+    # the client drops the folded turn; nothing it does send is skipped
+    trimmed = history[1:]
+    assert _contents(manager.compact(trimmed, 'c1')) == ['summary #1', _long('b'), _long('c'), 'question?']
+
+
+def test_failed_fold_is_retried_on_the_next_turn():
+    summarize = Recorder(fail=True)
+    manager = HistoryManager(summarize=summarize, token_budget=30)
+    history = _turns(_long('a'), _long('b'), _long('c'), 'question?')
+    manager.compact(history, 'c1')
+    _settle(manager)
+    assert manager.stats()['conversations'] == 0
+
+    summarize.fail = False
+    manager.compact(history, 'c1')
+    _settle(manager)
+    assert len(summarize.calls) == 2
+    assert manager.stats()['folds'] == 1
+
+
+def test_one_fold_at_a_time_per_conversation():
+    release = threading.Event()
+    summarize = Recorder(release=release)
+    manager = HistoryManager(summarize=summarize, token_budget=30)
+    history = _turns(_long('a'), _long('b'), _long('c'), 'question?')
+    manager.compact(history, 'c1')
+    manager.compact(history, 'c1')
+    assert manager.stats()['pending'] == 1
+    release.set()
+    _settle(manager)
+    assert len(summarize.calls) == 1
+
+
+def test_summaries_expire_and_are_evicted():
+    manager = HistoryManager(summarize=Recorder(), token_budget=30, ttl=0.05, max_conversations=1)
+    history = _turns(_long('a'), _long('b'), _long('c'), 'question?')
+    manager.compact(history, 'c1')
+    _settle(manager)
+    manager.compact(history, 'c2')
+    _settle(manager)
+    # c2's summary pushed c1's out
+    assert manager.stats()['conversations'] == 1
+    assert manager.compact(history, 'c1')[0]['role'] != SUMMARY_ROLE
+    _settle(manager)
+
+    time.sleep(0.06)
+    assert manager.compact(history, 'c2')[0]['role'] != SUMMARY_ROLE
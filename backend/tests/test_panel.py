@@ -0,0 +1,160 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+from jury_engine import JuryEngine
+from services.admission import Overloaded
+from services.llm_service import MAX_PANEL_OPINION_WORDS, LLMService
+
+
+IDS = ['grizzly', 'panda', 'ice_bear']
+
+
+class FakeLLM:
+    """answers the panel with a fixed result (or error) and each member with 'alone: <id>'"""
+
+    def __init__(self, engine, panel, release=None):
+        self.panel = panel
+        self.release = release
+        self.by_prompt = {member.personality_prompt: member.id for member in engine.jury_members}
+        self.asked = []
+
+    def _answer(self):
+        if self.release:
+            self.release.wait(2)
+        if isinstance(self.panel, Exception):
+            raise self.panel
+        return dict(self.panel)
+
+    def _alone(self, personality_prompt):
+        member_id = self.by_prompt[personality_prompt]
+        self.asked.append(member_id)
+        return f"alone: {member_id}"
+
+    def generate_panel(self, personas, question, conversation_history=None):
+        return self._answer()
+
+    def generate_opinion(self, personality_prompt, question, conversation_history=None):
+        return self._alone(personality_prompt)
+
+    async def agenerate_panel(self, personas, question, conversation_history=None):
+        return self._answer()
+
+    async def agenerate_opinion(self, personality_prompt, question, conversation_history=None):
+        return self._alone(personality_prompt)
+
+
+@pytest.fixture
+def engine():
+    engine = JuryEngine('test-key', google_api_key='test-key', opinion_strategy='combined', warm=False)
+    yield engine
+    engine.llm_executor.shutdown(wait=False)
+
+
+def _results(futures):
+    return [future.result(timeout=2) for future in futures]
+
+
+# --- parse_panel_response ---
+
+def test_parse_keeps_every_well_formed_opinion():
+    text = json.dumps({'grizzly': ' Grizz says yes! ', 'panda': 'Panda is unsure.', 'ice_bear': 'Ice Bear approves.'})
+    assert LLMService.parse_panel_response(text, IDS) == {
+        'grizzly': 'Grizz says yes!', 'panda': 'Panda is unsure.', 'ice_bear': 'Ice Bear approves.'
+    }
+
+
+def test_parse_drops_unusable_opinions():
+    text = json.dumps({
+        'grizzly': 'Fine.',
+        'panda': '   ',
+        'ice_bear': ['not', 'a', 'string'],
+        'nom_nom': 'not on this panel'
+    })
+    assert LLMService.parse_panel_response(text, IDS) == {'grizzly': 'Fine.'}
+
+
+def test_parse_drops_rambling_opinions():
+    limit = ' '.join(['word'] * MAX_PANEL_OPINION_WORDS)
+    text = json.dumps({'grizzly': limit, 'panda': limit + ' more'})
+    assert list(LLMService.parse_panel_response(text, IDS)) == ['grizzly']
+
+
+@pytest.mark.parametrize('text', ['["grizzly", "panda"]', '"just a string"', 'not json at all'])
+def test_parse_rejects_anything_but_a_json_object(text):
+    with pytest.raises(ValueError):
+        LLMService.parse_panel_response(text, IDS)
+
+
+# --- combined strategy, threaded ---
+
+def test_full_panel_needs_no_member_requests(engine):
+    engine.llm_service = llm = FakeLLM(engine, {member_id: f"panel: {member_id}" for member_id in IDS})
+    futures = engine._submit_opinions(engine.jury_members, 'Picnic?')
+    assert _results(futures) == [f"panel: {member_id}" for member_id in IDS]
+    assert llm.asked == []
+
+
+def test_members_the_panel_missed_are_asked_alone(engine):
+    engine.llm_service = llm = FakeLLM(engine, {'grizzly': 'panel: grizzly'})
+    futures = engine._submit_opinions(engine.jury_members, 'Picnic?')
+    assert _results(futures) == ['panel: grizzly', 'alone: panda', 'alone: ice_bear']
+    assert sorted(llm.asked) == ['ice_bear', 'panda']
+
+
+def test_failed_panel_asks_everyone_alone(engine):
+    engine.llm_service = llm = FakeLLM(engine, Exception('Gemini panel generation failed: bad JSON'))
+    futures = engine._submit_opinions(engine.jury_members, 'Picnic?')
+    assert _results(futures) == [f"alone: {member_id}" for member_id in IDS]
+    assert sorted(llm.asked) == sorted(IDS)
+
+
+def test_overloaded_panel_fails_every_member_without_fanning_out(engine):
+    engine.llm_service = llm = FakeLLM(engine, Overloaded('llm', 1, 5))
+    futures = engine._submit_opinions(engine.jury_members, 'Picnic?')
+    for future in futures:
+        with pytest.raises(Overloaded):
+            future.result(timeout=2)
+    assert llm.asked == []
+
+
+def test_cancelled_member_gets_no_fallback(engine):
+    release = threading.Event()
+    engine.llm_service = llm = FakeLLM(engine, {}, release=release)
+    futures = engine._submit_opinions(engine.jury_members, 'Picnic?')
+    assert futures[1].cancel()
+    release.set()
+    assert futures[0].result(timeout=2) == 'alone: grizzly'
+    assert futures[2].result(timeout=2) == 'alone: ice_bear'
+    assert 'panda' not in llm.asked
+
+
+def test_single_member_skips_the_panel(engine):
+    engine.llm_service = FakeLLM(engine, Exception('panel should not be used'))
+    futures = engine._submit_opinions(engine.jury_members[:1], 'Picnic?')
+    assert _results(futures) == ['alone: grizzly']
+
+
+# --- combined strategy, asyncio ---
+
+def test_async_panel_falls_back_per_member(engine):
+    engine.llm_service = llm = FakeLLM(engine, {'panda': 'panel: panda'})
+
+    async def main():
+        return await asyncio.gather(*engine._start_opinion_tasks(engine.jury_members, 'Picnic?'))
+
+    assert asyncio.run(main()) == ['alone: grizzly', 'panel: panda', 'alone: ice_bear']
+    assert sorted(llm.asked) == ['grizzly', 'ice_bear']
+
+
+def test_async_overloaded_panel_fails_every_member(engine):
+    engine.llm_service = llm = FakeLLM(engine, Overloaded('llm', 1, 5))
+
+    async def main():
+        return await asyncio.gather(*engine._start_opinion_tasks(engine.jury_members, 'Picnic?'),
+                                    return_exceptions=True)
+
+    assert all(isinstance(result, Overloaded) for result in asyncio.run(main()))
+    assert llm.asked == []
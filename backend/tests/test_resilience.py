@@ -0,0 +1,347 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from services.admission import Overloaded
+from services.resilience import (CircuitBreaker, CircuitOpen, LatencyTracker, ResilientEndpoint,
+                                 is_transient)
+
+
+class StatusError(Exception):
+    """stands in for an SDK's HTTP error, which carries status_code"""
+
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def _endpoint(**kwargs):
+    settings = dict(hedge=False, retries=2, backoff=0, max_backoff=0, failure_threshold=3, reset_after=60)
+    settings.update(kwargs)
+    return ResilientEndpoint('test', **settings)
+
+
+def _failing(*errors, result='ok'):
+    """fn(timeout) raising errors in turn, then returning result; calls counts attempts"""
+    calls = []
+
+    def fn(timeout):
+        calls.append(timeout)
+        if len(calls) <= len(errors):
+            raise errors[len(calls) - 1]
+        return result
+
+    return fn, calls
+
+
+# --- percentiles ---
+
+def test_percentile_is_nearest_rank():
+    tracker = LatencyTracker()
+    for value in range(1, 101):
+        tracker.record(value)
+    assert tracker.percentile(50) == 50
+    assert tracker.percentile(95) == 95
+    assert tracker.percentile(99) == 99
+    assert tracker.percentile(100) == 100
+    assert tracker.percentile(0) == 1
+
+
+def test_percentile_of_a_small_or_empty_window():
+    tracker = LatencyTracker()
+    assert tracker.percentile(50) is None
+    tracker.record(3.0)
+    assert tracker.percentile(99) == 3.0
+    tracker.record(1.0)
+    assert tracker.percentile(50) == 1.0
+    assert tracker.percentile(99) == 3.0
+
+
+def test_percentile_window_forgets_old_samples():
+    tracker = LatencyTracker(window=10)
+    for _ in range(10):
+        tracker.record(100.0)
+    for _ in range(10):
+        tracker.record(1.0)
+    assert len(tracker) == 10
+    assert tracker.percentile(99) == 1.0
+
+
+# --- circuit breaker ---
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_after=60)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == 'closed'
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert not breaker.allow()
+    assert breaker.trips == 1
+    assert 0 < breaker.retry_in() <= 60
+
+
+def test_half_open_lets_one_trial_through():
+    breaker = CircuitBreaker(failure_threshold=1, reset_after=0.05)
+    breaker.record_failure()
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.state == 'half_open'
+    assert breaker.allow()
+    # the trial is out; everyone else keeps falling back
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed'
+    assert breaker.allow()
+
+
+def test_failed_trial_reopens_the_circuit():
+    breaker = CircuitBreaker(failure_threshold=1, reset_after=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert breaker.trips == 2
+    assert not breaker.allow()
+
+
+def test_trial_that_never_reports_back_expires():
+    breaker = CircuitBreaker(failure_threshold=1, reset_after=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert not breaker.allow()
+    # the trial was abandoned; after another reset_after a new one may go
+    time.sleep(0.06)
+    assert breaker.allow()
+
+
+# --- error classification ---
+
+@pytest.mark.parametrize('error, retryable', [
+    (TimeoutError(), True),
+    (asyncio.TimeoutError(), True),
+    (ConnectionResetError(), True),
+    (StatusError(429), True),
+    (StatusError(408), True),
+    (StatusError(500), True),
+    (StatusError(503), True),
+    (StatusError(400), False),
+    (StatusError(401), False),
+    (StatusError(413), False),
+    (ValueError('bad payload'), False),
+    (Overloaded('tts', 1, 1), False),
+])
+def test_is_transient(error, retryable):
+    assert is_transient(error) is retryable
+
+
+# --- timeouts and hedging ---
+
+def test_timeout_follows_observed_latency():
+    endpoint = _endpoint(min_timeout=1, default_timeout=120, timeout_factor=2, min_samples=10)
+    assert endpoint.timeout() == 120
+    for _ in range(10):
+        endpoint.latency.record(3.0)
+    assert endpoint.timeout() == 6.0
+    assert endpoint.timeout(cap=4) == 4
+
+
+def test_timeout_never_drops_below_the_floor():
+    endpoint = _endpoint(min_timeout=10, min_samples=5)
+    for _ in range(5):
+        endpoint.latency.record(0.5)
+    assert endpoint.timeout() == 10
+
+
+def test_hedge_delay_needs_samples():
+    endpoint = _endpoint(hedge=True, min_samples=5)
+    assert endpoint.hedge_delay() is None
+    for value in (1, 2, 3, 4, 5):
+        endpoint.latency.record(value)
+    assert endpoint.hedge_delay() == 5
+    assert _endpoint(hedge=False, min_samples=0).hedge_delay() is None
+
+
+def test_slow_attempt_is_hedged_and_the_faster_copy_wins():
+    endpoint = _endpoint(hedge=True, min_samples=5, min_timeout=1)
+    for _ in range(5):
+        endpoint.latency.record(0.02)
+    release = threading.Event()
+    calls = []
+
+    def fn(timeout):
+        calls.append(timeout)
+        if len(calls) == 1:
+            release.wait(2)
+            return 'slow'
+        return 'fast'
+
+    try:
+        assert endpoint.call(fn) == 'fast'
+    finally:
+        release.set()
+    stats = endpoint.stats()
+    assert stats['hedges'] == 1
+    assert stats['hedge_wins'] == 1
+
+
+# --- call ---
+
+def test_transient_failures_are_retried():
+    endpoint = _endpoint()
+    fn, calls = _failing(TimeoutError(), StatusError(503))
+    assert endpoint.call(fn) == 'ok'
+    assert len(calls) == 3
+    stats = endpoint.stats()
+    assert stats['retries'] == 2
+    assert stats['failures'] == 2
+    # the success resets the run of failures
+    assert stats['circuit']['consecutive_failures'] == 0
+
+
+def test_retries_run_out():
+    endpoint = _endpoint(retries=1)
+    fn, calls = _failing(TimeoutError(), TimeoutError(), TimeoutError())
+    with pytest.raises(TimeoutError):
+        endpoint.call(fn)
+    assert len(calls) == 2
+
+
+def test_non_retryable_errors_are_raised_at_once():
+    endpoint = _endpoint(failure_threshold=1)
+    fn, calls = _failing(StatusError(400))
+    with pytest.raises(StatusError):
+        endpoint.call(fn)
+    assert len(calls) == 1
+    stats = endpoint.stats()
+    assert stats['non_retryable'] == 1
+    assert stats['failures'] == 0
+    # a bad request says nothing about the endpoint, so the circuit stays closed
+    assert stats['circuit']['state'] == 'closed'
+
+
+def test_overloaded_is_neither_retried_nor_counted():
+    endpoint = _endpoint(failure_threshold=1)
+    fn, calls = _failing(Overloaded('tts', 3, 5))
+    with pytest.raises(Overloaded):
+        endpoint.call(fn)
+    assert len(calls) == 1
+    assert endpoint.breaker.state == 'closed'
+
+
+def test_budget_stops_retries():
+    endpoint = _endpoint(retries=5, min_timeout=10)
+    fn, calls = _failing(*[TimeoutError()] * 6)
+    # less than min_timeout left after the first attempt: no point in another
+    with pytest.raises(TimeoutError):
+        endpoint.call(fn, budget=5)
+    assert len(calls) == 1
+    assert calls[0] == pytest.approx(5, abs=0.1)
+
+
+def test_open_circuit_short_circuits():
+    endpoint = _endpoint(retries=0, failure_threshold=2)
+    for _ in range(2):
+        with pytest.raises(TimeoutError):
+            endpoint.call(_failing(TimeoutError())[0])
+    fn, calls = _failing()
+    with pytest.raises(CircuitOpen):
+        endpoint.call(fn)
+    assert calls == []
+    assert endpoint.stats()['short_circuits'] == 1
+
+
+def test_custom_retryable_predicate():
+    endpoint = _endpoint(retryable=lambda error: isinstance(error, KeyError))
+    fn, calls = _failing(KeyError('flaky'))
+    assert endpoint.call(fn) == 'ok'
+    assert len(calls) == 2
+
+
+def test_record_failure_ignores_non_retryable_errors():
+    endpoint = _endpoint(failure_threshold=1)
+    endpoint.record_failure(StatusError(401))
+    endpoint.record_failure(Overloaded('tts', 1, 1))
+    assert endpoint.breaker.state == 'closed'
+    endpoint.record_failure(StatusError(502))
+    assert endpoint.breaker.state == 'open'
+
+
+# --- acall ---
+
+def _afailing(*errors, result='ok', delay=0.0):
+    sync_fn, calls = _failing(*errors, result=result)
+
+    async def fn(timeout):
+        if delay:
+            await asyncio.sleep(delay)
+        return sync_fn(timeout)
+
+    return fn, calls
+
+
+def test_acall_retries_transient_failures():
+    endpoint = _endpoint()
+    fn, calls = _afailing(StatusError(429))
+    assert asyncio.run(endpoint.acall(fn)) == 'ok'
+    assert len(calls) == 2
+
+
+def test_acall_raises_non_retryable_errors_at_once():
+    endpoint = _endpoint(failure_threshold=1)
+    fn, calls = _afailing(StatusError(401))
+    with pytest.raises(StatusError):
+        asyncio.run(endpoint.acall(fn))
+    assert len(calls) == 1
+    assert endpoint.breaker.state == 'closed'
+
+
+def test_acall_hedge_cancels_the_loser():
+    endpoint = _endpoint(hedge=True, min_samples=5, min_timeout=1)
+    for _ in range(5):
+        endpoint.latency.record(0.02)
+    cancelled = []
+    calls = []
+
+    async def fn(timeout):
+        calls.append(timeout)
+        if len(calls) == 1:
+            try:
+                await asyncio.sleep(2)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+            return 'slow'
+        return 'fast'
+
+    async def main():
+        result = await endpoint.acall(fn)
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(main()) == 'fast'
+    assert cancelled == [True]
+    assert endpoint.stats()['hedge_wins'] == 1
+
+
+def test_acall_cancellation_is_not_a_failure():
+    endpoint = _endpoint(failure_threshold=1)
+    fn, _ = _afailing(delay=1)
+
+    async def main():
+        task = asyncio.ensure_future(endpoint.acall(fn))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    assert endpoint.breaker.state == 'closed'
+    assert endpoint.stats()['failures'] == 0
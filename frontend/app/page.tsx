@@ -19,18 +19,14 @@ interface DeliberationData {
   session_id: string;
 }
 
-interface ConversationMessage {
-  role: 'user' | 'assistant';
-  content: string;
-}
-
 const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8080';
 
 export default function Home() {
   const [appState, setAppState] = useState<AppState>('home');
   const [deliberationData, setDeliberationData] = useState<DeliberationData | null>(null);
-  const [conversationHistory, setConversationHistory] = useState<ConversationMessage[]>([]);
   const [isLoadingFollowUp, setIsLoadingFollowUp] = useState(false);
+  // the backend holds the conversation; follow-ups only send the new question
+  const [conversationId, setConversationId] = useState<string | null>(null);
 
   const handleRecordingComplete = useCallback(async (blob: Blob) => {
     setAppState('thinking');
@@ -38,7 +34,7 @@ export default function Home() {
     try {
       const formData = new FormData();
       formData.append('audio', blob, 'recording.webm');
-      formData.append('conversation_history', JSON.stringify(conversationHistory));
+      if (conversationId) formData.append('conversation_id', conversationId);
 
       const response = await fetch(`${API_BASE_URL}/api/opinions`, {
         method: 'POST',
@@ -58,7 +54,7 @@ export default function Home() {
         opinions: data.opinions,
         session_id: data.session_id
       });
-      setConversationHistory(prev => [...prev, { role: 'user', content: data.question }]);
+      setConversationId(data.conversation_id ?? null);
       setAppState('deliberation');
     } catch (error) {
       console.error('Recording error:', error);
@@ -75,7 +71,7 @@ export default function Home() {
       alert(`${errorMessage}\n\nPlease check the console for details.`);
       setAppState('home');
     }
-  }, [conversationHistory]);
+  }, [conversationId]);
 
   const handleFollowUp = useCallback(async (followUpText: string) => {
     if (!deliberationData) return;
@@ -90,7 +86,8 @@ export default function Home() {
         },
         body: JSON.stringify({
           question: followUpText,
-          conversation_history: [...conversationHistory, { role: 'user', content: followUpText }]
+          conversation_id: conversationId,
+          session_id: deliberationData.session_id
         }),
       });
 
@@ -107,7 +104,7 @@ export default function Home() {
         opinions: data.opinions,
         session_id: data.session_id
       });
-      setConversationHistory(prev => [...prev, { role: 'user', content: followUpText }]);
+      setConversationId(data.conversation_id ?? null);
       setIsLoadingFollowUp(false);
     } catch (error) {
       console.error('Follow-up error:', error);
@@ -124,12 +121,12 @@ export default function Home() {
       alert(`${errorMessage}\n\nPlease check the console for details.`);
       setIsLoadingFollowUp(false);
     }
-  }, [deliberationData, conversationHistory]);
+  }, [deliberationData, conversationId]);
 
   const handleReset = useCallback(() => {
     setAppState('home');
     setDeliberationData(null);
-    setConversationHistory([]);
+    setConversationId(null);
     setIsLoadingFollowUp(false);
   }, []);
 
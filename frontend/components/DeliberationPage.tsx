@@ -29,6 +29,14 @@ const bearColors: Record<string, string> = {
   'Ice Bear': 'from-cyan-900/20 to-blue-950/20 border-cyan-700/30',
 };
 
+// ask the backend for a compressed clip this browser can decode; it falls back to wav
+function preferredAudioFormat(): string {
+  const probe = new Audio();
+  if (probe.canPlayType('audio/ogg; codecs="opus"')) return 'opus';
+  if (probe.canPlayType('audio/mpeg')) return 'mp3';
+  return 'wav';
+}
+
 export default function DeliberationPage({ data, onReset, onFollowUp, isLoading, apiUrl = 'http://localhost:8080' }: DeliberationPageProps) {
   const [followUpText, setFollowUpText] = useState('');
   const [playingIndex, setPlayingIndex] = useState<number | null>(null);
@@ -57,7 +65,7 @@ export default function DeliberationPage({ data, onReset, onFollowUp, isLoading,
     }
     
     setPlayingIndex(index);
-    const audio = new Audio(`${apiUrl}/api/audio/${sessionId}/${audioIndex}`);
+    const audio = new Audio(`${apiUrl}/api/audio/${sessionId}/${audioIndex}?format=${preferredAudioFormat()}`);
     currentAudioRef.current = audio;
     
     audio.onended = () => {